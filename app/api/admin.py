@@ -1,13 +1,31 @@
+import asyncio
+import os
 from datetime import datetime, timedelta
 from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import func
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import PlainTextResponse
+from sqlalchemy import func, or_, select
+from sqlalchemy.orm import Session, contains_eager, load_only, undefer
 
+from app.config import settings
 from app.core.dependencies import require_admin
+from app.core.pagination import (
+    count_total,
+    keyset_order,
+    paginate,
+    set_page_headers,
+)
+from app.core.profiler import ProfilerBusy, profiler
+from app.core.slow_queries import slow_query_log
 from app.database import get_db
 from app.models import Click, URL, User
+from app.services.render_cache import qr_render_cache
+from app.services.search_service import (
+    apply_search,
+    like_filter,
+    match_subquery,
+)
 
 router = APIRouter(prefix="/api/v1/admin", tags=["admin"])
 
@@ -79,23 +97,37 @@ async def get_platform_stats(
 
 @router.get("/users")
 async def get_all_users(
+    response: Response,
     admin: User = Depends(require_admin),
     db: Session = Depends(get_db),
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = None,
+    with_total: bool = False,
     search: Optional[str] = None,
 ):
     """Get all users with pagination and search."""
-    query = db.query(User)
-
-    if search:
-        query = query.filter(
-            (User.username.contains(search))
-            | (User.email.contains(search))
-        )
+    # Link/click totals come from correlated subqueries in the same
+    # statement instead of two extra queries per user
+    query = db.query(User).options(
+        load_only(
+            User.id,
+            User.username,
+            User.email,
+            User.role,
+            User.is_active,
+            User.created_at,
+        ),
+        undefer(User.total_links),
+        undefer(User.total_clicks),
+    )
+    query, rank = apply_search(query, User, search)
 
-    query = query.order_by(User.created_at.desc())
-    users = query.offset(skip).limit(limit).all()
+    total = count_total(query) if with_total else None
+    users, next_cursor = paginate(
+        query, keyset_order(User, rank), limit, cursor=cursor, skip=skip
+    )
+    set_page_headers(response, next_cursor, total)
 
     return [
         {
@@ -105,12 +137,8 @@ async def get_all_users(
             "role": user.role,
             "is_active": user.is_active,
             "created_at": user.created_at.isoformat(),
-            "total_links": db.query(func.count(URL.id)).filter(
-                URL.user_id == user.id
-            ).scalar(),
-            "total_clicks": db.query(func.sum(URL.clicks_count)).filter(
-                URL.user_id == user.id
-            ).scalar() or 0,
+            "total_links": user.total_links,
+            "total_clicks": user.total_clicks,
         }
         for user in users
     ]
@@ -175,24 +203,58 @@ async def delete_user(
 
 @router.get("/links")
 async def get_all_links(
+    response: Response,
     admin: User = Depends(require_admin),
     db: Session = Depends(get_db),
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = None,
+    with_total: bool = False,
     search: Optional[str] = None,
 ):
     """Get all links with pagination and search."""
-    query = db.query(URL).join(User)
-
-    if search:
-        query = query.filter(
-            (URL.short_code.contains(search))
-            | (URL.original_url.contains(search))
-            | (User.username.contains(search))
+    # Owner comes from the same JOIN used for searching by username
+    query = (
+        db.query(URL)
+        .join(URL.owner)
+        .options(
+            load_only(
+                URL.id,
+                URL.user_id,
+                URL.short_code,
+                URL.original_url,
+                URL.clicks_count,
+                URL.is_active,
+                URL.created_at,
+            ),
+            contains_eager(URL.owner).load_only(User.id, User.username),
         )
+    )
+    rank = None
 
-    query = query.order_by(URL.created_at.desc())
-    links = query.offset(skip).limit(limit).all()
+    if search:
+        # Match the link itself or its owner's username
+        url_hits = match_subquery(db, URL, search)
+        user_hits = match_subquery(db, User, search)
+        if url_hits is None or user_hits is None:
+            query = query.filter(
+                like_filter(URL, search) | User.username.contains(search)
+            )
+        else:
+            query = query.outerjoin(url_hits, url_hits.c.id == URL.id).filter(
+                or_(
+                    url_hits.c.id.isnot(None),
+                    User.id.in_(select(user_hits.c.id)),
+                )
+            )
+            # Owner-only matches go after direct link matches
+            rank = func.coalesce(url_hits.c.rank, 0)
+
+    total = count_total(query) if with_total else None
+    links, next_cursor = paginate(
+        query, keyset_order(URL, rank), limit, cursor=cursor, skip=skip
+    )
+    set_page_headers(response, next_cursor, total)
 
     return [
         {
@@ -288,3 +350,57 @@ async def get_platform_activity(
         current_date += timedelta(days=1)
 
     return result
+
+
+@router.get("/qr-cache")
+async def get_qr_cache_stats(admin: User = Depends(require_admin)):
+    """QR render cache size and hit-rate metrics for this worker."""
+    return qr_render_cache.stats()
+
+
+@router.get("/slow-queries")
+async def get_slow_queries(
+    limit: int = Query(50, ge=1, le=1000),
+    admin: User = Depends(require_admin),
+):
+    """Recent statements over SLOW_QUERY_THRESHOLD_MS in this worker, newest first."""
+    return {
+        "threshold_ms": settings.SLOW_QUERY_THRESHOLD_MS,
+        "total": slow_query_log.total,
+        "pid": os.getpid(),
+        "queries": slow_query_log.entries(limit),
+    }
+
+
+@router.delete("/slow-queries", status_code=204)
+async def clear_slow_queries(admin: User = Depends(require_admin)):
+    """Empty this worker's slow-query log."""
+    slow_query_log.clear()
+
+
+@router.get("/profile", response_class=PlainTextResponse)
+async def profile_worker(
+    seconds: float = Query(5, gt=0, le=settings.PROFILER_MAX_SECONDS),
+    interval_ms: float = Query(10, ge=1, le=1000),
+    admin: User = Depends(require_admin),
+):
+    """
+    Sample the stacks of the worker serving this request.
+
+    Returns collapsed stacks (flamegraph.pl / speedscope input). With
+    several workers, the X-Profile-Pid header tells which one was
+    profiled; repeat the call to reach the others.
+    """
+    try:
+        result = await asyncio.to_thread(profiler.profile, seconds, interval_ms / 1000)
+    except ProfilerBusy:
+        raise HTTPException(status_code=409, detail="A profile is already running in this worker")
+
+    return PlainTextResponse(
+        result.collapsed(),
+        headers={
+            "X-Profile-Pid": str(os.getpid()),
+            "X-Profile-Samples": str(result.samples),
+            "X-Profile-Seconds": f"{result.duration:.3f}",
+        },
+    )
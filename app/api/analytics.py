@@ -2,12 +2,13 @@ from datetime import datetime, timedelta
 from typing import Optional
 
 from fastapi import APIRouter, Depends, Query
+from fastapi.responses import ORJSONResponse
 from sqlalchemy import func
 from sqlalchemy.orm import Session
 
 from app.core.dependencies import get_current_user
 from app.database import get_db
-from app.models import Click, URL, User
+from app.models import Click, Tag, URL, User, url_tags
 
 router = APIRouter(prefix="/api/v1/analytics", tags=["analytics"])
 
@@ -145,7 +146,7 @@ async def get_clicks_over_time(
         )
         current_date += timedelta(days=1)
 
-    return result
+    return ORJSONResponse(result)
 
 
 @router.get("/referrers")
@@ -194,7 +195,7 @@ async def get_top_referrers(
         except:
             result.append({"source": ref.referer[:50], "clicks": ref.count})
 
-    return result
+    return ORJSONResponse(result)
 
 
 @router.get("/devices")
@@ -234,7 +235,7 @@ async def get_device_stats(
     for dt in device_types - existing:
         result.append({"device": dt, "clicks": 0, "percentage": 0})
 
-    return sorted(result, key=lambda x: x["clicks"], reverse=True)
+    return ORJSONResponse(sorted(result, key=lambda x: x["clicks"], reverse=True))
 
 
 @router.get("/browsers")
@@ -267,7 +268,7 @@ async def get_browser_stats(
             }
         )
 
-    return result
+    return ORJSONResponse(result)
 
 
 @router.get("/countries")
@@ -291,7 +292,7 @@ async def get_country_stats(
     for country in countries:
         result.append({"country": country.country, "clicks": country.count})
 
-    return result
+    return ORJSONResponse(result)
 
 
 @router.get("/top-links")
@@ -302,21 +303,51 @@ async def get_top_links(
 ):
     """Get top performing links."""
     links = (
-        db.query(URL)
+        db.query(
+            URL.id, URL.short_code, URL.original_url, URL.title,
+            URL.clicks_count, URL.created_at,
+        )
         .filter(URL.user_id == current_user.id)
         .order_by(URL.clicks_count.desc())
         .limit(limit)
         .all()
     )
 
-    return [
+    return ORJSONResponse([
         {
-            "id": link.id,
-            "short_code": link.short_code,
-            "original_url": link.original_url,
-            "title": link.title,
-            "clicks": link.clicks_count,
-            "created_at": link.created_at.isoformat(),
+            "id": id,
+            "short_code": short_code,
+            "original_url": original_url,
+            "title": title,
+            "clicks": clicks_count,
+            "created_at": created_at.isoformat(),
         }
-        for link in links
-    ]
+        for id, short_code, original_url, title, clicks_count, created_at in links
+    ])
+
+
+@router.get("/tags")
+async def get_tag_stats(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Get links and clicks aggregated per tag."""
+    clicks = func.coalesce(func.sum(URL.clicks_count), 0)
+    tags = (
+        db.query(
+            Tag.name,
+            func.count(URL.id).label("links"),
+            clicks.label("clicks"),
+        )
+        .join(url_tags, url_tags.c.tag_id == Tag.id)
+        .join(URL, URL.id == url_tags.c.url_id)
+        .filter(Tag.user_id == current_user.id)
+        .group_by(Tag.id, Tag.name)
+        .order_by(clicks.desc(), Tag.name)
+        .all()
+    )
+
+    return ORJSONResponse([
+        {"tag": tag.name, "links": tag.links, "clicks": tag.clicks}
+        for tag in tags
+    ])
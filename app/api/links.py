@@ -1,17 +1,38 @@
 from typing import List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.orm import Session, selectinload
 
 from app.config import settings
 from app.core.dependencies import get_current_user
+from app.core.pagination import (
+    count_total,
+    keyset_order,
+    paginate,
+    set_page_headers,
+)
 from app.database import get_db
 from app.models import URL, User
 from app.schemas import URLInfo, URLRequest, URLResponse, URLUpdateRequest
+from app.services.expiry_service import expiry_scheduler
+from app.services.search_service import apply_search
+from app.services.tag_service import parse_tags, set_link_tags, tag_filter
 from app.utils import check_url_accessible, generate_short_code
 
 router = APIRouter(prefix="/api/v1/links", tags=["links"])
 
+# Columns behind URLResponse; listings select just these as tuples
+LINK_COLUMNS = (
+    URL.id,
+    URL.original_url,
+    URL.short_code,
+    URL.title,
+    URL.clicks_count,
+    URL.is_active,
+    URL.created_at,
+)
+
 
 @router.post("", response_model=URLResponse, status_code=201)
 async def create_link(
@@ -62,12 +83,14 @@ async def create_link(
         short_code=short_code,
         title=data.title,
         expires_at=data.expires_at,
-        tags=data.tags,
     )
+    set_link_tags(db, url, data.tags)
     db.add(url)
     db.commit()
     db.refresh(url)
 
+    expiry_scheduler.notify(url.expires_at)
+
     return _url_to_response(url)
 
 
@@ -77,26 +100,38 @@ async def get_my_links(
     current_user: User = Depends(get_current_user),
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = None,
+    with_total: bool = False,
     search: Optional[str] = None,
+    tag: Optional[List[str]] = Query(None),
     active_only: bool = False,
 ):
-    """Get user's links with pagination and search."""
-    query = db.query(URL).filter(URL.user_id == current_user.id)
-
-    if search:
-        query = query.filter(
-            (URL.short_code.contains(search))
-            | (URL.original_url.contains(search))
-            | (URL.title.contains(search))
-        )
+    """
+    Get user's links with pagination and search.
+
+    Pass the `X-Next-Cursor` response header back as `cursor` to fetch
+    the next page; `skip` is still supported for offset pagination.
+    Repeat `tag` to return only links carrying all of the given tags.
+    """
+    query = db.query(*LINK_COLUMNS).filter(URL.user_id == current_user.id)
+    query, rank = apply_search(query, URL, search)
+
+    tag_names = parse_tags(",".join(tag or []))
+    if tag_names:
+        query = query.filter(tag_filter(current_user.id, tag_names))
 
     if active_only:
         query = query.filter(URL.is_active == True)
 
-    query = query.order_by(URL.created_at.desc())
-    urls = query.offset(skip).limit(limit).all()
+    total = count_total(query) if with_total else None
+    rows, next_cursor = paginate(
+        query, keyset_order(URL, rank), limit, cursor=cursor, skip=skip
+    )
 
-    return [_url_to_response(url) for url in urls]
+    # Rows map straight to URLResponse; skip re-validating them
+    response = ORJSONResponse([_link_dict(*row) for row in rows])
+    set_page_headers(response, next_cursor, total)
+    return response
 
 
 @router.get("/{link_id}", response_model=URLInfo)
@@ -108,6 +143,7 @@ async def get_link(
     """Get link details."""
     url = (
         db.query(URL)
+        .options(selectinload(URL.tag_list))
         .filter(URL.id == link_id, URL.user_id == current_user.id)
         .first()
     )
@@ -140,6 +176,7 @@ async def update_link(
     """Update link (title, active status, tags)."""
     url = (
         db.query(URL)
+        .options(selectinload(URL.tag_list))
         .filter(URL.id == link_id, URL.user_id == current_user.id)
         .first()
     )
@@ -151,7 +188,7 @@ async def update_link(
     if data.is_active is not None:
         url.is_active = data.is_active
     if data.tags is not None:
-        url.tags = data.tags
+        set_link_tags(db, url, data.tags)
 
     db.commit()
     db.refresh(url)
@@ -180,15 +217,22 @@ async def delete_link(
     return {"detail": "Link deleted successfully"}
 
 
+def _link_dict(
+    id, original_url, short_code, title, clicks_count, is_active, created_at
+) -> dict:
+    """URLResponse fields from a LINK_COLUMNS row."""
+    return {
+        "id": id,
+        "original_url": original_url,
+        "short_code": short_code,
+        "short_url": f"{settings.BASE_URL}/{short_code}",
+        "title": title,
+        "clicks_count": clicks_count,
+        "is_active": is_active,
+        "created_at": created_at,
+    }
+
+
 def _url_to_response(url: URL) -> URLResponse:
     """Convert URL model to response schema."""
-    return URLResponse(
-        id=url.id,
-        original_url=url.original_url,
-        short_code=url.short_code,
-        short_url=f"{settings.BASE_URL}/{url.short_code}",
-        title=url.title,
-        clicks_count=url.clicks_count,
-        is_active=url.is_active,
-        created_at=url.created_at,
-    )
+    return URLResponse(**_link_dict(*(getattr(url, col.key) for col in LINK_COLUMNS)))
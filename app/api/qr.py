@@ -5,35 +5,80 @@ API для управления QR-кодами.
 - POST   /api/v1/qr          — создать QR-код
 - GET    /api/v1/qr          — список QR-кодов пользователя
 - GET    /api/v1/qr/{id}     — получить конкретный QR
-- PATCH  /api/v1/qr/{id}     — обновить (title)
+- PATCH  /api/v1/qr/{id}     — обновить (title, адрес, дизайн)
 - DELETE /api/v1/qr/{id}     — удалить QR-код
 - POST   /api/v1/qr/preview  — превью без сохранения
+- POST   /api/v1/qr/batch    — создать пачку QR-кодов
+- GET    /api/v1/qr/export.zip          — все QR-коды одним архивом
+- GET    /api/v1/qr/{id}.png?size=      — PNG нужного размера
+- POST   /api/v1/qr/logos    — загрузить логотип в библиотеку
+- GET    /api/v1/qr/logos    — библиотека логотипов
+- DELETE /api/v1/qr/logos/{id}          — удалить логотип
 - GET    /api/v1/qr/{id}/download/{format}  — скачать PNG или SVG
+- GET    /api/v1/qr/images/{digest}.png     — изображение из blob store
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Query, Response
-from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+)
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from sqlalchemy.orm import Session, joinedload, selectinload
 from datetime import datetime
+from typing import List, Optional
+import base64
 import math
 
 from app.database import get_db
-from app.models import QRCode, URL, User
+from app.models import Logo, QRCode, URL, User
 from app.schemas import (
+    LogoResponse,
+    LogoUploadRequest,
+    QRCodeBatchRequest,
+    QRCodeBatchResponse,
     QRCodeCreateRequest,
     QRCodeResponse,
     QRCodeListResponse,
     QRCodeUpdateRequest,
     QRCodePreviewRequest,
     QRCodePreviewResponse,
+    QRCodeStyle,
 )
+from app.core.compression import negotiate_encoding
 from app.core.dependencies import get_current_user
-from app.services.qr_service import (
-    generate_qr_image,
-    generate_qr_svg,
-    validate_logo_base64,
+from app.core.lazy import lazy_import
+from app.core.http_cache import (
+    IMMUTABLE,
+    REVALIDATE,
+    cache_headers,
+    etag_matches,
+    make_etag,
+    not_modified,
 )
-import base64
+from app.core.pagination import count_total, keyset_order, paginate
+from app.core.zipstream import stream_zip
+from app.services.search_service import apply_search
+from app.services.blob_store import blob_store
+from app.services.counter_buffer import qr_downloads
+from app.services.dynamic_qr_service import (
+    create_target_link,
+    delete_unused_blobs,
+    is_redirectable,
+    qr_rerenderer,
+    render_params,
+    sized_png_etag,
+    short_link,
+)
+from app.services.logo_service import add_logo, get_logo_base64
+from app.services.render_pool import RenderPoolBusy, RenderSuperseded
+
+# qrcode / PIL / numpy загружаются при первом обращении к QR-рендерингу
+qr_service = lazy_import("app.services.qr_service")
 
 router = APIRouter(prefix="/api/v1/qr", tags=["qr-codes"])
 
@@ -45,30 +90,97 @@ def _generate_default_title(content: str) -> str:
     return f"QR: {content}"
 
 
-def _build_response(qr_code: QRCode, linked_url: URL = None) -> dict:
-    """Строит полный ответ с данными привязанной ссылки."""
+# Поля оформления, которые PATCH design копирует в QRCode как есть
+_DESIGN_FIELDS = {
+    "foreground_color",
+    "background_color",
+    "style",
+    "box_size",
+    "border_size",
+    "error_correction",
+}
+
+
+def _resolve_logo(data, db: Session, current_user: User) -> None:
+    """
+    Подставить в data.logo_base64 логотип из библиотеки (logo_id)
+    или проверить переданный base64.
+    """
+    if data.logo_id is not None:
+        data.logo_base64 = get_logo_base64(db, current_user.id, data.logo_id)
+        if data.logo_base64 is None:
+            raise HTTPException(status_code=404, detail="Логотип не найден")
+    elif data.logo_base64 and not qr_service.validate_logo_base64(data.logo_base64):
+        raise HTTPException(
+            status_code=400,
+            detail="Невалидный логотип. Допустимые форматы: PNG, JPG, GIF, WebP. Макс. 500KB.",
+        )
+
+
+def _logo_response(logo: Logo) -> dict:
+    return {
+        "id": logo.id,
+        "digest": logo.digest,
+        "url": f"{router.prefix}/logos/{logo.digest}.png",
+        "width": logo.width,
+        "height": logo.height,
+        "created_at": logo.created_at.isoformat() if logo.created_at else "",
+    }
+
+
+def _render_busy() -> HTTPException:
+    """Ответ при переполненной очереди рендеринга."""
+    return HTTPException(
+        status_code=429,
+        detail="Сервер перегружен генерацией QR-кодов, повторите позже",
+        headers={"Retry-After": "1"},
+    )
+
+
+def _thumbnail_url(qr_code: QRCode) -> str:
+    """URL миниатюры для галереи."""
+    return f"{router.prefix}/{qr_code.id}.png?size={qr_service.THUMBNAIL_SIZE}"
+
+
+def _image_url(qr_code: QRCode) -> str:
+    """Content-addressed URL изображения QR-кода."""
+    return f"{router.prefix}/images/{qr_code.image_digest}.png"
+
+
+def _build_response(
+    qr_code: QRCode, linked_url: URL = None, include_images: bool = True
+) -> dict:
+    """
+    Строит полный ответ с данными привязанной ссылки.
+
+    В списках (include_images=False) изображение и логотип не
+    встраиваются в JSON — клиент загружает их по image_url.
+    """
     data = {
         "id": qr_code.id,
         "content": qr_code.content,
         "title": qr_code.title,
         "url_id": qr_code.url_id,
-        "qr_image_base64": qr_code.qr_image_base64,
+        "image_url": _image_url(qr_code),
+        "thumbnail_url": _thumbnail_url(qr_code),
+        "qr_image_base64": blob_store.get_base64(qr_code.image_digest) if include_images else None,
         "foreground_color": qr_code.foreground_color,
         "background_color": qr_code.background_color,
         "style": qr_code.style,
         "box_size": qr_code.box_size,
         "border_size": qr_code.border_size,
         "error_correction": qr_code.error_correction,
-        "logo_base64": qr_code.logo_base64,
-        "downloads_count": qr_code.downloads_count,
+        "logo_base64": blob_store.get_base64(qr_code.logo_digest) if include_images else None,
+        # Плюс ещё не сброшенные в БД скачивания
+        "downloads_count": (qr_code.downloads_count or 0) + qr_downloads.pending(qr_code.id),
         "created_at": qr_code.created_at.isoformat() if qr_code.created_at else None,
         "updated_at": qr_code.updated_at.isoformat() if qr_code.updated_at else None,
+        # Все поля QRCodeResponse — списки отдаются без response_model
+        "linked_short_code": linked_url.short_code if linked_url else None,
+        "linked_clicks": linked_url.clicks_count if linked_url else None,
+        "destination": linked_url.original_url if linked_url else None,
     }
-    
-    if linked_url:
-        data["linked_short_code"] = linked_url.short_code
-        data["linked_clicks"] = linked_url.clicks_count
-    
+
     return data
 
 
@@ -87,15 +199,13 @@ async def create_qr_code(
     произвольный URL в поле content.
 
     Если url_id указан — content берётся из короткой ссылки автоматически
-    (формат: BASE_URL/short_code).
+    (формат: BASE_URL/short_code). Для http(s)-контента без url_id
+    короткая ссылка создаётся автоматически: QR-код становится
+    динамическим — адрес назначения можно менять без перерисовки,
+    а сканирования считаются как клики ссылки.
     """
-    # Валидация логотипа
-    if data.logo_base64:
-        if not validate_logo_base64(data.logo_base64):
-            raise HTTPException(
-                status_code=400,
-                detail="Невалидный логотип. Допустимые форматы: PNG, JPG, GIF, WebP. Макс. 500KB.",
-            )
+    # Логотип из библиотеки или проверка переданного
+    _resolve_logo(data, db, current_user)
 
     # Если привязка к ссылке — проверяем владение
     linked_url = None
@@ -114,8 +224,7 @@ async def create_qr_code(
             )
 
         # Контент QR = короткая ссылка
-        from app.config import settings
-        content = f"{settings.BASE_URL}/{linked_url.short_code}"
+        content = short_link(linked_url)
 
     # Проверяем лимит QR-кодов (опционально)
     qr_count = db.query(QRCode).filter(
@@ -128,9 +237,17 @@ async def create_qr_code(
             detail="Достигнут лимит QR-кодов (50). Удалите ненужные.",
         )
 
-    # Генерируем QR-изображение
+    title = data.title or _generate_default_title(content)
+
+    # Динамический QR: своя короткая ссылка на указанный адрес
+    owns_url = linked_url is None and is_redirectable(content)
+    if owns_url:
+        linked_url = create_target_link(db, current_user.id, content, title)
+        content = short_link(linked_url)
+
+    # Генерируем QR-изображение (в пуле процессов)
     try:
-        qr_image_base64 = generate_qr_image(
+        qr_png = await qr_service.render_qr_png_async(
             content=content,
             foreground_color=data.foreground_color,
             background_color=data.background_color,
@@ -140,6 +257,8 @@ async def create_qr_code(
             error_correction=data.error_correction,
             logo_base64=data.logo_base64,
         )
+    except RenderPoolBusy:
+        raise _render_busy()
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -149,42 +268,358 @@ async def create_qr_code(
     # Сохраняем в БД
     qr_code = QRCode(
         user_id=current_user.id,
-        url_id=data.url_id,
+        url_id=linked_url.id if linked_url else None,
+        owns_url=owns_url,
         content=content,
-        title=data.title or _generate_default_title(content),
-        qr_image_base64=qr_image_base64,
+        title=title,
+        image_digest=blob_store.put(qr_png),
         foreground_color=data.foreground_color,
         background_color=data.background_color,
         style=data.style,
         box_size=data.box_size,
         border_size=data.border_size,
         error_correction=data.error_correction,
-        logo_base64=data.logo_base64,
+        logo_digest=blob_store.put_base64(data.logo_base64),
     )
 
     db.add(qr_code)
     db.commit()
     db.refresh(qr_code)
 
+    # Миниатюра для галереи — в фоне
+    qr_service.prerender_sizes(render_params(qr_code))
+
     return _build_response(qr_code, linked_url)
 
 
+# ─── ПАКЕТНОЕ СОЗДАНИЕ ───────────────────────────────────────────
+
+@router.post("/batch", response_model=QRCodeBatchResponse, status_code=201)
+async def create_qr_codes_batch(
+    data: QRCodeBatchRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Создать QR-коды пачкой: по одному на каждую ссылку из url_ids
+    и на каждую строку из contents, с общим оформлением.
+
+    Рендеринг идёт параллельно в пуле процессов. Пакет атомарен:
+    если хоть один рендер не удался (или очередь переполнена — 429),
+    ничего не сохраняется; готовые рендеры остаются в кэше.
+    """
+    _resolve_logo(data, db, current_user)
+
+    # (content, привязанная ссылка, title)
+    targets = []
+    if data.url_ids:
+        links = db.query(URL).filter(
+            URL.id.in_(data.url_ids),
+            URL.user_id == current_user.id,
+        ).all()
+        by_id = {link.id: link for link in links}
+
+        missing = [url_id for url_id in data.url_ids if url_id not in by_id]
+        if missing:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Ссылки не найдены или не принадлежат вам: {missing}",
+            )
+        for url_id in data.url_ids:
+            content = short_link(by_id[url_id])
+            targets.append((content, by_id[url_id], _generate_default_title(content)))
+    targets += [
+        (content, None, _generate_default_title(content)) for content in data.contents
+    ]
+
+    qr_count = db.query(QRCode).filter(
+        QRCode.user_id == current_user.id
+    ).count()
+
+    if qr_count + len(targets) > 50:  # Лимит для бесплатного плана
+        raise HTTPException(
+            status_code=403,
+            detail=f"Превышен лимит QR-кодов (50). Доступно: {max(50 - qr_count, 0)}.",
+        )
+
+    # Динамические QR: для http(s)-контента — свои короткие ссылки
+    owned = set()
+    for i, (content, linked_url, title) in enumerate(targets):
+        if linked_url is None and is_redirectable(content):
+            linked_url = create_target_link(db, current_user.id, content, title)
+            targets[i] = (short_link(linked_url), linked_url, title)
+            owned.add(i)
+
+    style = data.model_dump(include=set(QRCodeStyle.model_fields) - {"logo_id"})
+    try:
+        pngs = await qr_service.render_qr_png_many(
+            [dict(style, content=content) for content, _, _ in targets]
+        )
+    except RenderPoolBusy:
+        raise _render_busy()
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Ошибка генерации QR-кода: {str(e)}",
+        )
+
+    # Логотип общий для всей пачки — в blob store один раз
+    columns = dict(style)
+    columns["logo_digest"] = blob_store.put_base64(columns.pop("logo_base64"))
+    qr_codes = [
+        QRCode(
+            user_id=current_user.id,
+            url_id=linked_url.id if linked_url else None,
+            owns_url=i in owned,
+            content=content,
+            title=title,
+            image_digest=blob_store.put(qr_png),
+            **columns,
+        )
+        for i, ((content, linked_url, title), qr_png) in enumerate(zip(targets, pngs))
+    ]
+    db.add_all(qr_codes)
+    db.flush()
+    ids = [qr.id for qr in qr_codes]
+    db.commit()
+
+    # Одним запросом на таблицу обновляем все объекты после commit
+    db.query(QRCode).filter(QRCode.id.in_(ids)).all()
+    link_ids = {qr.url_id for qr in qr_codes} - {None}
+    if link_ids:
+        db.query(URL).filter(URL.id.in_(link_ids)).all()
+
+    for content, _, _ in targets:
+        qr_service.prerender_sizes(dict(style, content=content))
+
+    return QRCodeBatchResponse(items=[
+        _build_response(qr, linked_url, include_images=False)
+        for qr, (_, linked_url, _) in zip(qr_codes, targets)
+    ])
+
+
+# ─── ЭКСПОРТ В ZIP ──────────────────────────────────────────────
+
+@router.get("/export.zip")
+async def export_qr_codes(
+    format: str = Query("png", pattern="^(png|svg|all)$"),
+    ids: Optional[List[int]] = Query(None),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Скачать QR-коды пользователя одним ZIP-архивом.
+
+    format — png, svg или all (оба). ids — ограничить набор.
+
+    Архив отдаётся потоком по мере сборки (целиком в памяти не
+    держится): PNG читаются из blob store, SVG — из кэша рендеров.
+    """
+    query = db.query(
+        QRCode.id,
+        QRCode.image_digest,
+        QRCode.content,
+        QRCode.foreground_color,
+        QRCode.background_color,
+        QRCode.box_size,
+        QRCode.border_size,
+        QRCode.error_correction,
+    ).filter(QRCode.user_id == current_user.id)
+    if ids:
+        query = query.filter(QRCode.id.in_(ids))
+
+    # Сессия закрывается до начала стрима — выбираем строки заранее
+    rows = query.order_by(QRCode.id).all()
+    if not rows:
+        raise HTTPException(status_code=404, detail="QR-коды не найдены")
+
+    formats = ("png", "svg") if format == "all" else (format,)
+
+    def members():
+        for row in rows:
+            if "png" in formats:
+                yield (
+                    f"qr_{row.id}.png",
+                    lambda digest=row.image_digest: blob_store.get(digest) or b"",
+                    False,  # PNG уже сжат
+                )
+            if "svg" in formats:
+                yield (
+                    f"qr_{row.id}.svg",
+                    lambda row=row: qr_service.render_qr_svg(
+                        row.content, row.foreground_color, row.background_color,
+                        row.box_size, row.border_size, row.error_correction,
+                    ),
+                    True,
+                )
+
+    return StreamingResponse(
+        stream_zip(members()),
+        media_type="application/zip",
+        headers={"Content-Disposition": 'attachment; filename="qr_codes.zip"'},
+    )
+
+
+# ─── PNG НУЖНОГО РАЗМЕРА ────────────────────────────────────────
+
+@router.get("/{qr_id}.png")
+async def get_qr_png_sized(
+    qr_id: int,
+    request: Request,
+    size: Optional[int] = Query(None, ge=32, le=4096),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    PNG QR-кода заданного размера (миниатюры, печать).
+
+    size округляется вверх до одного из SIZE_BUCKETS, изображение
+    рисуется из матрицы модулей с подходящим box_size (не шире
+    размера корзины, если модулей не больше, чем пикселей) и
+    кэшируется. Без size — исходное изображение.
+    """
+    qr_code = db.query(QRCode).filter(
+        QRCode.id == qr_id,
+        QRCode.user_id == current_user.id,
+    ).first()
+
+    if not qr_code:
+        raise HTTPException(status_code=404, detail="QR-код не найден")
+
+    if size is None:
+        etag = make_etag(qr_code.image_digest)
+        if etag_matches(request, etag):
+            return not_modified(etag, REVALIDATE)
+        image_data = blob_store.get(qr_code.image_digest)
+        if image_data is None:
+            raise HTTPException(status_code=404, detail="Изображение не найдено")
+        return Response(
+            content=image_data,
+            media_type="image/png",
+            headers=cache_headers(etag, REVALIDATE),
+        )
+
+    # Тег — по сохранённым полям; логотип читается только при промахе
+    etag = make_etag(sized_png_etag(qr_code, size))
+    if etag_matches(request, etag):
+        return not_modified(etag, REVALIDATE)
+
+    params = qr_service.sized_png_params(render_params(qr_code), size)
+
+    try:
+        qr_png = await qr_service.render_qr_png_async(**params)
+    except RenderPoolBusy:
+        raise _render_busy()
+
+    return Response(
+        content=qr_png,
+        media_type="image/png",
+        headers=cache_headers(etag, REVALIDATE),
+    )
+
+
+# ─── БИБЛИОТЕКА ЛОГОТИПОВ ───────────────────────────────────────
+
+@router.post("/logos", response_model=LogoResponse, status_code=201)
+async def upload_logo(
+    data: LogoUploadRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Загрузить логотип в библиотеку.
+
+    Логотип проверяется и нормализуется один раз; дальше его можно
+    передавать в logo_id при создании и превью QR-кодов. Повторная
+    загрузка того же изображения возвращает существующую запись.
+    """
+    try:
+        logo = add_logo(db, current_user.id, data.logo_base64)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return _logo_response(logo)
+
+
+@router.get("/logos", response_model=List[LogoResponse])
+async def list_logos(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Логотипы пользователя, новые первыми."""
+    logos = (
+        db.query(Logo)
+        .filter(Logo.user_id == current_user.id)
+        .order_by(Logo.created_at.desc(), Logo.id.desc())
+        .all()
+    )
+    return [_logo_response(logo) for logo in logos]
+
+
+@router.get("/logos/{digest}.png")
+async def get_logo_image(
+    digest: str,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Изображение логотипа (адресовано по содержимому)."""
+    owned = db.query(Logo.id).filter(
+        Logo.digest == digest,
+        Logo.user_id == current_user.id,
+    ).first()
+    if not owned:
+        raise HTTPException(status_code=404, detail="Логотип не найден")
+
+    etag = make_etag(digest)
+    if etag_matches(request, etag):
+        return not_modified(etag, IMMUTABLE)
+
+    data = blob_store.get(digest)
+    if data is None:
+        raise HTTPException(status_code=404, detail="Логотип не найден")
+    return Response(content=data, media_type="image/png", headers=cache_headers(etag, IMMUTABLE))
+
+
+@router.delete("/logos/{logo_id}", status_code=204)
+async def delete_logo(
+    logo_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Удалить логотип из библиотеки (QR-коды с ним не меняются)."""
+    logo = db.query(Logo).filter(
+        Logo.id == logo_id,
+        Logo.user_id == current_user.id,
+    ).first()
+    if not logo:
+        raise HTTPException(status_code=404, detail="Логотип не найден")
+
+    digest = logo.digest
+    db.delete(logo)
+    db.commit()
+    delete_unused_blobs(db, [digest])
+    return None
+
+
 # ─── ПРЕВЬЮ (без сохранения) ─────────────────────────────────────
 
 @router.post("/preview", response_model=QRCodePreviewResponse)
 async def preview_qr_code(
     data: QRCodePreviewRequest,
+    db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
     """
     Сгенерировать превью QR-кода без сохранения в БД.
     Используется для live preview в конструкторе.
+
+    Рендеринг идёт в пуле процессов; если пользователь успел запросить
+    новое превью, текущее отменяется (409), при перегрузке — 429.
     """
-    if data.logo_base64 and not validate_logo_base64(data.logo_base64):
-        raise HTTPException(status_code=400, detail="Невалидный логотип")
+    _resolve_logo(data, db, current_user)
 
     try:
-        qr_image_base64 = generate_qr_image(
+        qr_png = await qr_service.render_qr_png_async(
             content=data.content,
             foreground_color=data.foreground_color,
             background_color=data.background_color,
@@ -193,11 +628,16 @@ async def preview_qr_code(
             border_size=data.border_size,
             error_correction=data.error_correction,
             logo_base64=data.logo_base64,
+            preview_for=current_user.id,
         )
+    except RenderPoolBusy:
+        raise _render_busy()
+    except RenderSuperseded:
+        raise HTTPException(status_code=409, detail="Превью заменено более новым запросом")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-    return QRCodePreviewResponse(qr_image_base64=qr_image_base64)
+    return QRCodePreviewResponse(qr_image_base64=base64.b64encode(qr_png).decode("utf-8"))
 
 
 # ─── СПИСОК ─────────────────────────────────────────────────────
@@ -206,46 +646,60 @@ async def preview_qr_code(
 async def get_qr_codes(
     page: int = Query(1, ge=1),
     per_page: int = Query(12, ge=1, le=50),
+    cursor: str = Query(None),
+    with_total: bool = Query(True),
     search: str = Query(None),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    """Получить список QR-кодов текущего пользователя с пагинацией."""
-    query = db.query(QRCode).filter(QRCode.user_id == current_user.id)
-
-    # Поиск по title и content
-    if search:
-        search_term = f"%{search}%"
-        query = query.filter(
-            (QRCode.title.ilike(search_term)) |
-            (QRCode.content.ilike(search_term))
-        )
+    """
+    Получить список QR-кодов текущего пользователя с пагинацией.
+
+    Поддерживается как постраничная навигация (page), так и курсорная:
+    next_cursor из ответа передаётся в параметре cursor. Подсчёт total
+    можно отключить (with_total=false) — он ограничен TOTAL_COUNT_CAP.
+    """
+    # Привязанные ссылки грузим одним дополнительным запросом на страницу
+    query = (
+        db.query(QRCode)
+        .options(selectinload(QRCode.url))
+        .filter(QRCode.user_id == current_user.id)
+    )
+
+    # Поиск по title и content (FTS-индекс, с ранжированием)
+    query, rank = apply_search(query, QRCode, search)
 
     # Считаем total
-    total = query.count()
-    pages = math.ceil(total / per_page) if total > 0 else 1
+    total, pages, total_exact = None, None, True
+    if with_total:
+        total, total_exact = count_total(query)
+        pages = math.ceil(total / per_page) if total > 0 else 1
 
     # Пагинация
-    qr_codes = query.order_by(desc(QRCode.created_at)) \
-        .offset((page - 1) * per_page) \
-        .limit(per_page) \
-        .all()
+    qr_codes, next_cursor = paginate(
+        query,
+        keyset_order(QRCode, rank),
+        per_page,
+        cursor=cursor,
+        skip=(page - 1) * per_page,
+    )
 
     # Собираем ответ с данными привязанных ссылок
-    items = []
-    for qr in qr_codes:
-        linked_url = None
-        if qr.url_id:
-            linked_url = db.query(URL).filter(URL.id == qr.url_id).first()
-        items.append(_build_response(qr, linked_url))
-
-    return QRCodeListResponse(
-        items=items,
-        total=total,
-        page=page,
-        per_page=per_page,
-        pages=pages,
-    )
+    items = [
+        _build_response(qr, qr.url, include_images=False) for qr in qr_codes
+    ]
+
+    # Элементы собраны нами же по схеме QRCodeResponse — повторная
+    # валидация через response_model не нужна
+    return ORJSONResponse({
+        "items": items,
+        "total": total,
+        "total_exact": total_exact,
+        "page": page,
+        "per_page": per_page,
+        "pages": pages,
+        "next_cursor": next_cursor,
+    })
 
 
 # ─── ПОЛУЧИТЬ ОДИН ──────────────────────────────────────────────
@@ -257,7 +711,7 @@ async def get_qr_code(
     current_user: User = Depends(get_current_user),
 ):
     """Получить конкретный QR-код по ID."""
-    qr_code = db.query(QRCode).filter(
+    qr_code = db.query(QRCode).options(joinedload(QRCode.url)).filter(
         QRCode.id == qr_id,
         QRCode.user_id == current_user.id,
     ).first()
@@ -265,11 +719,7 @@ async def get_qr_code(
     if not qr_code:
         raise HTTPException(status_code=404, detail="QR-код не найден")
 
-    linked_url = None
-    if qr_code.url_id:
-        linked_url = db.query(URL).filter(URL.id == qr_code.url_id).first()
-
-    return _build_response(qr_code, linked_url)
+    return _build_response(qr_code, qr_code.url)
 
 
 # ─── ОБНОВЛЕНИЕ ─────────────────────────────────────────────────
@@ -278,15 +728,23 @@ async def get_qr_code(
 async def update_qr_code(
     qr_id: int,
     data: QRCodeUpdateRequest,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
     """
     Обновить QR-код.
-    
-    Можно обновить только title. Для изменения дизайна нужно создать новый QR.
+
+    - title — название;
+    - destination — новый адрес динамического QR-кода: меняется только
+      его короткая ссылка, изображение остаётся прежним. Ссылки,
+      созданные пользователем (url_id при создании), меняются через
+      API ссылок;
+    - design — поля оформления (только переданные). Параметры
+      сохраняются сразу, а PNG перерисовывается в фоне; до этого
+      image_url отдаёт старое изображение.
     """
-    qr_code = db.query(QRCode).filter(
+    qr_code = db.query(QRCode).options(joinedload(QRCode.url)).filter(
         QRCode.id == qr_id,
         QRCode.user_id == current_user.id,
     ).first()
@@ -294,20 +752,54 @@ async def update_qr_code(
     if not qr_code:
         raise HTTPException(status_code=404, detail="QR-код не найден")
 
-    # Обновляем только title
     if data.title is not None:
         qr_code.title = data.title
 
+    if data.destination is not None:
+        if qr_code.url is None:
+            raise HTTPException(
+                status_code=400,
+                detail="Адрес статического QR-кода зашит в изображение — создайте новый QR",
+            )
+        if not qr_code.owns_url:
+            # Ссылку создал пользователь, на неё могут ссылаться и другие
+            # QR-коды — меняется она только через API ссылок
+            raise HTTPException(
+                status_code=400,
+                detail="QR-код привязан к вашей ссылке — измените её адрес "
+                f"через PATCH /api/v1/links/{qr_code.url_id}",
+            )
+        qr_code.url.original_url = data.destination
+
+    redesigned = False
+    old_logo_digest = qr_code.logo_digest
+    if data.design is not None and data.design.model_fields_set:
+        design = data.design
+        fields = design.model_fields_set
+        before = render_params(qr_code)
+
+        for field in _DESIGN_FIELDS & fields:
+            setattr(qr_code, field, getattr(design, field))
+        if fields & {"logo_id", "logo_base64"}:
+            _resolve_logo(design, db, current_user)
+            qr_code.logo_digest = blob_store.put_base64(design.logo_base64)
+
+        redesigned = render_params(qr_code) != before
+
     qr_code.updated_at = datetime.utcnow()
 
     db.commit()
-    db.refresh(qr_code)
 
-    linked_url = None
-    if qr_code.url_id:
-        linked_url = db.query(URL).filter(URL.id == qr_code.url_id).first()
+    if old_logo_digest and old_logo_digest != qr_code.logo_digest:
+        delete_unused_blobs(db, [old_logo_digest])
+    if redesigned:
+        background_tasks.add_task(qr_rerenderer.rerender, qr_id)
 
-    return _build_response(qr_code, linked_url)
+    qr_code = db.query(QRCode).options(joinedload(QRCode.url)).filter(
+        QRCode.id == qr_id
+    ).one()
+
+    return _build_response(qr_code, qr_code.url)
 
 
 # ─── УДАЛЕНИЕ ───────────────────────────────────────────────────
@@ -318,7 +810,12 @@ async def delete_qr_code(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    """Удалить QR-код."""
+    """
+    Удалить QR-код.
+
+    Короткая ссылка, созданная вместе с динамическим QR, удаляется
+    вместе с ним; ссылки, созданные пользователем, остаются.
+    """
     qr_code = db.query(QRCode).filter(
         QRCode.id == qr_id,
         QRCode.user_id == current_user.id,
@@ -327,26 +824,75 @@ async def delete_qr_code(
     if not qr_code:
         raise HTTPException(status_code=404, detail="QR-код не найден")
 
+    digests = {qr_code.image_digest, qr_code.logo_digest} - {None}
+    owned_url = db.get(URL, qr_code.url_id) if qr_code.owns_url and qr_code.url_id else None
+
     db.delete(qr_code)
+    if owned_url is not None:
+        db.delete(owned_url)
     db.commit()
+    delete_unused_blobs(db, digests)
 
     return None
 
 
+# ─── ИЗОБРАЖЕНИЕ ПО DIGEST ──────────────────────────────────────
+
+@router.get("/images/{digest}.png")
+async def get_qr_image(
+    digest: str,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Отдать PNG из blob store (только для QR-кодов текущего пользователя).
+
+    URL адресован по содержимому, поэтому ответ кэшируется навсегда.
+    """
+    owned = db.query(QRCode.id).filter(
+        QRCode.image_digest == digest,
+        QRCode.user_id == current_user.id,
+    ).first()
+    if not owned:
+        raise HTTPException(status_code=404, detail="Изображение не найдено")
+
+    etag = make_etag(digest)
+    if etag_matches(request, etag):
+        return not_modified(etag, IMMUTABLE)
+
+    image_data = blob_store.get(digest)
+    if image_data is None:
+        raise HTTPException(status_code=404, detail="Изображение не найдено")
+
+    return Response(
+        content=image_data,
+        media_type="image/png",
+        headers=cache_headers(etag, IMMUTABLE),
+    )
+
+
 # ─── СКАЧИВАНИЕ ─────────────────────────────────────────────────
 
 @router.get("/{qr_id}/download/{format}")
 async def download_qr_code(
     qr_id: int,
     format: str,
+    request: Request,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
     """
     Скачать QR-код в формате PNG или SVG.
-    
-    PNG берётся из базы (уже сгенерированный),
-    SVG генерируется на лету.
+
+    PNG берётся из blob store (уже сгенерированный),
+    SVG — из кэша рендеров (или генерируется), в том числе
+    предсжатый gzip/br вариант по Accept-Encoding.
+
+    ETag выводится из параметров рендера: для PNG это digest
+    изображения, для SVG — ключ кэша. Если клиент прислал
+    совпадающий If-None-Match — отвечаем 304 без тела и без
+    записи в БД. Счётчик скачиваний копится в буфере.
     """
     qr_code = db.query(QRCode).filter(
         QRCode.id == qr_id,
@@ -356,26 +902,28 @@ async def download_qr_code(
     if not qr_code:
         raise HTTPException(status_code=404, detail="QR-код не найден")
 
-    # Инкрементируем счётчик скачиваний
-    qr_code.downloads_count += 1
-    db.commit()
-
     format = format.lower()
 
     if format == "png":
-        # Декодируем base64 и возвращаем PNG
-        image_data = base64.b64decode(qr_code.qr_image_base64)
+        etag = make_etag(qr_code.image_digest)
+        if etag_matches(request, etag):
+            return not_modified(etag, REVALIDATE)
+
+        # PNG берём из blob store
+        image_data = blob_store.get(qr_code.image_digest)
+        if image_data is None:
+            raise HTTPException(status_code=404, detail="Изображение не найдено")
+        qr_downloads.increment(qr_code.id)
         return Response(
             content=image_data,
             media_type="image/png",
-            headers={
+            headers=cache_headers(etag, REVALIDATE, {
                 "Content-Disposition": f'attachment; filename="qr_{qr_code.id}.png"'
-            },
+            }),
         )
 
     elif format == "svg":
-        # Генерируем SVG на лету
-        svg_content = generate_qr_svg(
+        params = dict(
             content=qr_code.content,
             foreground_color=qr_code.foreground_color,
             background_color=qr_code.background_color,
@@ -383,12 +931,25 @@ async def download_qr_code(
             border_size=qr_code.border_size,
             error_correction=qr_code.error_correction,
         )
+        # Предсжатый вариант (gzip/br), если клиент его принимает
+        encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+        etag = make_etag(qr_service.svg_render_key(**params, encoding=encoding))
+        if etag_matches(request, etag):
+            return not_modified(etag, REVALIDATE, {"Vary": "Accept-Encoding"})
+
+        svg_content = qr_service.render_qr_svg(**params, encoding=encoding)
+        qr_downloads.increment(qr_code.id)
+
+        headers = {
+            "Content-Disposition": f'attachment; filename="qr_{qr_code.id}.svg"',
+            "Vary": "Accept-Encoding",
+        }
+        if encoding:
+            headers["Content-Encoding"] = encoding
         return Response(
             content=svg_content,
             media_type="image/svg+xml",
-            headers={
-                "Content-Disposition": f'attachment; filename="qr_{qr_code.id}.svg"'
-            },
+            headers=cache_headers(etag, REVALIDATE, headers),
         )
 
     else:
@@ -21,13 +21,14 @@ async def redirect_to_url(
     if not url:
         raise HTTPException(status_code=404, detail="Link not found")
 
-    # Check if active and not expired
-    if not url.is_active:
-        raise HTTPException(status_code=410, detail="Link is disabled")
-
+    # Check if expired and active (expired links are also deactivated
+    # by the expiry scheduler, so check expiry first for the right message)
     if url.is_expired:
         raise HTTPException(status_code=410, detail="Link has expired")
 
+    if not url.is_active:
+        raise HTTPException(status_code=410, detail="Link is disabled")
+
     # Track click
     _track_click(db, url, request)
 
@@ -4,6 +4,10 @@ from pydantic_settings import BaseSettings
 class Settings(BaseSettings):
     # Database
     DATABASE_URL: str = "sqlite:///./gosha.db"
+    # Apply pending migrations when the app starts. Turn off when they
+    # are run ahead of deploy (python -m app.migrations); startup then
+    # only warns if the schema is behind.
+    MIGRATE_ON_STARTUP: bool = True
 
     # JWT
     SECRET_KEY: str = "your-super-secret-key-change-in-production-please"
@@ -14,6 +18,74 @@ class Settings(BaseSettings):
     # App
     BASE_URL: str = "http://localhost:8000"
     SHORT_CODE_LENGTH: int = 6
+    # Compiled Jinja2 templates, shared by workers ("" = no disk cache)
+    TEMPLATE_CACHE_DIR: str = ".jinja_cache"
+    # Adds a Server-Timing header (app/db/render time) to every response
+    # and re-checks templates for edits on each render
+    DEBUG: bool = False
+
+    # Request/DB/cache metrics, scraped from /metrics in Prometheus
+    # format; keep the endpoint off the public internet at the proxy
+    METRICS_ENABLED: bool = True
+    # Multi-worker server: workers publish their counters here so any
+    # worker can answer /metrics with totals for all of them
+    METRICS_DIR: str = ".metrics"
+    METRICS_SNAPSHOT_SECONDS: float = 2.0
+    # Statements slower than this (0 = off) are kept with their query
+    # plan in a per-worker ring buffer (/api/v1/admin/slow-queries)
+    SLOW_QUERY_THRESHOLD_MS: int = 250
+    SLOW_QUERY_LOG_SIZE: int = 100
+    # Keep parameter values (emails, password hashes...) instead of
+    # only their types; for local debugging only
+    SLOW_QUERY_LOG_PARAMETERS: bool = False
+    # Upper bound for one admin sampling profile (/api/v1/admin/profile)
+    PROFILER_MAX_SECONDS: int = 60
+
+    # Production server (python -m app.server); 0 workers = one per core,
+    # 0 concurrency limit = unlimited
+    SERVER_HOST: str = "0.0.0.0"
+    SERVER_PORT: int = 8000
+    SERVER_WORKERS: int = 0
+    SERVER_BACKLOG: int = 2048
+    SERVER_KEEPALIVE_SECONDS: int = 5
+    SERVER_LIMIT_CONCURRENCY: int = 0
+    SERVER_GRACEFUL_TIMEOUT_SECONDS: int = 30
+    SERVER_FORWARDED_ALLOW_IPS: str = "127.0.0.1"
+    # A worker that exits sooner than this after starting failed fast:
+    # it is restarted with growing backoff, and after this many fast
+    # failures in a row the server gives up
+    SERVER_WORKER_MIN_UPTIME_SECONDS: float = 5.0
+    SERVER_MAX_FAST_RESTARTS: int = 5
+
+    # Expired links are deactivated in the background; the scheduler
+    # sleeps until the next expiry but re-checks at least this often
+    EXPIRY_SCHEDULER_ENABLED: bool = True
+    EXPIRY_CHECK_MAX_INTERVAL_SECONDS: int = 300
+
+    # QR render cache: in-memory LRU, evicted renders spill to disk
+    # (set QR_CACHE_DISK_MAX_BYTES=0 to disable the disk tier)
+    QR_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    QR_CACHE_DIR: str = ".qr_cache"
+    QR_CACHE_DISK_MAX_BYTES: int = 512 * 1024 * 1024
+
+    # QR rendering runs in a worker pool (0 = one worker per CPU core);
+    # at QR_RENDER_MAX_PENDING distinct renders in flight requests get 429
+    QR_RENDER_EXECUTOR: str = "process"
+    QR_RENDER_WORKERS: int = 0
+    QR_RENDER_MAX_PENDING: int = 32
+
+    # Buffered counters (QR downloads) are written to the DB this often
+    COUNTER_FLUSH_INTERVAL_SECONDS: float = 5.0
+
+    # Blob store for QR images and logos: local | s3 | s3-local
+    BLOB_STORE_BACKEND: str = "local"
+    BLOB_STORE_DIR: str = "storage/blobs"
+    BLOB_S3_BUCKET: str = "gosha"
+    BLOB_S3_PREFIX: str = "blobs"
+    BLOB_S3_ENDPOINT_URL: str = ""
+    # Unreferenced blobs younger than this are kept: a concurrent request
+    # may have stored the same blob and not yet committed its row
+    BLOB_GC_GRACE_SECONDS: int = 300
 
     # Admin (создаётся при первом запуске)
     ADMIN_EMAIL: str = "admin@gosha.link"
@@ -0,0 +1,155 @@
+"""
+Fingerprinted, precompressed static assets.
+
+On first use (the app builds it at startup) every file under
+app/static, except user uploads, is read once. Each file gets a
+content hash in its name (css/base.css -> css/base.1a2b3c4d5e.css), and
+text files also get gzip and, when `brotli` is installed, br variants,
+all kept in memory.
+
+- Fingerprinted URLs never change their bytes. They are served with
+  `Cache-Control: immutable` for a year and the best encoding the client
+  accepts, plus `Vary: Accept-Encoding`.
+- Plain URLs (/static/css/base.css) still work but are revalidated with
+  their ETag on every use.
+- Anything else, such as uploaded avatars, falls through to StaticFiles.
+
+Templates link assets through the `static_url()` global:
+
+    <link rel="stylesheet" href="{{ static_url('css/base.css') }}">
+"""
+
+import hashlib
+import mimetypes
+import threading
+from pathlib import Path, PurePosixPath
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import Scope
+
+from app.core.compression import AVAILABLE_ENCODINGS, compress, negotiate_encoding
+from app.core.http_cache import etag_matches, make_etag
+
+# Fingerprinted URLs: shared caches may keep them for a year
+IMMUTABLE_PUBLIC = "public, max-age=31536000, immutable"
+REVALIDATE_PUBLIC = "public, no-cache"
+
+COMPRESSIBLE_SUFFIXES = {".css", ".js", ".mjs", ".svg", ".json", ".txt", ".html", ".map"}
+# Directories holding runtime (user) content, never fingerprinted
+DEFAULT_EXCLUDE = ("uploads",)
+HASH_LENGTH = 10
+
+STATIC_DIR = "app/static"
+
+
+class Asset(NamedTuple):
+    path: str  # logical, relative to the static root
+    fingerprinted: str
+    media_type: str
+    digest: str
+    # content-coding (None = identity) -> bytes
+    variants: Dict[Optional[str], bytes]
+
+
+def fingerprint(path: str, digest: str) -> str:
+    """css/base.css + digest -> css/base.<digest[:HASH_LENGTH]>.css"""
+    pure = PurePosixPath(path)
+    return str(pure.with_name(f"{pure.stem}.{digest[:HASH_LENGTH]}{pure.suffix}"))
+
+
+def _load(root: Path, file: Path) -> Asset:
+    data = file.read_bytes()
+    path = file.relative_to(root).as_posix()
+    digest = hashlib.sha256(data).hexdigest()
+    media_type = mimetypes.guess_type(file.name)[0] or "application/octet-stream"
+    if media_type.startswith("text/") or media_type == "application/javascript":
+        media_type += "; charset=utf-8"
+
+    variants: Dict[Optional[str], bytes] = {None: data}
+    if file.suffix in COMPRESSIBLE_SUFFIXES:
+        for encoding in AVAILABLE_ENCODINGS:
+            compressed = compress(data, encoding)
+            # Tiny files can grow; those are served as-is
+            if len(compressed) < len(data):
+                variants[encoding] = compressed
+    return Asset(path, fingerprint(path, digest), media_type, digest, variants)
+
+
+class StaticAssets(StaticFiles):
+    """StaticFiles that serves the fingerprinted in-memory copies first."""
+
+    def __init__(
+        self, *, directory: str, prefix: str = "/static",
+        exclude: Tuple[str, ...] = DEFAULT_EXCLUDE, **kwargs,
+    ):
+        super().__init__(directory=directory, **kwargs)
+        self.root = Path(directory)
+        self.prefix = prefix.rstrip("/")
+        self.exclude = exclude
+        self._by_path: Dict[str, Asset] = {}
+        self._by_fingerprint: Dict[str, Asset] = {}
+        self._built = False
+        self._lock = threading.Lock()
+
+    def build(self) -> int:
+        """Read, hash and compress all assets (idempotent). Returns the count."""
+        with self._lock:
+            if not self._built:
+                for file in sorted(self.root.rglob("*")):
+                    relative = file.relative_to(self.root)
+                    if not file.is_file() or relative.parts[0] in self.exclude:
+                        continue
+                    if file.name.startswith("."):
+                        continue
+                    asset = _load(self.root, file)
+                    self._by_path[asset.path] = asset
+                    self._by_fingerprint[asset.fingerprinted] = asset
+                self._built = True
+            return len(self._by_path)
+
+    def url(self, path: str) -> str:
+        """Fingerprinted URL of `path` (relative to the static root)."""
+        self.build()
+        path = path.lstrip("/")
+        asset = self._by_path.get(path)
+        return f"{self.prefix}/{asset.fingerprinted if asset else path}"
+
+    def manifest(self) -> Dict[str, str]:
+        self.build()
+        return {path: asset.fingerprinted for path, asset in self._by_path.items()}
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        if scope["method"] in ("GET", "HEAD"):
+            self.build()
+            asset = self._by_fingerprint.get(path)
+            if asset is not None:
+                return _asset_response(asset, scope, IMMUTABLE_PUBLIC)
+            asset = self._by_path.get(path)
+            if asset is not None:
+                return _asset_response(asset, scope, REVALIDATE_PUBLIC)
+        return await super().get_response(path, scope)
+
+
+def _asset_response(asset: Asset, scope: Scope, cache_control: str) -> Response:
+    headers = Headers(scope=scope)
+    available = tuple(e for e in AVAILABLE_ENCODINGS if e in asset.variants)
+    encoding = negotiate_encoding(headers.get("accept-encoding"), available)
+
+    etag = make_etag(f"{asset.digest[:32]}-{encoding}" if encoding else asset.digest[:32])
+    response_headers = {"ETag": etag, "Cache-Control": cache_control}
+    if len(asset.variants) > 1:
+        response_headers["Vary"] = "Accept-Encoding"
+
+    if etag_matches(Request(scope), etag):
+        return Response(status_code=304, headers=response_headers)
+
+    if encoding:
+        response_headers["Content-Encoding"] = encoding
+    return Response(asset.variants[encoding], media_type=asset.media_type, headers=response_headers)
+
+
+static_assets = StaticAssets(directory=STATIC_DIR)
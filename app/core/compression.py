@@ -0,0 +1,60 @@
+"""
+Precompressed response variants.
+
+gzip is always available; brotli is used when the optional `brotli`
+package is installed. Variants are produced once and cached by the
+caller, so compression cost is not paid per request.
+"""
+
+import gzip
+from typing import Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+# Preferred first
+AVAILABLE_ENCODINGS: Tuple[str, ...] = ("br", "gzip") if brotli else ("gzip",)
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    """Compress `data` with a content-coding from AVAILABLE_ENCODINGS."""
+    if encoding == "gzip":
+        # mtime=0 keeps the output (and therefore its ETag) deterministic
+        return gzip.compress(data, compresslevel=9, mtime=0)
+    if encoding == "br" and brotli is not None:
+        return brotli.compress(data, quality=11)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+def negotiate_encoding(
+    accept_encoding: Optional[str],
+    available: Tuple[str, ...] = AVAILABLE_ENCODINGS,
+) -> Optional[str]:
+    """
+    Pick the best content-coding the client accepts.
+
+    Honors q=0 exclusions; among acceptable codings the server's order
+    of preference wins. Returns None for identity.
+    """
+    if not accept_encoding:
+        return None
+
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+
+    for encoding in available:
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > 0:
+            return encoding
+    return None
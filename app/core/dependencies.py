@@ -50,6 +50,41 @@ async def get_current_user(
     return user
 
 
+class LoginRedirect(Exception):
+    """A page needs a signed-in user; answered with a redirect to /login."""
+
+
+async def get_page_user(
+    request: Request,
+    db: Session = Depends(get_db),
+) -> User:
+    """
+    Dependency for HTML pages: same check as get_current_user, but a
+    failure redirects to /login and clears the access_token cookie
+    instead of answering 401. Otherwise a signed token of a deleted or
+    deactivated user would bounce between /login and /dashboard.
+    """
+    try:
+        return await get_current_user(request, db)
+    except HTTPException:
+        raise LoginRedirect()
+
+
+def has_access_token(request: Request) -> bool:
+    """
+    Cheap probe: does the cookie hold a validly signed, unexpired access token?
+
+    No DB lookup. Public pages use it only to decide whether to redirect
+    to the dashboard, which then performs the full check (get_page_user)
+    and drops the cookie if it fails.
+    """
+    token = request.cookies.get("access_token")
+    if not token:
+        return False
+    payload = decode_token(token)
+    return bool(payload) and payload.get("type") == "access"
+
+
 async def get_current_user_optional(
     request: Request,
     db: Session = Depends(get_db),
@@ -74,3 +109,10 @@ async def require_admin(
             detail="Admin privileges required",
         )
     return current_user
+
+
+async def require_page_admin(
+    current_user: User = Depends(get_page_user),
+) -> User:
+    """Dependency: admin-only pages (signed-out visitors go to /login)."""
+    return await require_admin(current_user)
@@ -0,0 +1,75 @@
+"""
+Conditional GET helpers.
+
+Responses carry a strong ETag; when the client's If-None-Match already
+names it, the handler answers 304 Not Modified with no body.
+"""
+
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+from fastapi import Request, Response
+
+# Content-addressed URLs never change their bytes
+IMMUTABLE = "private, max-age=31536000, immutable"
+
+# Stable URLs whose content may change: always revalidate via ETag
+REVALIDATE = "private, no-cache"
+
+# Same for pages that are identical for every visitor
+PUBLIC_REVALIDATE = "public, no-cache"
+
+
+def make_etag(value: str) -> str:
+    """Quote an opaque validator (e.g. a content digest) as a strong ETag."""
+    return f'"{value}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Whether If-None-Match matches `etag` (weak comparison, RFC 9110)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in header.split(","))
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def unmodified_since(request: Request, last_modified: datetime) -> bool:
+    """
+    Whether If-Modified-Since covers `last_modified` (aware, UTC).
+
+    Only consulted without If-None-Match, which takes precedence.
+    """
+    header = request.headers.get("if-modified-since")
+    if not header or request.headers.get("if-none-match"):
+        return False
+    try:
+        since = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        return False
+    return last_modified.replace(microsecond=0) <= since
+
+
+def not_modified(
+    etag: str, cache_control: str, extra: Optional[dict] = None
+) -> Response:
+    """Empty 304 response keeping the validators of the full one."""
+    return Response(
+        status_code=304,
+        headers=cache_headers(etag, cache_control, extra),
+    )
+
+
+def cache_headers(
+    etag: str, cache_control: str, extra: Optional[dict] = None
+) -> dict:
+    """Headers for a 200 response that can later be revalidated."""
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if extra:
+        headers.update(extra)
+    return headers
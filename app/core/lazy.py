@@ -0,0 +1,27 @@
+"""
+Deferred module imports.
+
+Heavy modules (QR rendering pulls in qrcode, PIL and numpy) are only
+needed by some requests. lazy_import() returns the module object right
+away but executes it on first attribute access, so importing the app —
+and starting a worker — does not pay for them.
+"""
+
+import importlib.util
+import sys
+from types import ModuleType
+
+
+def lazy_import(name: str) -> ModuleType:
+    """Module `name`, loaded on first attribute access."""
+    if name in sys.modules:
+        return sys.modules[name]
+
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named {name!r}", name=name)
+    spec.loader = importlib.util.LazyLoader(spec.loader)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
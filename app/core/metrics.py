@@ -0,0 +1,439 @@
+"""
+In-process metrics with Prometheus text exposition.
+
+Counters and histograms are sharded per thread: every thread updates
+its own dict without taking a lock, and a scrape sums the shards. The
+hot path is a dict lookup and a list increment. Shards of threads that
+have exited are folded into a base shard at the next scrape. Values
+that already live elsewhere (cache statistics, queue depths) are
+exported through callbacks that are evaluated only when /metrics is
+scraped.
+
+Under the multi-worker server (app.server) every worker shares its
+counters and histograms through a snapshot file in METRICS_DIR,
+rewritten every METRICS_SNAPSHOT_SECONDS and when the worker exits. A
+scrape, whichever worker answers it, adds the other workers' latest
+snapshots to its own live values, so totals cover all workers (up to
+one snapshot interval behind). Files of workers that died stay in
+place, so totals do not go backwards when a worker is restarted.
+Callback metrics are not shared: they describe the worker that
+answered the scrape.
+
+MetricsMiddleware times every HTTP request. Per request it also
+collects DB statements and time (fed by the SQLAlchemy hooks in
+app.database) and other timings such as QR rendering. With
+`server_timing` enabled these are echoed in a Server-Timing header.
+"""
+
+import abc
+import json
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+# Latency buckets in seconds
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+Labels = Tuple[str, ...]
+# metric name -> labels -> values
+Collected = Dict[str, Dict[Labels, list]]
+
+
+def _add(total: Collected, name: str, labels: Labels, values: list) -> None:
+    by_labels = total.setdefault(name, {})
+    current = by_labels.get(labels)
+    if current is None:
+        by_labels[labels] = list(values)
+    else:
+        for i, value in enumerate(values):
+            current[i] += value
+
+
+class Registry:
+    """Metric definitions plus the per-thread value shards."""
+
+    def __init__(self):
+        self._metrics: List["_Metric"] = []
+        # (owning thread, its shard); shards of dead threads go to _base
+        self._shards: List[Tuple[threading.Thread, dict]] = []
+        self._base: dict = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()  # registration and scrapes only
+        self._directory: Optional[Path] = None
+        self._stop_snapshots: Optional[threading.Event] = None
+
+    def _shard(self) -> dict:
+        try:
+            return self._local.values
+        except AttributeError:
+            values = {}
+            with self._lock:
+                self._shards.append((threading.current_thread(), values))
+            self._local.values = values
+            return values
+
+    def register(self, metric: "_Metric") -> "_Metric":
+        with self._lock:
+            if any(m.name == metric.name for m in self._metrics):
+                raise ValueError(f"Duplicate metric: {metric.name}")
+            self._metrics.append(metric)
+        return metric
+
+    def _fold_dead_shards(self) -> None:
+        """Move values of exited threads into the base shard (holding _lock)."""
+        alive = []
+        for thread, values in self._shards:
+            if thread.is_alive():
+                alive.append((thread, values))
+                continue
+            for (name, labels), shard_values in values.items():
+                base = self._base.get((name, labels))
+                if base is None:
+                    self._base[(name, labels)] = list(shard_values)
+                else:
+                    for i, value in enumerate(shard_values):
+                        base[i] += value
+        self._shards = alive
+
+    def _local_values(self) -> Collected:
+        """This process: base shard plus the live thread shards."""
+        collected: Collected = {}
+        with self._lock:
+            self._fold_dead_shards()
+            shards = [self._base] + [values for _, values in self._shards]
+            for shard in shards:
+                for (name, labels), values in list(shard.items()):
+                    _add(collected, name, labels, values)
+        return collected
+
+    def collect(self) -> Collected:
+        """Values of this process plus the other workers' snapshots."""
+        collected = self._local_values()
+        if self._directory is not None:
+            own = f"{os.getpid()}.json"
+            for path in self._directory.glob("*.json"):
+                if path.name == own:
+                    continue
+                try:
+                    entries = json.loads(path.read_text())
+                except (OSError, ValueError):
+                    continue  # removed or being replaced
+                for name, labels, values in entries:
+                    _add(collected, name, tuple(labels), values)
+        return collected
+
+    def expose(self) -> str:
+        """All metrics in the Prometheus text format."""
+        collected = self.collect()
+        lines: List[str] = []
+        for metric in list(self._metrics):
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples(collected.get(metric.name, {})))
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        """Zero all values (tests, and a freshly forked worker)."""
+        with self._lock:
+            self._base.clear()
+            for _, values in self._shards:
+                values.clear()
+
+    # ─── Multi-process ───────────────────────────────────────────
+
+    def share(self, directory: Union[str, Path], interval: float) -> None:
+        """
+        Publish this process's values to `directory` every `interval`
+        seconds (called in each worker after fork).
+        """
+        self._directory = Path(directory)
+        self._directory.mkdir(parents=True, exist_ok=True)
+        self._stop_snapshots = stop = threading.Event()
+
+        def loop():
+            while not stop.wait(interval):
+                self.write_snapshot()
+
+        threading.Thread(target=loop, name="metrics-snapshot", daemon=True).start()
+
+    def stop_sharing(self) -> None:
+        """Stop the snapshot thread and write the final values."""
+        if self._stop_snapshots is not None:
+            self._stop_snapshots.set()
+            self.write_snapshot()
+
+    def write_snapshot(self) -> None:
+        if self._directory is None:
+            return
+        entries = [
+            [name, list(labels), values]
+            for name, by_labels in self._local_values().items()
+            for labels, values in by_labels.items()
+        ]
+        fd, tmp = tempfile.mkstemp(dir=self._directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(entries, f)
+            os.replace(tmp, self._directory / f"{os.getpid()}.json")
+        except OSError:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+
+
+def clear_shared(directory: Union[str, Path]) -> None:
+    """Remove snapshots of a previous run (the server, before forking)."""
+    path = Path(directory)
+    path.mkdir(parents=True, exist_ok=True)
+    for file in path.iterdir():
+        if file.suffix in (".json", ".tmp"):
+            file.unlink(missing_ok=True)
+
+
+class _Metric(abc.ABC):
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _label_str(self, labels: Labels, extra: str = "") -> str:
+        pairs = [f'{k}="{_escape(v)}"' for k, v in zip(self.labelnames, labels)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    @abc.abstractmethod
+    def samples(self, values: Dict[Labels, list]) -> List[str]:
+        """Exposition lines, given this metric's collected values."""
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=(), registry: Optional[Registry] = None):
+        super().__init__(name, documentation, labelnames)
+        self._registry = registry or REGISTRY
+        self._registry.register(self)
+
+    def inc(self, labels: Labels = (), amount: float = 1) -> None:
+        shard = self._registry._shard()
+        key = (self.name, labels)
+        values = shard.get(key)
+        if values is None:
+            shard[key] = [amount]
+        else:
+            values[0] += amount
+
+    def value(self, labels: Labels = ()) -> float:
+        values = self._registry.collect().get(self.name, {}).get(labels)
+        return values[0] if values else 0
+
+    def samples(self, values):
+        return [
+            f"{self.name}{self._label_str(labels)} {_num(counts[0])}"
+            for labels, counts in sorted(values.items())
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self, name, documentation, labelnames=(), buckets: Sequence[float] = DEFAULT_BUCKETS,
+        registry: Optional[Registry] = None,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._registry = registry or REGISTRY
+        self._registry.register(self)
+
+    def observe(self, value: float, labels: Labels = ()) -> None:
+        shard = self._registry._shard()
+        key = (self.name, labels)
+        values = shard.get(key)
+        if values is None:
+            # one count per bucket, +Inf, then the sum
+            values = shard[key] = [0] * (len(self.buckets) + 2)
+        values[bisect_left(self.buckets, value)] += 1
+        values[-1] += value
+
+    def count(self, labels: Labels = ()) -> int:
+        values = self._registry.collect().get(self.name, {}).get(labels)
+        return sum(values[:-1]) if values else 0
+
+    def samples(self, values):
+        lines = []
+        for labels, counts in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _num(bound)
+                bucket_labels = self._label_str(labels, 'le="%s"' % le)
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{self._label_str(labels)} {_num(counts[-1])}")
+            lines.append(f"{self.name}_count{self._label_str(labels)} {cumulative}")
+        return lines
+
+
+Sample = Union[float, Dict[Labels, float]]
+
+
+class CallbackMetric(_Metric):
+    """Gauge or counter whose value is read from `fn` at scrape time."""
+
+    def __init__(
+        self, name, documentation, fn: Callable[[], Sample], labelnames=(),
+        kind: str = "gauge", registry: Optional[Registry] = None,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.kind = kind
+        self.fn = fn
+        (registry or REGISTRY).register(self)
+
+    def samples(self, values):
+        try:
+            value = self.fn()
+        except Exception:
+            return []
+        if not isinstance(value, dict):
+            value = {(): value}
+        return [
+            f"{self.name}{self._label_str(labels)} {_num(v)}"
+            for labels, v in sorted(value.items())
+            if v is not None
+        ]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _num(value: float) -> str:
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+REGISTRY = Registry()
+
+
+# ─── Request-scoped timings ─────────────────────────────────────
+
+class RequestMetrics:
+    """Accumulated per request (DB, render...), read by the middleware."""
+
+    __slots__ = ("scope", "db_queries", "db_seconds", "timings")
+
+    def __init__(self, scope: Optional[dict] = None):
+        self.scope = scope or {}
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.timings: Dict[str, float] = {}
+
+    @property
+    def route(self) -> str:
+        """Route template once routing has matched, else "<unmatched>"."""
+        return getattr(self.scope.get("route"), "path", None) or "<unmatched>"
+
+
+_current: ContextVar[Optional[RequestMetrics]] = ContextVar("request_metrics", default=None)
+
+
+def current_request() -> Optional[RequestMetrics]:
+    return _current.get()
+
+
+def add_timing(name: str, seconds: float) -> None:
+    """Attribute `seconds` of work named `name` to the current request."""
+    request = _current.get()
+    if request is not None:
+        request.timings[name] = request.timings.get(name, 0.0) + seconds
+
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP requests by route and status",
+    ("method", "route", "status"),
+)
+HTTP_DURATION = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route",
+    ("method", "route"),
+)
+HTTP_DB_QUERIES = Histogram(
+    "http_request_db_queries", "SQL statements executed per request",
+    ("route",), buckets=COUNT_BUCKETS,
+)
+HTTP_DB_SECONDS = Histogram(
+    "http_request_db_seconds", "Time spent in SQL per request",
+    ("route",),
+)
+DB_QUERIES = Histogram("db_query_duration_seconds", "SQL statement latency")
+
+
+def record_query(seconds: float) -> None:
+    """Called by the SQLAlchemy hooks after every statement."""
+    DB_QUERIES.observe(seconds)
+    request = _current.get()
+    if request is not None:
+        request.db_queries += 1
+        request.db_seconds += seconds
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware: per-route latency, status and DB usage."""
+
+    def __init__(self, app, server_timing: bool = False):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request = RequestMetrics(scope)
+        token = _current.set(request)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    header = _server_timing(request, time.perf_counter() - start)
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"server-timing", header.encode("latin-1"))
+                    ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            _current.reset(token)
+            route = request.route
+            method = scope["method"]
+            HTTP_REQUESTS.inc((method, route, str(status)))
+            HTTP_DURATION.observe(elapsed, (method, route))
+            HTTP_DB_QUERIES.observe(request.db_queries, (route,))
+            HTTP_DB_SECONDS.observe(request.db_seconds, (route,))
+
+
+def _server_timing(request: RequestMetrics, elapsed: float) -> str:
+    parts = [
+        f"app;dur={elapsed * 1000:.1f}",
+        f'db;dur={request.db_seconds * 1000:.1f};desc="{request.db_queries} queries"',
+    ]
+    parts += [f"{name};dur={seconds * 1000:.1f}" for name, seconds in request.timings.items()]
+    return ", ".join(parts)
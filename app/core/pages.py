@@ -0,0 +1,101 @@
+"""
+Server-rendered pages.
+
+`templates` is the shared Jinja2Templates instance. Compiled templates
+are kept in a bytecode cache on disk that is shared by workers and
+survives restarts. Outside DEBUG, templates are not re-checked for
+changes on every render.
+
+Public pages that do not depend on the visitor are rendered once per
+distinct context and served from memory by `page_cache`. The theme is
+applied client-side (localStorage) and the site has a single language,
+so in practice that is one copy per page. Responses carry an ETag and
+Last-Modified, so repeat visits get an empty 304.
+"""
+
+import hashlib
+import threading
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from fastapi import Request, Response
+from fastapi.responses import HTMLResponse
+from fastapi.templating import Jinja2Templates
+from jinja2 import FileSystemBytecodeCache
+
+from app.config import settings
+from app.core.assets import static_assets
+from app.core.http_cache import (
+    PUBLIC_REVALIDATE,
+    cache_headers,
+    etag_matches,
+    make_etag,
+    not_modified,
+    unmodified_since,
+)
+
+TEMPLATE_DIR = "app/templates"
+
+
+def _bytecode_cache() -> Optional[FileSystemBytecodeCache]:
+    if not settings.TEMPLATE_CACHE_DIR:
+        return None
+    directory = Path(settings.TEMPLATE_CACHE_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    return FileSystemBytecodeCache(str(directory))
+
+
+templates = Jinja2Templates(directory=TEMPLATE_DIR)
+templates.env.bytecode_cache = _bytecode_cache()
+templates.env.auto_reload = settings.DEBUG
+templates.env.globals["static_url"] = static_assets.url
+
+
+class CachedPage(NamedTuple):
+    body: bytes
+    etag: str
+    last_modified: datetime
+
+
+class PageCache:
+    """Rendered public pages keyed by (template, context)."""
+
+    def __init__(self, env):
+        self.env = env
+        self._pages: Dict[Tuple, CachedPage] = {}
+        self._lock = threading.Lock()
+
+    def get(self, template: str, **context) -> CachedPage:
+        key = (template, tuple(sorted(context.items())))
+        page = self._pages.get(key)
+        if page is None:
+            body = self.env.get_template(template).render(context).encode()
+            page = CachedPage(
+                body=body,
+                etag=make_etag(hashlib.sha256(body).hexdigest()[:32]),
+                last_modified=datetime.now(timezone.utc).replace(microsecond=0),
+            )
+            with self._lock:
+                page = self._pages.setdefault(key, page)
+        return page
+
+    def clear(self) -> None:
+        with self._lock:
+            self._pages.clear()
+
+    def response(
+        self, request: Request, template: str, vary: Optional[str] = None, **context
+    ) -> Response:
+        """Cached page as a 200, or 304 if the client's copy is current."""
+        page = self.get(template, **context)
+        extra = {"Last-Modified": format_datetime(page.last_modified, usegmt=True)}
+        if vary:
+            extra["Vary"] = vary
+        if etag_matches(request, page.etag) or unmodified_since(request, page.last_modified):
+            return not_modified(page.etag, PUBLIC_REVALIDATE, extra)
+        return HTMLResponse(page.body, headers=cache_headers(page.etag, PUBLIC_REVALIDATE, extra))
+
+
+page_cache = PageCache(templates.env)
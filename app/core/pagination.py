@@ -0,0 +1,146 @@
+"""
+Keyset (cursor) pagination helpers.
+
+Listings are ordered by a list of sort keys — usually
+(created_at DESC, id DESC), optionally prefixed by a search rank.
+The cursor is an opaque token holding the sort key values of the last
+row on the page; the next page continues strictly after it, so deep
+pages cost the same as the first one (no OFFSET scan).
+
+Legacy `skip`/`page` parameters keep working: when no cursor is given
+the page is fetched with OFFSET, and a cursor for the following page
+is still returned.
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Sequence, Tuple
+
+from fastapi import Response
+from sqlalchemy import DateTime, and_, func, or_, tuple_
+
+from app.core.exceptions import BadRequestException
+
+# Totals are counted up to this many rows; beyond it they are approximate
+TOTAL_COUNT_CAP = 10_000
+
+# (column or expression, descending)
+SortKey = Tuple[Any, bool]
+
+
+def keyset_order(model, rank=None) -> List[SortKey]:
+    """Default listing order: newest first, optionally ranked by search."""
+    keys = [(model.created_at, True), (model.id, True)]
+    if rank is not None:
+        keys.insert(0, (rank, False))
+    return keys
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Pack sort key values into an opaque URL-safe token."""
+    payload = [
+        v.isoformat() if isinstance(v, datetime) else v for v in values
+    ]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, keys: Sequence[SortKey]) -> list:
+    """Unpack a cursor produced by encode_cursor() for the given keys."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded))
+        if not isinstance(values, list) or len(values) != len(keys):
+            raise ValueError
+        return [
+            datetime.fromisoformat(v) if isinstance(col.type, DateTime) else v
+            for v, (col, _) in zip(values, keys)
+        ]
+    except (ValueError, TypeError):
+        raise BadRequestException("Invalid cursor")
+
+
+def _after(keys: Sequence[SortKey], values: Sequence[Any]):
+    """WHERE clause selecting rows strictly after `values` in `keys` order."""
+    directions = {desc for _, desc in keys}
+    columns = [col for col, _ in keys]
+
+    # Same direction everywhere: a row-value comparison the index can serve
+    if len(directions) == 1:
+        if directions.pop():
+            return tuple_(*columns) < tuple_(*values)
+        return tuple_(*columns) > tuple_(*values)
+
+    clauses = []
+    for i, (col, desc) in enumerate(keys):
+        prefix = [c == v for c, v in zip(columns[:i], values[:i])]
+        step = col < values[i] if desc else col > values[i]
+        clauses.append(and_(*prefix, step))
+    return or_(*clauses)
+
+
+def paginate(
+    query,
+    keys: Sequence[SortKey],
+    limit: int,
+    cursor: Optional[str] = None,
+    skip: int = 0,
+) -> Tuple[list, Optional[str]]:
+    """
+    Fetch one page of `query` ordered by `keys`.
+
+    Returns (items, next_cursor); next_cursor is None on the last page.
+    Items are entities, or column tuples when `query` selects several
+    columns (e.g. db.query(URL.id, URL.title)).
+    """
+    width = len(query.column_descriptions)
+    query = query.order_by(
+        *(col.desc() if desc else col.asc() for col, desc in keys)
+    )
+
+    if cursor:
+        query = query.filter(_after(keys, decode_cursor(cursor, keys)))
+    elif skip:
+        query = query.offset(skip)
+
+    # One extra row tells whether there is a next page
+    rows = query.add_columns(*(col for col, _ in keys)).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    next_cursor = None
+    if has_more:
+        next_cursor = encode_cursor(rows[-1][-len(keys):])
+
+    if width == 1:
+        return [row[0] for row in rows], next_cursor
+    return [tuple(row[:width]) for row in rows], next_cursor
+
+
+def count_total(query, cap: int = TOTAL_COUNT_CAP) -> Tuple[int, bool]:
+    """
+    Count rows of `query`, stopping at `cap`.
+
+    Returns (total, exact). When the cap is hit the total is a lower bound.
+    """
+    bounded = query.order_by(None).limit(cap + 1).subquery()
+    total = query.session.query(func.count()).select_from(bounded).scalar()
+    if total > cap:
+        return cap, False
+    return total, True
+
+
+def set_page_headers(
+    response: Response,
+    next_cursor: Optional[str],
+    total: Optional[Tuple[int, bool]] = None,
+) -> None:
+    """Expose pagination state for endpoints that return plain lists."""
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    if total is not None:
+        count, exact = total
+        response.headers["X-Total-Count"] = str(count)
+        if not exact:
+            response.headers["X-Total-Count-Approximate"] = "true"
@@ -0,0 +1,121 @@
+"""
+On-demand sampling profiler for a live worker.
+
+While a profile runs, a background thread snapshots the Python stack of
+every other thread (sys._current_frames) at a fixed interval and counts
+identical stacks. Nothing is installed between profiles, so the cost
+when idle is zero; while sampling the cost is one stack walk per thread
+per interval, independent of the request rate.
+
+The result is in the collapsed-stack format understood by
+flamegraph.pl, speedscope and inferno:
+
+    MainThread;uvicorn.server:serve;app.api.redirect:redirect 42
+"""
+
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict
+
+# Stacks deeper than this are truncated at the root side
+MAX_DEPTH = 128
+
+
+class ProfilerBusy(Exception):
+    """A profile is already running in this process."""
+
+
+class Profile:
+    """Aggregated samples of one profiling run."""
+
+    def __init__(self, stacks: Counter, samples: int, duration: float, interval: float):
+        self.stacks = stacks
+        self.samples = samples
+        self.duration = duration
+        self.interval = interval
+
+    def collapsed(self) -> str:
+        """One `frame;frame;... count` line per distinct stack, hottest first."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def _frame_name(frame) -> str:
+    module = frame.f_globals.get("__name__", "?")
+    return f"{module}:{frame.f_code.co_name}"
+
+
+def _collapse(frame, thread_name: str) -> str:
+    names = []
+    while frame is not None and len(names) < MAX_DEPTH:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    names.append(thread_name)
+    return ";".join(reversed(names))
+
+
+class SamplingProfiler:
+    """Stack sampler; one run at a time per process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    def profile(self, seconds: float, interval: float = 0.01) -> Profile:
+        """
+        Sample all other threads for `seconds`, blocking the caller.
+
+        Raises:
+            ProfilerBusy: another profile is in progress
+        """
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusy()
+        try:
+            return self._sample(seconds, interval)
+        finally:
+            self._lock.release()
+
+    def _sample(self, seconds: float, interval: float) -> Profile:
+        me = threading.get_ident()
+        names: Dict[int, str] = {}
+        stacks: Counter = Counter()
+        samples = 0
+
+        start = time.perf_counter()
+        deadline = start + seconds
+        next_tick = start
+        while True:
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                name = names.get(ident)
+                if name is None:
+                    name = names[ident] = _thread_name(ident)
+                stacks[_collapse(frame, name)] += 1
+            samples += 1
+
+            next_tick += interval
+            now = time.perf_counter()
+            if next_tick >= deadline:
+                break
+            if next_tick > now:
+                time.sleep(next_tick - now)
+            else:
+                # Fell behind (GIL contention): skip missed ticks
+                next_tick = now
+
+        return Profile(stacks, samples, time.perf_counter() - start, interval)
+
+
+def _thread_name(ident: int) -> str:
+    for thread in threading.enumerate():
+        if thread.ident == ident:
+            return thread.name
+    return f"thread-{ident}"
+
+
+profiler = SamplingProfiler()
@@ -0,0 +1,149 @@
+"""
+Slow-query log.
+
+Statements slower than SLOW_QUERY_THRESHOLD_MS are kept, newest last,
+in a bounded in-memory ring buffer of this worker together with the
+route that issued them and the SQLite query plan (EXPLAIN QUERY PLAN,
+captured right after the slow execution). The buffer is read through
+GET /api/v1/admin/slow-queries.
+
+Parameter values can hold password hashes, emails or tokens, so only
+their types are kept ("(str[16], int)") unless SLOW_QUERY_LOG_PARAMETERS
+is set, for local debugging.
+"""
+
+import logging
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from app.config import settings
+from app.core import metrics
+
+logger = logging.getLogger(__name__)
+
+# Long literals and parameter lists are cut to keep entries small
+MAX_STATEMENT_CHARS = 4000
+MAX_PARAMETERS_CHARS = 500
+
+
+class SlowQueryLog:
+    """Ring buffer of the most recent slow statements."""
+
+    def __init__(self, threshold_ms: float, size: int, log_parameters: bool = False):
+        self.threshold = threshold_ms / 1000
+        self.log_parameters = log_parameters
+        self._entries: deque = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self.total = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold > 0
+
+    def record(
+        self,
+        statement: str,
+        parameters,
+        seconds: float,
+        route: Optional[str] = None,
+        plan: Optional[List[str]] = None,
+    ) -> dict:
+        entry = {
+            "at": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+            "duration_ms": round(seconds * 1000, 2),
+            "route": route,
+            "statement": _truncate(statement, MAX_STATEMENT_CHARS),
+            "parameters": _truncate(
+                repr(parameters) if self.log_parameters else redact(parameters),
+                MAX_PARAMETERS_CHARS,
+            ),
+            "plan": plan,
+        }
+        with self._lock:
+            self._entries.append(entry)
+            self.total += 1
+        logger.warning(
+            "Slow query (%.1f ms, %s): %s", seconds * 1000, route or "-", entry["statement"][:200]
+        )
+        return entry
+
+    def entries(self, limit: Optional[int] = None) -> List[dict]:
+        """Newest first."""
+        with self._lock:
+            entries = list(reversed(self._entries))
+        return entries[:limit] if limit else entries
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+def redact(parameters) -> str:
+    """Parameter types without values: ('abc', 5, None) -> "(str[3], int, None)"."""
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{k}: {_shape(v)}" for k, v in parameters.items()) + "}"
+    if isinstance(parameters, list):
+        # executemany: one parameter set per row
+        first = redact(parameters[0]) if parameters else ""
+        return f"[{len(parameters)} × {first}]"
+    if isinstance(parameters, tuple):
+        return "(" + ", ".join(_shape(v) for v in parameters) + ")"
+    return _shape(parameters)
+
+
+def _shape(value) -> str:
+    if value is None:
+        return "None"
+    if isinstance(value, (str, bytes)):
+        return f"{type(value).__name__}[{len(value)}]"
+    return type(value).__name__
+
+
+def _truncate(text: str, limit: int) -> str:
+    return text if len(text) <= limit else text[:limit] + "…"
+
+
+def explain(dbapi_connection, statement: str, parameters) -> Optional[List[str]]:
+    """SQLite query plan of `statement` as indented lines (None if unavailable)."""
+    try:
+        cursor = dbapi_connection.cursor()
+        try:
+            rows = cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+        finally:
+            cursor.close()
+    except Exception:
+        return None
+
+    # Rows are (id, parent, notused, detail); indent children under parents
+    depth = {0: -1}
+    lines = []
+    for node_id, parent, _, detail in rows:
+        depth[node_id] = depth.get(parent, -1) + 1
+        lines.append("  " * depth[node_id] + detail)
+    return lines
+
+
+slow_query_log = SlowQueryLog(
+    threshold_ms=settings.SLOW_QUERY_THRESHOLD_MS,
+    size=settings.SLOW_QUERY_LOG_SIZE,
+    log_parameters=settings.SLOW_QUERY_LOG_PARAMETERS,
+)
+
+
+def check(conn, cursor, statement: str, parameters, executemany: bool, seconds: float) -> None:
+    """after_cursor_execute hook body: record the statement if it was slow."""
+    if seconds < slow_query_log.threshold or not slow_query_log.enabled:
+        return
+
+    plan = None
+    if conn.dialect.name == "sqlite" and not executemany:
+        plan = explain(cursor.connection, statement, parameters)
+
+    request = metrics.current_request()
+    slow_query_log.record(
+        statement, parameters, seconds,
+        route=request.route if request is not None else None,
+        plan=plan,
+    )
@@ -0,0 +1,51 @@
+"""
+Streaming ZIP writer.
+
+zipfile can write to a non-seekable stream (sizes go into data
+descriptors after each member), so the archive is produced member by
+member and handed to the client as it grows — memory use is bounded by
+the largest single file, not by the archive.
+"""
+
+import io
+import zipfile
+from typing import Callable, Iterable, Iterator, Tuple
+
+# (name in archive, producer of the file bytes, deflate?)
+ZipMember = Tuple[str, Callable[[], bytes], bool]
+
+
+class _Sink(io.RawIOBase):
+    """Write-only, non-seekable buffer drained after every member."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_zip(members: Iterable[ZipMember]) -> Iterator[bytes]:
+    """Yield a ZIP archive of `members` chunk by chunk."""
+    sink = _Sink()
+    with zipfile.ZipFile(sink, mode="w") as archive:
+        for name, produce, deflate in members:
+            archive.writestr(
+                name,
+                produce(),
+                compress_type=zipfile.ZIP_DEFLATED if deflate else zipfile.ZIP_STORED,
+            )
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    # Central directory is written on close
+    yield sink.drain()
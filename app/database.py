@@ -1,7 +1,10 @@
-from sqlalchemy import create_engine
+import time
+
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, declarative_base
 
 from app.config import settings
+from app.core import metrics, slow_queries
 
 
 connect_args = {}
@@ -13,6 +16,44 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
 
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    metrics.record_query(elapsed)
+    slow_queries.check(conn, cursor, statement, parameters, executemany, elapsed)
+
+
+def _handle_error(context):
+    # A failed statement never reaches after_cursor_execute
+    if context.connection is not None and context.execution_context is not None:
+        starts = context.connection.info.get("query_start")
+        if starts:
+            starts.pop()
+
+
+def instrument_engine(bind) -> None:
+    """Time SQL statements: metrics per request and the slow-query log."""
+    if not event.contains(bind, "before_cursor_execute", _before_cursor_execute):
+        event.listen(bind, "before_cursor_execute", _before_cursor_execute)
+        event.listen(bind, "after_cursor_execute", _after_cursor_execute)
+        event.listen(bind, "handle_error", _handle_error)
+
+
+if settings.METRICS_ENABLED or settings.SLOW_QUERY_THRESHOLD_MS > 0:
+    instrument_engine(engine)
+
+
+def init_db(bind=None) -> None:
+    """Create missing tables (explicit step; importing the app does not touch the DB)."""
+    # Registers every model on Base.metadata
+    import app.models  # noqa: F401
+
+    Base.metadata.create_all(bind=bind or engine)
+
+
 def get_db():
     """FastAPI dependency for database sessions."""
     db = SessionLocal()
@@ -1,26 +1,76 @@
+from contextlib import asynccontextmanager
+
 from fastapi import Depends, FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import RedirectResponse
-from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
-from sqlalchemy.orm import Session
+from fastapi.responses import ORJSONResponse, RedirectResponse, Response
 
 from app.api import admin, analytics, auth, links, redirect, users, qr
 from app.config import settings
-from app.core.dependencies import get_current_user, require_admin, get_current_user_optional
-from app.database import Base, engine, get_db
+from app.core import metrics
+from app.core.assets import static_assets
+from app.core.dependencies import (
+    LoginRedirect,
+    get_page_user,
+    has_access_token,
+    require_page_admin,
+)
+from app.core.pages import page_cache, templates
 from app.models import User
-from app.migrations import run_all_migrations
+from app.migrations import check_schema, prepare_database
+from app.services.counter_buffer import qr_downloads
+from app.services.expiry_service import expiry_scheduler
+from app.services.render_cache import qr_render_cache
+from app.services.render_pool import qr_render_pool
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Tables, migrations and the admin user (a few SELECTs when the
+    # schema is current). With MIGRATE_ON_STARTUP=false this is done
+    # ahead of deploy by `python -m app.migrations`.
+    if settings.MIGRATE_ON_STARTUP:
+        prepare_database()
+    else:
+        pending = check_schema()
+        if pending:
+            print(
+                f"⚠️  {len(pending)} pending migration(s) — run: python -m app.migrations"
+            )
+
+    # Fingerprint and precompress static assets once
+    static_assets.build()
+
+    # Deactivate links as they expire
+    if settings.EXPIRY_SCHEDULER_ENABLED:
+        expiry_scheduler.start()
+
+    # Periodically write buffered download counters
+    qr_downloads.start()
+
+    yield
+
+    await expiry_scheduler.stop()
+    await qr_downloads.stop()
+    qr_render_pool.shutdown()
 
-# Create tables
-Base.metadata.create_all(bind=engine)
 
 app = FastAPI(
     title="Gosha Connections Platform",
     description="URL Shortener, QR Codes, and Bio Links Platform",
     version="2.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
+
+@app.exception_handler(LoginRedirect)
+async def login_redirect(request: Request, exc: LoginRedirect):
+    """Pages: send signed-out visitors to /login and drop a stale token."""
+    response = RedirectResponse(url="/login", status_code=302)
+    response.delete_cookie("access_token", path="/")
+    return response
+
+
 # CORS
 app.add_middleware(
     CORSMiddleware,
@@ -30,11 +80,41 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Static files
-app.mount("/static", StaticFiles(directory="app/static"), name="static")
+# Request metrics (outermost, so the timing covers every middleware)
+if settings.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware, server_timing=settings.DEBUG)
+
+    def _render_cache_lookups():
+        stats = qr_render_cache.stats()
+        return {
+            ("memory_hit",): stats["memory_hits"],
+            ("disk_hit",): stats["disk_hits"],
+            ("miss",): stats["misses"],
+        }
+
+    metrics.CallbackMetric(
+        "qr_render_cache_lookups_total", "QR render cache lookups by result",
+        _render_cache_lookups, labelnames=("result",), kind="counter",
+    )
+    metrics.CallbackMetric(
+        "qr_render_cache_hit_ratio", "QR render cache hit ratio since start",
+        lambda: qr_render_cache.stats()["hit_rate"],
+    )
+    metrics.CallbackMetric(
+        "qr_render_cache_memory_bytes", "QR renders held in memory",
+        lambda: qr_render_cache.stats()["memory_bytes"],
+    )
+    metrics.CallbackMetric(
+        "qr_render_pool_pending", "Distinct QR renders queued or running",
+        lambda: qr_render_pool.pending,
+    )
+    metrics.CallbackMetric(
+        "qr_download_counter_pending", "Buffered QR download increments not yet written",
+        qr_downloads.pending_total,
+    )
 
-# Templates
-templates = Jinja2Templates(directory="app/templates")
+# Static files
+app.mount("/static", static_assets, name="static")
 
 # ===== API Routes =====
 app.include_router(auth.router)
@@ -48,49 +128,30 @@ app.include_router(qr.router)
 
 
 @app.get("/")
-async def landing(request: Request, db: Session = Depends(get_db)):
+async def landing(request: Request):
     """Landing page - redirects to dashboard if authenticated."""
-    # Check if user is authenticated
-    try:
-        token = request.cookies.get("access_token")
-        if token:
-            from app.core.security import decode_token
-            
-            payload = decode_token(token)
-            if payload and payload.get("type") == "access":
-                user_id = payload.get("sub")
-                user = db.query(User).filter(User.id == int(user_id)).first()
-                
-                if user and user.is_active:
-                    # User is authenticated - redirect to dashboard
-                    return RedirectResponse(url="/dashboard", status_code=302)
-    except:
-        pass  # Not authenticated, show landing page
-    
-    return templates.TemplateResponse(
-        "landing.html", {"request": request, "active_page": "home"}
+    if has_access_token(request):
+        return RedirectResponse(url="/dashboard", status_code=302)
+    return page_cache.response(
+        request, "landing.html", vary="Cookie", active_page="home"
     )
 
 
 @app.get("/features")
 async def features_page(request: Request):
     """Features page."""
-    return templates.TemplateResponse(
-        "public/features.html", {"request": request, "active_page": "features"}
-    )
+    return page_cache.response(request, "public/features.html", active_page="features")
 
 
 @app.get("/pricing")
 async def pricing_page(request: Request):
     """Pricing page."""
-    return templates.TemplateResponse(
-        "public/pricing.html", {"request": request, "active_page": "pricing"}
-    )
+    return page_cache.response(request, "public/pricing.html", active_page="pricing")
 
 
 @app.get("/dashboard")
 async def dashboard(
-    request: Request, current_user: User = Depends(get_current_user)
+    request: Request, current_user: User = Depends(get_page_user)
 ):
     """Dashboard page (requires authentication)."""
     return templates.TemplateResponse(
@@ -105,7 +166,7 @@ async def dashboard(
 
 @app.get("/links")
 async def links_page(
-    request: Request, current_user: User = Depends(get_current_user)
+    request: Request, current_user: User = Depends(get_page_user)
 ):
     """Links page (requires authentication)."""
     return templates.TemplateResponse(
@@ -120,7 +181,7 @@ async def links_page(
 
 @app.get("/analytics")
 async def analytics_page(
-    request: Request, current_user: User = Depends(get_current_user)
+    request: Request, current_user: User = Depends(get_page_user)
 ):
     """Analytics page (requires authentication)."""
     return templates.TemplateResponse(
@@ -135,7 +196,7 @@ async def analytics_page(
 
 @app.get("/qr-codes")
 async def qr_codes_page(
-    request: Request, current_user: User = Depends(get_current_user)
+    request: Request, current_user: User = Depends(get_page_user)
 ):
     """QR Codes page (requires authentication)."""
     return templates.TemplateResponse(
@@ -150,7 +211,7 @@ async def qr_codes_page(
 
 @app.get("/profile")
 async def profile_page(
-    request: Request, current_user: User = Depends(get_current_user)
+    request: Request, current_user: User = Depends(get_page_user)
 ):
     """Profile page (requires authentication)."""
     return templates.TemplateResponse(
@@ -165,7 +226,7 @@ async def profile_page(
 
 @app.get("/settings")
 async def settings_page(
-    request: Request, current_user: User = Depends(get_current_user)
+    request: Request, current_user: User = Depends(get_page_user)
 ):
     """Settings page (requires authentication)."""
     return templates.TemplateResponse(
@@ -180,7 +241,7 @@ async def settings_page(
 
 @app.get("/admin")
 async def admin_page(
-    request: Request, current_user: User = Depends(require_admin)
+    request: Request, current_user: User = Depends(require_page_admin)
 ):
     """Admin panel (requires admin role)."""
     return templates.TemplateResponse(
@@ -194,61 +255,40 @@ async def admin_page(
 
 
 @app.get("/login")
-async def login_page(request: Request, db: Session = Depends(get_db)):
+async def login_page(request: Request):
     """Login page - redirects to dashboard if already authenticated."""
-    # Check if user is authenticated
-    try:
-        token = request.cookies.get("access_token")
-        if token:
-            from app.core.security import decode_token
-            
-            payload = decode_token(token)
-            if payload and payload.get("type") == "access":
-                user_id = payload.get("sub")
-                user = db.query(User).filter(User.id == int(user_id)).first()
-                
-                if user and user.is_active:
-                    return RedirectResponse(url="/dashboard", status_code=302)
-    except:
-        pass
-    
-    return templates.TemplateResponse(
-        "auth/login.html", {"request": request, "active_page": "login"}
+    if has_access_token(request):
+        return RedirectResponse(url="/dashboard", status_code=302)
+    return page_cache.response(
+        request, "auth/login.html", vary="Cookie", active_page="login"
     )
 
 
 @app.get("/register")
-async def register_page(request: Request, db: Session = Depends(get_db)):
+async def register_page(request: Request):
     """Register page - redirects to dashboard if already authenticated."""
-    # Check if user is authenticated
-    try:
-        token = request.cookies.get("access_token")
-        if token:
-            from app.core.security import decode_token
-            
-            payload = decode_token(token)
-            if payload and payload.get("type") == "access":
-                user_id = payload.get("sub")
-                user = db.query(User).filter(User.id == int(user_id)).first()
-                
-                if user and user.is_active:
-                    return RedirectResponse(url="/dashboard", status_code=302)
-    except:
-        pass
-    
-    return templates.TemplateResponse(
-        "auth/register.html", {"request": request, "active_page": "register"}
+    if has_access_token(request):
+        return RedirectResponse(url="/dashboard", status_code=302)
+    return page_cache.response(
+        request, "auth/register.html", vary="Cookie", active_page="register"
     )
 
 
 @app.get("/forgot-password")
 async def forgot_password_page(request: Request):
     """Forgot password page."""
-    return templates.TemplateResponse(
-        "auth/forgot_password.html", {"request": request, "active_page": "forgot-password"}
+    return page_cache.response(
+        request, "auth/forgot_password.html", active_page="forgot-password"
     )
 
 
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics_endpoint():
+        """Prometheus scrape endpoint."""
+        return Response(metrics.REGISTRY.expose(), media_type=metrics.CONTENT_TYPE)
+
+
 # ===== Redirect (LAST - catch-all) =====
 app.include_router(redirect.router)
 
@@ -256,32 +296,3 @@ app.include_router(redirect.router)
 @app.get("/api/health")
 async def health():
     return {"status": "ok", "version": "2.0.0"}
-
-
-# Create admin user on startup if not exists
-@app.on_event("startup")
-async def startup_migrations():
-    # Run database migrations
-    run_all_migrations()
-    
-    # Create admin user
-    from app.core.security import hash_password
-    from app.database import SessionLocal
-    from app.models import User, UserRole
-
-    db = SessionLocal()
-    try:
-        admin = db.query(User).filter(User.role == UserRole.ADMIN).first()
-        if not admin:
-            admin = User(
-                email=settings.ADMIN_EMAIL,
-                username=settings.ADMIN_USERNAME,
-                hashed_password=hash_password(settings.ADMIN_PASSWORD),
-                role=UserRole.ADMIN,
-                is_active=True,
-            )
-            db.add(admin)
-            db.commit()
-            print(f"✅ Admin user created: {settings.ADMIN_EMAIL}")
-    finally:
-        db.close()
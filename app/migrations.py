@@ -1,18 +1,35 @@
 """
 Database Migrations Module
-Auto-run migrations on application startup
+
+Migrations are numbered steps recorded in the schema_version table.
+Each step runs once per database; when the schema is current, the
+startup check is a single SELECT. Steps stay idempotent (they inspect
+the schema before changing it), so databases migrated before the
+version table existed are simply re-checked once and stamped.
+
+Run ahead of a deploy (instead of on every worker start):
+
+    python -m app.migrations           # create tables, apply pending migrations
+    python -m app.migrations --status  # show current / latest version
 """
 
+import argparse
+import base64
+import binascii
 import sqlite3
 from pathlib import Path
+from typing import Callable, List, NamedTuple, Optional
 from app.config import settings
 
+# Rows per batch when moving inline images out of qr_codes
+QR_BLOB_BATCH_SIZE = 500
+
 
 def get_db_path() -> Path:
     """Get database path from settings."""
     db_url = settings.DATABASE_URL
     if db_url.startswith("sqlite:///"):
-        return Path(db_url.replace("sqlite:///./", ""))
+        return Path(db_url[len("sqlite:///"):])
     return Path("gosha.db")
 
 
@@ -47,103 +64,421 @@ def run_qr_migration(conn: sqlite3.Connection) -> None:
     # Check if migration needed
     cursor.execute("PRAGMA table_info(qr_codes)")
     qr_columns = [col[1] for col in cursor.fetchall()]
-    required_columns = ['content', 'title', 'qr_image_base64', 'box_size', 
-                       'border_size', 'logo_base64', 'error_correction', 
+    required_columns = ['content', 'title', 'image_digest', 'box_size', 
+                       'border_size', 'logo_digest', 'error_correction', 
                        'downloads_count', 'updated_at']
     missing = [c for c in required_columns if c not in qr_columns]
+    # Images still stored inline as base64 — move them to the blob store
+    legacy = [c for c in ('qr_image_base64', 'logo_base64') if c in qr_columns]
     
-    if not missing:
+    if not missing and not legacy:
         print("✅ QR codes table is up to date")
         return
     
     # Migrate existing table
-    print(f"🔄 Migrating qr_codes table (missing: {', '.join(missing)})...")
-    _migrate_qr_table(cursor)
-    conn.commit()
+    print(f"🔄 Migrating qr_codes table (changes: {', '.join(missing + legacy)})...")
+    _migrate_qr_table(conn)
     print("✅ QR codes table migrated successfully")
 
 
-def _create_qr_table(cursor: sqlite3.Cursor) -> None:
-    """Create qr_codes table with full schema."""
-    cursor.execute("""
-        CREATE TABLE qr_codes (
+# (index name, table, columns) — must match __table_args__ in app/models.py
+INDEXES = [
+    ("ix_users_created_at_id", "users", "created_at, id"),
+    ("ix_urls_user_id_created_at_id", "urls", "user_id, created_at, id"),
+    ("ix_urls_created_at_id", "urls", "created_at, id"),
+    ("ix_qr_codes_user_id_created_at_id", "qr_codes", "user_id, created_at, id"),
+    ("ix_urls_is_active_expires_at", "urls", "is_active, expires_at"),
+]
+
+
+def run_index_migration(conn: sqlite3.Connection) -> None:
+    """Create composite indexes added after the initial schema."""
+    cursor = conn.cursor()
+    for name, table, columns in INDEXES:
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table}({columns})")
+    conn.commit()
+
+
+def run_tags_migration(conn: sqlite3.Connection) -> None:
+    """Split legacy comma-separated urls.tags into tags / url_tags tables."""
+    from app.services.tag_service import parse_tags
+
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA table_info(urls)")
+    if 'tags' not in [col[1] for col in cursor.fetchall()]:
+        return
+
+    print("🔄 Running migration: Moving link tags into 'tags' table...")
+    rows = conn.execute(
+        "SELECT id, user_id, tags FROM urls WHERE tags IS NOT NULL AND tags != ''"
+    )
+    for url_id, user_id, raw in rows:
+        for name in parse_tags(raw):
+            cursor.execute(
+                "INSERT OR IGNORE INTO tags (user_id, name, created_at) "
+                "VALUES (?, ?, CURRENT_TIMESTAMP)",
+                (user_id, name),
+            )
+            cursor.execute(
+                "SELECT id FROM tags WHERE user_id = ? AND name = ?",
+                (user_id, name),
+            )
+            tag_id = cursor.fetchone()[0]
+            cursor.execute(
+                "INSERT OR IGNORE INTO url_tags (url_id, tag_id) VALUES (?, ?)",
+                (url_id, tag_id),
+            )
+
+    try:
+        cursor.execute("ALTER TABLE urls DROP COLUMN tags")
+    except sqlite3.OperationalError:
+        # SQLite < 3.35: keep the column but clear it so this runs once
+        cursor.execute("UPDATE urls SET tags = NULL")
+    conn.commit()
+    print("✅ Migration completed: link tags normalized")
+
+
+def run_owns_url_migration(conn: sqlite3.Connection) -> None:
+    """Add qr_codes.owns_url (short links created together with a dynamic QR)."""
+    if 'owns_url' in _table_columns(conn, "qr_codes"):
+        return
+    print("🔄 Running migration: Adding 'owns_url' column...")
+    conn.execute("ALTER TABLE qr_codes ADD COLUMN owns_url BOOLEAN NOT NULL DEFAULT 0")
+    conn.commit()
+    print("✅ Migration completed: 'owns_url' column added")
+
+
+def _create_qr_table(cursor: sqlite3.Cursor, table: str = "qr_codes") -> None:
+    """Create qr_codes table with full schema (indexes only under the final name)."""
+    cursor.execute(f"""
+        CREATE TABLE {table} (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             user_id INTEGER NOT NULL,
             url_id INTEGER,
             content VARCHAR(2000) NOT NULL,
             title VARCHAR(200),
-            qr_image_base64 TEXT NOT NULL,
+            image_digest VARCHAR(64) NOT NULL,
             foreground_color VARCHAR(7) DEFAULT '#000000',
             background_color VARCHAR(7) DEFAULT '#FFFFFF',
             style VARCHAR(20) DEFAULT 'square',
             box_size INTEGER DEFAULT 10,
             border_size INTEGER DEFAULT 4,
-            logo_base64 TEXT,
+            logo_digest VARCHAR(64),
             error_correction VARCHAR(1) DEFAULT 'M',
             downloads_count INTEGER DEFAULT 0,
             created_at DATETIME,
             updated_at DATETIME,
             qr_data VARCHAR(2000),
+            owns_url BOOLEAN NOT NULL DEFAULT 0,
             FOREIGN KEY (user_id) REFERENCES users(id),
             FOREIGN KEY (url_id) REFERENCES urls(id)
         )
     """)
-    cursor.execute("CREATE INDEX idx_qr_codes_user_id ON qr_codes(user_id)")
-    cursor.execute("CREATE INDEX idx_qr_codes_url_id ON qr_codes(url_id)")
+    if table == "qr_codes":
+        _create_qr_indexes(cursor)
 
 
-def _migrate_qr_table(cursor: sqlite3.Cursor) -> None:
-    """Migrate existing qr_codes table to new schema."""
-    # Backup data
-    cursor.execute("SELECT * FROM qr_codes")
-    rows = cursor.fetchall()
-    old_columns = [col[1] for col in cursor.description]
-    data_backup = [dict(zip(old_columns, row)) for row in rows]
-    
-    # Drop and recreate
-    cursor.execute("DROP TABLE qr_codes")
-    _create_qr_table(cursor)
-    
-    # Restore data
-    for data in data_backup:
-        content = data.get('content') or data.get('qr_data') or 'https://example.com'
-        cursor.execute("""
-            INSERT INTO qr_codes (
-                id, user_id, url_id, content, title, qr_image_base64,
-                foreground_color, background_color, style,
-                box_size, border_size, logo_base64, error_correction,
-                downloads_count, created_at, updated_at, qr_data
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            data.get('id'), data.get('user_id'), data.get('url_id'),
-            content, data.get('title'),
-            data.get('qr_image_base64') or data.get('qr_data', ''),
-            data.get('foreground_color', '#000000'),
-            data.get('background_color', '#FFFFFF'),
-            data.get('style', 'square'),
-            data.get('box_size', 10),
-            data.get('border_size', 4),
-            data.get('logo_base64'),
-            data.get('error_correction', 'M'),
-            data.get('downloads_count', 0),
-            data.get('created_at'), data.get('updated_at'),
-            data.get('qr_data')
-        ))
-
-
-def run_all_migrations() -> None:
-    """Run all database migrations on startup."""
-    db_path = get_db_path()
-    print(f"🔍 Checking database: {db_path}")
-    
-    conn = sqlite3.connect(db_path)
+def _create_qr_indexes(cursor: sqlite3.Cursor) -> None:
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_qr_codes_user_id ON qr_codes(user_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_qr_codes_url_id ON qr_codes(url_id)")
+    for name, table, columns in INDEXES:
+        if table == "qr_codes":
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table}({columns})")
+
+
+# Column of the new qr_codes table -> SQL default when the old table lacks it
+_QR_COLUMN_DEFAULTS = {
+    "id": None,
+    "user_id": None,
+    "url_id": "NULL",
+    "content": None,
+    "title": "NULL",
+    "image_digest": None,
+    "foreground_color": "'#000000'",
+    "background_color": "'#FFFFFF'",
+    "style": "'square'",
+    "box_size": "10",
+    "border_size": "4",
+    "logo_digest": "NULL",
+    "error_correction": "'M'",
+    "downloads_count": "0",
+    "created_at": "NULL",
+    "updated_at": "NULL",
+    "qr_data": "NULL",
+    "owns_url": "0",
+}
+
+
+def _table_columns(conn: sqlite3.Connection, table: str) -> List[str]:
+    return [col[1] for col in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def _migrate_qr_table(conn: sqlite3.Connection) -> None:
+    """
+    Migrate existing qr_codes table to new schema.
+
+    Inline base64 images are first moved to the blob store in batches
+    (only their digests are written back), then the table is rebuilt
+    with a single INSERT ... SELECT — rows never pass through Python.
+    """
+    conn.commit()
+    columns = _table_columns(conn, "qr_codes")
+    for column in ("image_digest", "logo_digest"):
+        if column not in columns:
+            conn.execute(f"ALTER TABLE qr_codes ADD COLUMN {column} VARCHAR(64)")
+            columns.append(column)
+    conn.commit()
+
+    _fill_blob_digests(conn, columns)
+
+    def source(column: str) -> str:
+        default = _QR_COLUMN_DEFAULTS[column]
+        if column == "content":
+            candidates = [c for c in ("content", "qr_data") if c in columns]
+            return f"COALESCE({', '.join(candidates + [repr('https://example.com')])})"
+        if column not in columns:
+            return default
+        if default in (None, "NULL"):
+            return column
+        return f"COALESCE({column}, {default})"
+
+    targets = list(_QR_COLUMN_DEFAULTS)
+    cursor = conn.cursor()
+    cursor.execute("BEGIN")
+    try:
+        cursor.execute("DROP TABLE IF EXISTS qr_codes_new")
+        _create_qr_table(cursor, "qr_codes_new")
+        cursor.execute(
+            f"INSERT INTO qr_codes_new ({', '.join(targets)}) "
+            f"SELECT {', '.join(source(c) for c in targets)} FROM qr_codes"
+        )
+        cursor.execute("DROP TABLE qr_codes")
+        cursor.execute("ALTER TABLE qr_codes_new RENAME TO qr_codes")
+        _create_qr_indexes(cursor)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def _fill_blob_digests(conn: sqlite3.Connection, columns: List[str]) -> None:
+    """
+    Set image_digest / logo_digest for rows that still lack them.
+
+    Walks the table by id in batches of QR_BLOB_BATCH_SIZE, so memory
+    use does not grow with the table; each batch is committed, and a
+    re-run continues where an interrupted one stopped.
+    """
+    needs_work = ["image_digest IS NULL"]
+    if "logo_base64" in columns:
+        needs_work.append("(logo_digest IS NULL AND logo_base64 IS NOT NULL)")
+    query = (
+        f"SELECT * FROM qr_codes WHERE id > ? AND ({' OR '.join(needs_work)}) "
+        f"ORDER BY id LIMIT {QR_BLOB_BATCH_SIZE}"
+    )
+
+    last_id = 0
+    while True:
+        cursor = conn.execute(query, (last_id,))
+        names = [col[0] for col in cursor.description]
+        rows = [dict(zip(names, row)) for row in cursor.fetchall()]
+        if not rows:
+            return
+
+        updates = []
+        for data in rows:
+            content = data.get('content') or data.get('qr_data') or 'https://example.com'
+            logo_digest = data.get('logo_digest') or _store_base64(data.get('logo_base64'))
+            image_digest = (
+                data.get('image_digest')
+                or _store_base64(data.get('qr_image_base64'))
+                or _render_to_blob(content, data)
+            )
+            updates.append((image_digest, logo_digest, data['id']))
+
+        conn.executemany(
+            "UPDATE qr_codes SET image_digest = ?, logo_digest = ? WHERE id = ?",
+            updates,
+        )
+        conn.commit()
+        last_id = rows[-1]['id']
+
+
+def _store_base64(value: Optional[str]) -> Optional[str]:
+    """Put a base64 (or data URI) payload into the blob store, return digest."""
+    from app.services.blob_store import blob_store
+
+    if not value:
+        return None
+    if "," in value:
+        value = value.split(",")[1]
+    try:
+        data = base64.b64decode(value, validate=True)
+    except (binascii.Error, ValueError):
+        return None
+    return blob_store.put(data) if data else None
+
+
+def _render_to_blob(content: str, data: dict) -> str:
+    """Re-render a QR image whose inline copy was missing or corrupt."""
+    from app.services.blob_store import blob_store
+    from app.services.qr_service import render_qr_png
+
+    png = render_qr_png(
+        content=content,
+        foreground_color=data.get('foreground_color') or '#000000',
+        background_color=data.get('background_color') or '#FFFFFF',
+        style=data.get('style') or 'square',
+        box_size=data.get('box_size') or 10,
+        border_size=data.get('border_size') if data.get('border_size') is not None else 4,
+        error_correction=data.get('error_correction') or 'M',
+    )
+    return blob_store.put(png)
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    apply: Callable[[sqlite3.Connection], None]
+
+
+# Append only: never renumber or reorder applied steps
+MIGRATIONS: List[Migration] = [
+    Migration(1, "users.language column", run_language_migration),
+    Migration(2, "qr_codes images in blob store", run_qr_migration),
+    Migration(3, "composite indexes", run_index_migration),
+    Migration(4, "normalized link tags", run_tags_migration),
+    Migration(5, "qr_codes.owns_url column", run_owns_url_migration),
+]
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+def current_version(conn: sqlite3.Connection) -> int:
+    """Highest applied migration (0 for a database that has none recorded)."""
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS schema_version ("
+        "version INTEGER PRIMARY KEY, "
+        "name VARCHAR(200) NOT NULL, "
+        "applied_at DATETIME DEFAULT CURRENT_TIMESTAMP)"
+    )
+    return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+
+def pending_migrations(conn: sqlite3.Connection) -> List[Migration]:
+    version = current_version(conn)
+    return [m for m in MIGRATIONS if m.version > version]
+
+
+def run_all_migrations(db_path: Optional[Path] = None) -> int:
+    """
+    Apply pending migrations in order.
+
+    Returns:
+        number of migrations applied (0 when the schema is current)
+    """
+    conn = sqlite3.connect(db_path or get_db_path())
     try:
-        print("🔄 Running database migrations...")
-        run_language_migration(conn)
-        run_qr_migration(conn)
-        print("✅ All migrations completed")
+        pending = pending_migrations(conn)
+        if not pending:
+            return 0
+
+        print(f"🔄 Running {len(pending)} database migration(s)...")
+        for migration in pending:
+            migration.apply(conn)
+            conn.execute(
+                "INSERT INTO schema_version (version, name) VALUES (?, ?)",
+                (migration.version, migration.name),
+            )
+            conn.commit()
+            print(f"✅ Migration {migration.version} applied: {migration.name}")
+        return len(pending)
     except Exception as e:
         print(f"⚠️  Migration error: {e}")
         raise
     finally:
         conn.close()
+
+
+def prepare_database(bind=None) -> None:
+    """
+    Full database setup: tables, migrations, search index, admin user.
+
+    Runs at startup (MIGRATE_ON_STARTUP) or once per deploy via the CLI.
+    """
+    from sqlalchemy.orm import Session
+
+    from app.core.security import hash_password
+    from app.database import engine, init_db
+    from app.models import User, UserRole
+    from app.services.search_service import create_fts_tables
+
+    bind = bind or engine
+    init_db(bind)
+    run_all_migrations(Path(bind.url.database))
+
+    # Migrations may rebuild tables (and drop their triggers) — resync search index
+    with bind.begin() as conn:
+        create_fts_tables(conn)
+
+    with Session(bind) as db:
+        admin = db.query(User).filter(User.role == UserRole.ADMIN).first()
+        if not admin:
+            admin = User(
+                email=settings.ADMIN_EMAIL,
+                username=settings.ADMIN_USERNAME,
+                hashed_password=hash_password(settings.ADMIN_PASSWORD),
+                role=UserRole.ADMIN,
+                is_active=True,
+            )
+            db.add(admin)
+            db.commit()
+            print(f"✅ Admin user created: {settings.ADMIN_EMAIL}")
+
+
+def check_schema(db_path: Optional[Path] = None) -> List[Migration]:
+    """Pending migrations, without applying them."""
+    conn = sqlite3.connect(db_path or get_db_path())
+    try:
+        pending = pending_migrations(conn)
+        conn.commit()
+        return pending
+    finally:
+        conn.close()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Apply database migrations.")
+    parser.add_argument(
+        "--database", type=Path, default=None,
+        help="SQLite file (default: from DATABASE_URL)",
+    )
+    parser.add_argument(
+        "--status", action="store_true",
+        help="only show the schema version and pending migrations",
+    )
+    args = parser.parse_args(argv)
+    db_path = args.database or get_db_path()
+
+    if args.status:
+        conn = sqlite3.connect(db_path)
+        try:
+            version = current_version(conn)
+            conn.commit()
+        finally:
+            conn.close()
+        pending = [m for m in MIGRATIONS if m.version > version]
+        print(f"{db_path}: version {version} of {LATEST_VERSION}")
+        for migration in pending:
+            print(f"  pending {migration.version}: {migration.name}")
+        return 1 if pending else 0
+
+    from sqlalchemy import create_engine
+
+    prepare_database(create_engine(f"sqlite:///{db_path}"))
+    print(f"✅ {db_path} is up to date (version {LATEST_VERSION})")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,5 +1,6 @@
 import enum
 from datetime import datetime
+from typing import Optional
 
 from sqlalchemy import (
     Boolean,
@@ -7,11 +8,15 @@ from sqlalchemy import (
     DateTime,
     Enum,
     ForeignKey,
+    Index,
     Integer,
     String,
+    Table,
     Text,
+    func,
+    select,
 )
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import column_property, relationship
 
 from app.database import Base
 
@@ -23,6 +28,10 @@ class UserRole(str, enum.Enum):
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        # Keyset pagination for admin listing
+        Index("ix_users_created_at_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     email = Column(String(255), unique=True, nullable=False, index=True)
@@ -39,27 +48,51 @@ class User(Base):
     last_login = Column(DateTime, nullable=True)
 
     # Relationships
+    # Relationships are never lazy-loaded implicitly: endpoints must
+    # choose a loader strategy (selectinload / joinedload / contains_eager)
     urls = relationship(
-        "URL", back_populates="owner", cascade="all, delete-orphan"
+        "URL",
+        back_populates="owner",
+        cascade="all, delete-orphan",
+        lazy="raise_on_sql",
+    )
+    qr_codes = relationship(
+        "QRCode",
+        back_populates="owner",
+        cascade="all, delete-orphan",
+        lazy="raise_on_sql",
+    )
+    bio_pages = relationship(
+        "BioPage", back_populates="owner", lazy="raise_on_sql"
+    )
+    tags = relationship(
+        "Tag",
+        back_populates="owner",
+        cascade="all, delete-orphan",
+        lazy="raise_on_sql",
+    )
+    logos = relationship(
+        "Logo",
+        back_populates="owner",
+        cascade="all, delete-orphan",
+        lazy="raise_on_sql",
     )
-    qr_codes = relationship("QRCode", back_populates="owner", cascade="all, delete-orphan")
-    bio_pages = relationship("BioPage", back_populates="owner")
 
     @property
     def is_admin(self) -> bool:
         return self.role == UserRole.ADMIN
 
-    @property
-    def total_links(self) -> int:
-        return len(self.urls)
-
-    @property
-    def total_clicks(self) -> int:
-        return sum(url.clicks_count for url in self.urls)
 
 
 class URL(Base):
     __tablename__ = "urls"
+    __table_args__ = (
+        # Keyset pagination: user's listing and admin listing
+        Index("ix_urls_user_id_created_at_id", "user_id", "created_at", "id"),
+        Index("ix_urls_created_at_id", "created_at", "id"),
+        # Expiry scheduler: next active link to expire
+        Index("ix_urls_is_active_expires_at", "is_active", "expires_at"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
@@ -69,7 +102,6 @@ class URL(Base):
     is_active = Column(Boolean, default=True)
     expires_at = Column(DateTime, nullable=True)
     clicks_count = Column(Integer, default=0)
-    tags = Column(String(500), nullable=True)
 
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(
@@ -77,11 +109,23 @@ class URL(Base):
     )
 
     # Relationships
-    owner = relationship("User", back_populates="urls")
+    owner = relationship("User", back_populates="urls", lazy="raise_on_sql")
     clicks = relationship(
-        "Click", back_populates="url", cascade="all, delete-orphan"
+        "Click",
+        back_populates="url",
+        cascade="all, delete-orphan",
+        lazy="raise_on_sql",
+    )
+    qr_code = relationship(
+        "QRCode", back_populates="url", uselist=False, lazy="raise_on_sql"
+    )
+    tag_list = relationship(
+        "Tag",
+        secondary="url_tags",
+        back_populates="urls",
+        order_by="Tag.name",
+        lazy="raise_on_sql",
     )
-    qr_code = relationship("QRCode", back_populates="url", uselist=False)
 
     @property
     def is_expired(self) -> bool:
@@ -89,6 +133,60 @@ class URL(Base):
             return False
         return datetime.utcnow() > self.expires_at
 
+    @property
+    def tags(self) -> Optional[str]:
+        """Tags as a comma-separated string (the API representation)."""
+        if not self.tag_list:
+            return None
+        return ", ".join(tag.name for tag in self.tag_list)
+
+
+# Per-user aggregates computed in SQL instead of walking User.urls.
+# Deferred: load them explicitly with undefer(User.total_links) etc.
+User.total_links = column_property(
+    select(func.count(URL.id))
+    .where(URL.user_id == User.id)
+    .correlate_except(URL)
+    .scalar_subquery(),
+    deferred=True,
+    raiseload=True,
+)
+User.total_clicks = column_property(
+    select(func.coalesce(func.sum(URL.clicks_count), 0))
+    .where(URL.user_id == User.id)
+    .correlate_except(URL)
+    .scalar_subquery(),
+    deferred=True,
+    raiseload=True,
+)
+
+
+url_tags = Table(
+    "url_tags",
+    Base.metadata,
+    Column("url_id", Integer, ForeignKey("urls.id"), primary_key=True),
+    Column("tag_id", Integer, ForeignKey("tags.id"), primary_key=True),
+    # Tag -> links lookups (filters and per-tag analytics)
+    Index("ix_url_tags_tag_id_url_id", "tag_id", "url_id"),
+)
+
+
+class Tag(Base):
+    __tablename__ = "tags"
+    __table_args__ = (
+        Index("ix_tags_user_id_name", "user_id", "name", unique=True),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    name = Column(String(50), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    owner = relationship("User", back_populates="tags", lazy="raise_on_sql")
+    urls = relationship(
+        "URL", secondary=url_tags, back_populates="tag_list", lazy="raise_on_sql"
+    )
+
 
 class Click(Base):
     __tablename__ = "clicks"
@@ -106,17 +204,23 @@ class Click(Base):
     os = Column(String(50), nullable=True)
 
     # Relationships
-    url = relationship("URL", back_populates="clicks")
+    url = relationship("URL", back_populates="clicks", lazy="raise_on_sql")
 
 
 class QRCode(Base):
     __tablename__ = "qr_codes"
+    __table_args__ = (
+        # Keyset-пагинация списка QR-кодов пользователя
+        Index("ix_qr_codes_user_id_created_at_id", "user_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
 
     # Привязка к ссылке (опционально — можно создать QR для произвольного URL)
     url_id = Column(Integer, ForeignKey("urls.id"), nullable=True, index=True)
+    # Ссылка создана вместе с QR-кодом (динамический QR) и удаляется с ним
+    owns_url = Column(Boolean, default=False, nullable=False)
 
     # Контент QR-кода (URL, на который ведёт)
     content = Column(String(2000), nullable=False)
@@ -124,8 +228,8 @@ class QRCode(Base):
     # Название (для галереи)
     title = Column(String(200), nullable=True)
 
-    # Изображение QR в base64 (PNG)
-    qr_image_base64 = Column(Text, nullable=False)
+    # Изображение QR (PNG) лежит в blob store, здесь — только sha256
+    image_digest = Column(String(64), nullable=False)
 
     # Настройки стиля (сохраняем для возможности пересоздания)
     foreground_color = Column(String(7), default="#000000")
@@ -137,8 +241,8 @@ class QRCode(Base):
     # Ширина границы
     border_size = Column(Integer, default=4)
 
-    # Логотип (base64 маленькой картинки, вставленной в центр)
-    logo_base64 = Column(Text, nullable=True)
+    # Логотип (маленькая картинка в центре) — тоже в blob store
+    logo_digest = Column(String(64), nullable=True)
 
     # Error correction level: L, M, Q, H
     error_correction = Column(String(1), default="M")
@@ -154,8 +258,28 @@ class QRCode(Base):
     qr_data = Column(String(2000), nullable=True)
 
     # Relationships
-    owner = relationship("User", back_populates="qr_codes")
-    url = relationship("URL", back_populates="qr_code")
+    owner = relationship(
+        "User", back_populates="qr_codes", lazy="raise_on_sql"
+    )
+    url = relationship("URL", back_populates="qr_code", lazy="raise_on_sql")
+
+
+class Logo(Base):
+    """Логотип из библиотеки пользователя (нормализованный PNG в blob store)."""
+    __tablename__ = "logos"
+    __table_args__ = (
+        Index("ix_logos_user_id_digest", "user_id", "digest", unique=True),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    # sha256 нормализованного RGBA PNG — тот же digest, что в QRCode.logo_digest
+    digest = Column(String(64), nullable=False)
+    width = Column(Integer, nullable=False)
+    height = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    owner = relationship("User", back_populates="logos", lazy="raise_on_sql")
 
 
 class BioPage(Base):
@@ -171,12 +295,15 @@ class BioPage(Base):
     views = Column(Integer, default=0)
     created_at = Column(DateTime, default=datetime.utcnow)
 
-    owner = relationship("User", back_populates="bio_pages")
+    owner = relationship(
+        "User", back_populates="bio_pages", lazy="raise_on_sql"
+    )
     links = relationship(
         "BioLink",
         back_populates="page",
         cascade="all, delete-orphan",
         order_by="BioLink.position",
+        lazy="raise_on_sql",
     )
 
 
@@ -192,4 +319,4 @@ class BioLink(Base):
     clicks = Column(Integer, default=0)
     is_active = Column(Boolean, default=True)
 
-    page = relationship("BioPage", back_populates="links")
+    page = relationship("BioPage", back_populates="links", lazy="raise_on_sql")
@@ -2,7 +2,7 @@ import re
 from datetime import datetime
 from typing import Optional
 
-from pydantic import BaseModel, EmailStr, field_validator, HttpUrl
+from pydantic import BaseModel, EmailStr, field_validator, model_validator, HttpUrl
 
 
 # ============================================
@@ -133,13 +133,20 @@ class URLUpdateRequest(BaseModel):
 # QR CODE SCHEMAS
 # ============================================
 
-class QRCodeCreateRequest(BaseModel):
-    """Запрос на создание QR-кода."""
-    content: str  # URL или текст для кодирования
-    title: Optional[str] = None
-    url_id: Optional[int] = None  # привязка к существующей ссылке
+QR_BATCH_MAX = 50
+
+
+def _validate_qr_content(v: str) -> str:
+    v = v.strip()
+    if not v:
+        raise ValueError("Содержимое QR-кода не может быть пустым")
+    if len(v) > 2000:
+        raise ValueError("Максимальная длина — 2000 символов")
+    return v
 
-    # Стилизация
+
+class QRCodeStyle(BaseModel):
+    """Параметры оформления QR-кода (общие для создания и пакета)."""
     foreground_color: str = "#000000"
     background_color: str = "#FFFFFF"
     style: str = "square"  # square | rounded | dots | circle
@@ -149,16 +156,8 @@ class QRCodeCreateRequest(BaseModel):
 
     # Логотип (base64 строка, опционально)
     logo_base64: Optional[str] = None
-
-    @field_validator("content")
-    @classmethod
-    def validate_content(cls, v: str) -> str:
-        v = v.strip()
-        if not v:
-            raise ValueError("Содержимое QR-кода не может быть пустым")
-        if len(v) > 2000:
-            raise ValueError("Максимальная длина — 2000 символов")
-        return v
+    # ...или логотип из библиотеки (см. POST /api/v1/qr/logos)
+    logo_id: Optional[int] = None
 
     @field_validator("foreground_color", "background_color")
     @classmethod
@@ -197,6 +196,38 @@ class QRCodeCreateRequest(BaseModel):
         return v
 
 
+class QRCodeCreateRequest(QRCodeStyle):
+    """Запрос на создание QR-кода."""
+    content: str  # URL или текст для кодирования
+    title: Optional[str] = None
+    url_id: Optional[int] = None  # привязка к существующей ссылке
+
+    @field_validator("content")
+    @classmethod
+    def validate_content(cls, v: str) -> str:
+        return _validate_qr_content(v)
+
+
+class QRCodeBatchRequest(QRCodeStyle):
+    """Пакетное создание: по QR-коду на каждую ссылку и/или контент."""
+    url_ids: list[int] = []
+    contents: list[str] = []
+
+    @field_validator("contents")
+    @classmethod
+    def validate_contents(cls, v: list[str]) -> list[str]:
+        return [_validate_qr_content(item) for item in v]
+
+    @model_validator(mode="after")
+    def validate_size(self):
+        count = len(self.url_ids) + len(self.contents)
+        if count == 0:
+            raise ValueError("Укажите url_ids или contents")
+        if count > QR_BATCH_MAX:
+            raise ValueError(f"Максимум {QR_BATCH_MAX} QR-кодов за один запрос")
+        return self
+
+
 class QRCodePreviewRequest(BaseModel):
     """Запрос на превью (без сохранения в БД)."""
     content: str = "https://example.com"
@@ -207,6 +238,7 @@ class QRCodePreviewRequest(BaseModel):
     border_size: int = 4
     error_correction: str = "M"
     logo_base64: Optional[str] = None
+    logo_id: Optional[int] = None
 
 
 class QRCodeResponse(BaseModel):
@@ -215,14 +247,17 @@ class QRCodeResponse(BaseModel):
     content: str
     title: Optional[str]
     url_id: Optional[int]
-    qr_image_base64: str
+    image_url: str
+    thumbnail_url: str
+    # Только в ответах по одному QR-коду; в списках — None
+    qr_image_base64: Optional[str] = None
     foreground_color: str
     background_color: str
     style: str
     box_size: int
     border_size: int
     error_correction: str
-    logo_base64: Optional[str]
+    logo_base64: Optional[str] = None
     downloads_count: int
     created_at: str
     updated_at: str
@@ -230,6 +265,8 @@ class QRCodeResponse(BaseModel):
     # Дополнительные поля (если привязана ссылка)
     linked_short_code: Optional[str] = None
     linked_clicks: Optional[int] = None
+    # Куда ведёт динамический QR-код
+    destination: Optional[str] = None
 
     class Config:
         from_attributes = True
@@ -238,15 +275,54 @@ class QRCodeResponse(BaseModel):
 class QRCodeListResponse(BaseModel):
     """Список QR-кодов с пагинацией."""
     items: list[QRCodeResponse]
-    total: int
+    total: Optional[int] = None
+    total_exact: bool = True
     page: int
     per_page: int
-    pages: int
+    pages: Optional[int] = None
+    next_cursor: Optional[str] = None
+
+
+class QRCodeBatchResponse(BaseModel):
+    """Результат пакетного создания."""
+    items: list[QRCodeResponse]
 
 
 class QRCodeUpdateRequest(BaseModel):
-    """Обновление QR-кода (только title)."""
+    """
+    Обновление QR-кода.
+
+    destination — новый адрес динамического QR (картинка не меняется);
+    design — поля оформления, которые нужно поменять (перерисовка в фоне).
+    """
     title: Optional[str] = None
+    destination: Optional[str] = None
+    design: Optional[QRCodeStyle] = None
+
+    @field_validator("destination")
+    @classmethod
+    def validate_destination(cls, v: Optional[str]) -> Optional[str]:
+        if v is None:
+            return v
+        if not v.startswith(("http://", "https://")):
+            v = "https://" + v
+        HttpUrl(v)
+        return v
+
+
+class LogoUploadRequest(BaseModel):
+    """Загрузка логотипа в библиотеку."""
+    logo_base64: str
+
+
+class LogoResponse(BaseModel):
+    """Логотип из библиотеки."""
+    id: int
+    digest: str
+    url: str
+    width: int
+    height: int
+    created_at: str
 
 
 class QRCodePreviewResponse(BaseModel):
@@ -0,0 +1,271 @@
+"""
+Production server.
+
+    python -m app.server [--workers N] [--port 8000] ...
+
+The parent process sets up the database once (tables, migrations,
+admin user), imports the app together with the QR rendering stack,
+binds the listening socket and then forks the workers. The workers
+share the preloaded code and data pages copy-on-write, and none of
+them repeats the setup.
+
+SIGTERM / SIGINT to the parent is forwarded to the workers: each stops
+accepting connections, finishes in-flight requests (up to
+SERVER_GRACEFUL_TIMEOUT_SECONDS) and runs the app shutdown, which
+flushes buffered counters. Workers that die unexpectedly are restarted;
+one that dies within SERVER_WORKER_MIN_UPTIME_SECONDS of starting is
+restarted after a growing delay, and after SERVER_MAX_FAST_RESTARTS
+such failures in a row the server stops with exit code 1.
+
+The expiry scheduler runs in the first worker only; a restarted first
+worker takes the job over. Metrics are aggregated across workers
+through METRICS_DIR (see app.core.metrics), so /metrics reports totals
+whichever worker answers.
+
+uvloop and httptools are used when installed (uvicorn[standard]).
+On platforms without fork() a single worker is run.
+"""
+
+import argparse
+import gc
+import os
+import signal
+import sys
+import time
+import traceback
+from typing import Dict, List, Optional
+
+import uvicorn
+
+from app.config import settings
+from app.core import metrics
+
+# Delay before restarting a worker after its n-th fast failure in a row
+RESTART_BACKOFF_SECONDS = 0.5
+RESTART_BACKOFF_MAX_SECONDS = 10.0
+
+
+def worker_count(requested: int) -> int:
+    """Number of worker processes (0 = one per CPU core)."""
+    if requested > 0:
+        return requested
+    return os.cpu_count() or 1
+
+
+def build_config(args: argparse.Namespace) -> uvicorn.Config:
+    from app.main import app
+
+    return uvicorn.Config(
+        app,
+        host=args.host,
+        port=args.port,
+        loop="auto",
+        http="auto",
+        lifespan="on",
+        backlog=args.backlog,
+        timeout_keep_alive=args.keep_alive,
+        limit_concurrency=args.limit_concurrency or None,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        proxy_headers=True,
+        forwarded_allow_ips=args.forwarded_allow_ips,
+        server_header=False,
+        log_level=args.log_level,
+    )
+
+
+def preload(init_db: bool) -> None:
+    """One-time work in the parent, inherited by every worker."""
+    from app.database import engine
+    from app.migrations import prepare_database
+
+    if init_db:
+        prepare_database()
+    # Workers only check the schema version
+    settings.MIGRATE_ON_STARTUP = False
+    # Connections must not be shared across fork()
+    engine.dispose()
+
+    # Loaded lazily in single-process mode; here the workers share it
+    from app.api.qr import qr_service
+    from app.core.assets import static_assets
+
+    qr_service.THUMBNAIL_SIZE
+    static_assets.build()
+
+
+def configure_worker(index: int) -> None:
+    """Per-worker settings, applied in the worker right after fork."""
+    # Background jobs that must not run concurrently: first worker only
+    if index != 0:
+        settings.EXPIRY_SCHEDULER_ENABLED = False
+
+
+class Supervisor:
+    """Forks workers on a shared socket, restarts them, relays shutdown."""
+
+    def __init__(self, config: uvicorn.Config, workers: int):
+        self.config = config
+        self.workers = workers
+        self.children: Dict[int, int] = {}  # pid -> worker index
+        self.started: Dict[int, float] = {}  # pid -> monotonic start time
+        self.fast_failures = 0
+        self.stopping = False
+
+    def run(self) -> int:
+        sock = self.config.bind_socket()
+        # Objects created so far stay out of the GC's reach, so collections
+        # in the workers do not write to (and un-share) the preloaded pages
+        gc.freeze()
+        if settings.METRICS_ENABLED:
+            metrics.clear_shared(settings.METRICS_DIR)
+
+        # Before forking, so a signal during startup is not lost
+        signal.signal(signal.SIGTERM, self._shutdown)
+        signal.signal(signal.SIGINT, self._shutdown)
+
+        for index in range(self.workers):
+            self._spawn(index, sock)
+
+        exit_code = 0
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            index = self.children.pop(pid, None)
+            if index is None:
+                continue
+            uptime = time.monotonic() - self.started.pop(pid)
+            code = os.waitstatus_to_exitcode(status)
+            if self.stopping:
+                exit_code = exit_code or (code if code > 0 else 0)
+                continue
+
+            if uptime >= settings.SERVER_WORKER_MIN_UPTIME_SECONDS:
+                self.fast_failures = 0
+            else:
+                self.fast_failures += 1
+            if self.fast_failures >= settings.SERVER_MAX_FAST_RESTARTS:
+                print(
+                    f"❌ Workers keep exiting within "
+                    f"{settings.SERVER_WORKER_MIN_UPTIME_SECONDS:g}s of starting, giving up"
+                )
+                self._shutdown(signal.SIGTERM, None)
+                exit_code = 1
+                continue
+
+            delay = self._backoff()
+            print(f"⚠️  Worker {pid} exited ({code}), restarting in {delay:g}s")
+            self._sleep(delay)
+            if not self.stopping:
+                self._spawn(index, sock)
+
+        sock.close()
+        return exit_code
+
+    def _backoff(self) -> float:
+        if not self.fast_failures:
+            return 0
+        return min(
+            RESTART_BACKOFF_SECONDS * 2 ** (self.fast_failures - 1),
+            RESTART_BACKOFF_MAX_SECONDS,
+        )
+
+    def _sleep(self, seconds: float) -> None:
+        """Wait before a restart, but not past a shutdown request."""
+        deadline = time.monotonic() + seconds
+        while not self.stopping and time.monotonic() < deadline:
+            time.sleep(min(0.1, deadline - time.monotonic()))
+
+    def _spawn(self, index: int, sock) -> None:
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            configure_worker(index)
+            if settings.METRICS_ENABLED:
+                # Values counted in the parent (setup) are not this worker's
+                metrics.REGISTRY.reset()
+                metrics.REGISTRY.share(settings.METRICS_DIR, settings.METRICS_SNAPSHOT_SECONDS)
+            code = 1
+            try:
+                code = self._serve(sock)
+            finally:
+                metrics.REGISTRY.stop_sharing()
+                os._exit(code)
+        self.children[pid] = index
+        self.started[pid] = time.monotonic()
+        if self.stopping:
+            # The signal arrived while forking
+            os.kill(pid, signal.SIGTERM)
+
+    def _serve(self, sock) -> int:
+        """Run one worker until shutdown; returns its exit code."""
+        server = uvicorn.Server(self.config)
+        try:
+            server.run(sockets=[sock])
+        except SystemExit as exc:
+            return exc.code if isinstance(exc.code, int) else 1
+        except BaseException:
+            traceback.print_exc()
+            sys.stderr.flush()
+            return 1
+        # uvicorn logs a failed lifespan startup and returns
+        return 0 if server.started else 1
+
+    def _shutdown(self, signum, frame) -> None:
+        self.stopping = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run the production server.")
+    parser.add_argument("--host", default=settings.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=settings.SERVER_PORT)
+    parser.add_argument(
+        "--workers", type=int, default=settings.SERVER_WORKERS,
+        help="worker processes (0 = one per CPU core)",
+    )
+    parser.add_argument("--backlog", type=int, default=settings.SERVER_BACKLOG)
+    parser.add_argument(
+        "--keep-alive", type=int, default=settings.SERVER_KEEPALIVE_SECONDS,
+        help="seconds to keep idle connections open",
+    )
+    parser.add_argument(
+        "--limit-concurrency", type=int, default=settings.SERVER_LIMIT_CONCURRENCY,
+        help="per-worker connections before answering 503 (0 = no limit)",
+    )
+    parser.add_argument(
+        "--graceful-timeout", type=int, default=settings.SERVER_GRACEFUL_TIMEOUT_SECONDS,
+    )
+    parser.add_argument(
+        "--forwarded-allow-ips", default=settings.SERVER_FORWARDED_ALLOW_IPS,
+    )
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument(
+        "--no-init", action="store_true",
+        help="skip database setup (already done by python -m app.migrations)",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    preload(init_db=not args.no_init)
+    config = build_config(args)
+
+    workers = worker_count(args.workers)
+    if workers == 1 or not hasattr(os, "fork"):
+        uvicorn.Server(config).run()
+        return 0
+
+    print(f"🚀 Starting {workers} workers on {args.host}:{args.port}")
+    return Supervisor(config, workers).run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,237 @@
+"""
+Хранилище бинарных данных (изображения QR-кодов, логотипы).
+
+Данные адресуются по содержимому: ключ — sha256 от байтов, поэтому
+одинаковые изображения хранятся один раз, а в БД лежит только digest.
+
+Бэкенды:
+- local    — каталог на диске, пути шардированы: ab/cd/abcd...;
+- s3       — S3-совместимое хранилище (нужен boto3);
+- s3-local — тот же S3-интерфейс поверх локального каталога,
+             для разработки и тестов без внешнего сервиса.
+"""
+
+import abc
+import base64
+import hashlib
+import os
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+from app.config import settings
+
+
+def blob_digest(data: bytes) -> str:
+    """Ключ блоба — sha256 от содержимого."""
+    return hashlib.sha256(data).hexdigest()
+
+
+class BlobStore(abc.ABC):
+    """Интерфейс хранилища."""
+
+    @abc.abstractmethod
+    def put(self, data: bytes) -> str:
+        """Сохранить данные и вернуть их digest (идемпотентно)."""
+
+    @abc.abstractmethod
+    def get(self, digest: str) -> Optional[bytes]:
+        """Прочитать данные по digest (None, если их нет)."""
+
+    @abc.abstractmethod
+    def delete(self, digest: str) -> None:
+        """Удалить данные по digest (если есть)."""
+
+    @abc.abstractmethod
+    def age(self, digest: str) -> Optional[float]:
+        """Секунды с последнего put() этого блоба (None, если его нет)."""
+
+    def put_base64(self, value: Optional[str]) -> Optional[str]:
+        """Сохранить base64 (или data URI) и вернуть digest; пустое — None."""
+        if not value:
+            return None
+        if "," in value:
+            value = value.split(",")[1]
+        return self.put(base64.b64decode(value))
+
+    def get_base64(self, digest: Optional[str]) -> Optional[str]:
+        """Блоб в base64 для JSON API (None, если digest пуст или блоба нет)."""
+        if not digest:
+            return None
+        data = self.get(digest)
+        if data is None:
+            return None
+        return base64.b64encode(data).decode("utf-8")
+
+
+class LocalBlobStore(BlobStore):
+    """Content-addressed каталог на локальном диске."""
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+
+    def _path(self, digest: str) -> Path:
+        return self.root / digest[:2] / digest[2:4] / digest
+
+    def put(self, data: bytes) -> str:
+        digest = blob_digest(data)
+        path = self._path(digest)
+        try:
+            # Блоб уже есть — обновляем время, чтобы его не удалила сборка
+            # мусора, пока запись, ссылающаяся на него, не закоммичена
+            os.utime(path)
+        except FileNotFoundError:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Имя уникально для процесса и потока: одинаковый блоб могут
+            # сохранять одновременно
+            fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tmp, path)
+            except OSError:
+                os.unlink(tmp)
+                raise
+        return digest
+
+    def get(self, digest: str) -> Optional[bytes]:
+        try:
+            return self._path(digest).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def delete(self, digest: str) -> None:
+        try:
+            self._path(digest).unlink()
+        except FileNotFoundError:
+            pass
+
+    def age(self, digest: str) -> Optional[float]:
+        try:
+            return time.time() - self._path(digest).stat().st_mtime
+        except FileNotFoundError:
+            return None
+
+
+class LocalS3Client:
+    """
+    Минимальная замена boto3 S3-клиента поверх каталога.
+
+    Реализует только put_object / get_object / head_object /
+    delete_object в объёме, который использует S3BlobStore.
+    """
+
+    class ClientError(Exception):
+        pass
+
+    class NoSuchKey(ClientError):
+        pass
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+        self.exceptions = self
+
+    def _path(self, bucket: str, key: str) -> Path:
+        return self.root / bucket / key
+
+    def put_object(self, Bucket: str, Key: str, Body: bytes, **kwargs) -> dict:
+        path = self._path(Bucket, Key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(Body)
+        return {}
+
+    def get_object(self, Bucket: str, Key: str) -> dict:
+        path = self._path(Bucket, Key)
+        if not path.exists():
+            raise self.NoSuchKey(Key)
+        return {"Body": _BytesBody(path.read_bytes())}
+
+    def head_object(self, Bucket: str, Key: str) -> dict:
+        path = self._path(Bucket, Key)
+        try:
+            mtime = path.stat().st_mtime
+        except FileNotFoundError:
+            # boto3 отвечает на HEAD без объекта общим ClientError (404)
+            raise self.ClientError(Key)
+        return {"LastModified": datetime.fromtimestamp(mtime, timezone.utc)}
+
+    def delete_object(self, Bucket: str, Key: str) -> dict:
+        path = self._path(Bucket, Key)
+        if path.exists():
+            path.unlink()
+        return {}
+
+
+class _BytesBody:
+    def __init__(self, data: bytes):
+        self._data = data
+
+    def read(self) -> bytes:
+        return self._data
+
+
+class S3BlobStore(BlobStore):
+    """Хранилище в S3-совместимом bucket (ключи: prefix/ab/cd/digest)."""
+
+    def __init__(self, client, bucket: str, prefix: str = ""):
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+
+    def _key(self, digest: str) -> str:
+        key = f"{digest[:2]}/{digest[2:4]}/{digest}"
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    def put(self, data: bytes) -> str:
+        digest = blob_digest(data)
+        self.client.put_object(Bucket=self.bucket, Key=self._key(digest), Body=data)
+        return digest
+
+    def get(self, digest: str) -> Optional[bytes]:
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=self._key(digest))
+        except self.client.exceptions.NoSuchKey:
+            return None
+        return response["Body"].read()
+
+    def delete(self, digest: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(digest))
+
+    def age(self, digest: str) -> Optional[float]:
+        # put() всегда перезаписывает объект, так что LastModified — время
+        # последнего сохранения
+        try:
+            response = self.client.head_object(Bucket=self.bucket, Key=self._key(digest))
+        except self.client.exceptions.ClientError:
+            return None
+        return (datetime.now(timezone.utc) - response["LastModified"]).total_seconds()
+
+
+def create_blob_store() -> BlobStore:
+    """Создать хранилище по настройкам BLOB_STORE_*."""
+    backend = settings.BLOB_STORE_BACKEND
+
+    if backend == "local":
+        return LocalBlobStore(settings.BLOB_STORE_DIR)
+
+    if backend == "s3-local":
+        return S3BlobStore(
+            LocalS3Client(settings.BLOB_STORE_DIR),
+            settings.BLOB_S3_BUCKET,
+            settings.BLOB_S3_PREFIX,
+        )
+
+    if backend == "s3":
+        try:
+            import boto3
+        except ImportError:
+            raise RuntimeError("BLOB_STORE_BACKEND=s3 requires boto3")
+        client = boto3.client("s3", endpoint_url=settings.BLOB_S3_ENDPOINT_URL or None)
+        return S3BlobStore(client, settings.BLOB_S3_BUCKET, settings.BLOB_S3_PREFIX)
+
+    raise RuntimeError(f"Unknown BLOB_STORE_BACKEND: {backend}")
+
+
+blob_store = create_blob_store()
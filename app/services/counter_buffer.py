@@ -0,0 +1,120 @@
+"""
+Буферизованные счётчики (downloads_count и т.п.).
+
+Вместо UPDATE + COMMIT на каждый запрос инкременты копятся в памяти
+и периодически сбрасываются в БД пачкой: один UPDATE на каждое
+значение прироста (col = col + n WHERE id IN (...)).
+
+Значение счётчика в БД отстаёт не больше чем на flush_interval;
+при остановке приложения буфер сбрасывается.
+"""
+
+import asyncio
+import logging
+import threading
+from collections import Counter, defaultdict
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models import QRCode
+
+logger = logging.getLogger(__name__)
+
+
+class CounterBuffer:
+    """Накопитель инкрементов одного целочисленного столбца."""
+
+    def __init__(
+        self,
+        column,
+        session_factory: Callable[[], Session] = SessionLocal,
+        flush_interval: float = settings.COUNTER_FLUSH_INTERVAL_SECONDS,
+    ):
+        self.column = column
+        self.model = column.class_
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval
+
+        self._pending: Counter = Counter()
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def increment(self, row_id: int, amount: int = 1) -> None:
+        """Добавить прирост для строки row_id (без обращения к БД)."""
+        with self._lock:
+            self._pending[row_id] += amount
+
+    def pending(self, row_id: int) -> int:
+        """Ещё не записанный в БД прирост для строки."""
+        with self._lock:
+            return self._pending.get(row_id, 0)
+
+    def pending_total(self) -> int:
+        """Сумма всех ещё не записанных приростов (глубина очереди)."""
+        with self._lock:
+            return sum(self._pending.values())
+
+    def flush(self) -> int:
+        """Записать накопленное в БД. Возвращает число обновлённых строк."""
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+        if not pending:
+            return 0
+
+        # Строки с одинаковым приростом обновляем одним запросом
+        by_amount: Dict[int, List[int]] = defaultdict(list)
+        for row_id, amount in pending.items():
+            by_amount[amount].append(row_id)
+
+        db = self.session_factory()
+        try:
+            for amount, ids in by_amount.items():
+                db.query(self.model).filter(self.model.id.in_(ids)).update(
+                    {self.column: self.column + amount},
+                    synchronize_session=False,
+                )
+            db.commit()
+        except Exception:
+            db.rollback()
+            # Не теряем инкременты — вернём их в буфер
+            with self._lock:
+                self._pending.update(pending)
+            raise
+        finally:
+            db.close()
+        return len(pending)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                # Запись в БД блокирующая — уводим её из event loop
+                await asyncio.to_thread(self.flush)
+            except Exception:
+                logger.exception("Counter flush failed for %s", self.column)
+
+    def start(self) -> None:
+        """Запустить периодический сброс в текущем event loop."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Остановить цикл и сбросить остаток."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Final counter flush failed for %s", self.column)
+
+
+# Скачивания QR-кодов
+qr_downloads = CounterBuffer(QRCode.downloads_count)
@@ -0,0 +1,170 @@
+"""
+Динамические QR-коды.
+
+QR-код с http(s)-контентом кодирует не сам адрес, а собственную
+короткую ссылку (BASE_URL/short_code), которая создаётся
+автоматически. Поэтому:
+- смена адреса назначения — это UPDATE urls.original_url, картинка
+  не меняется (и уже напечатанные коды продолжают работать);
+- сканирования проходят через обычный редирект и считаются как
+  клики этой ссылки.
+
+Смена дизайна (цвета, стиль, логотип...) сохраняется сразу, а PNG
+перерисовывается в фоне через пул рендеринга и кэш (QRRerenderer).
+"""
+
+import logging
+from typing import Callable, Iterable, Optional
+
+from pydantic import HttpUrl, ValidationError
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.core.lazy import lazy_import
+from app.database import SessionLocal
+from app.models import Logo, QRCode, URL
+from app.services.blob_store import blob_store
+from app.services.render_cache import render_key
+from app.utils import generate_short_code
+
+qr_service = lazy_import("app.services.qr_service")
+
+logger = logging.getLogger(__name__)
+
+
+def is_redirectable(content: str) -> bool:
+    """Можно ли вести QR через короткую ссылку (только http/https URL)."""
+    if not content.startswith(("http://", "https://")):
+        return False
+    try:
+        HttpUrl(content)
+    except ValidationError:
+        return False
+    return True
+
+
+def short_link(url: URL) -> str:
+    """То, что кодируется в QR-коде: BASE_URL/short_code."""
+    return f"{settings.BASE_URL}/{url.short_code}"
+
+
+def create_target_link(db: Session, user_id: int, destination: str, title: str) -> URL:
+    """
+    Создать отдельную короткую ссылку для QR-кода (без commit).
+
+    Ссылка своя у каждого QR, так что её клики — это сканирования
+    именно этого кода.
+    """
+    url = URL(
+        user_id=user_id,
+        original_url=destination,
+        short_code=generate_short_code(db),
+        title=title,
+    )
+    db.add(url)
+    db.flush()
+    return url
+
+
+def render_params(qr_code: QRCode) -> dict:
+    """Параметры рендера сохранённого QR-кода."""
+    return {
+        "content": qr_code.content,
+        "foreground_color": qr_code.foreground_color,
+        "background_color": qr_code.background_color,
+        "style": qr_code.style,
+        "box_size": qr_code.box_size,
+        "border_size": qr_code.border_size,
+        "error_correction": qr_code.error_correction,
+        "logo_base64": blob_store.get_base64(qr_code.logo_digest),
+    }
+
+
+def sized_png_etag(qr_code: QRCode, size: int) -> str:
+    """
+    Тег PNG размера size по сохранённым полям QR-кода.
+
+    Логотип учитывается по digest, а box_size однозначно следует из
+    остальных полей, поэтому для ответа 304 не нужно ни читать блоб
+    логотипа, ни считать число модулей.
+    """
+    return render_key(
+        "png-sized",
+        size=qr_service.size_bucket(size),
+        content=qr_code.content,
+        foreground_color=(qr_code.foreground_color or "").upper(),
+        background_color=(qr_code.background_color or "").upper(),
+        style=qr_code.style,
+        border_size=qr_code.border_size,
+        error_correction=qr_code.error_correction,
+        logo=qr_code.logo_digest,
+    )
+
+
+def delete_unused_blobs(db: Session, digests: Iterable[str]) -> None:
+    """
+    Блобы общие для одинаковых изображений — удаляем только без ссылок.
+
+    Свежие блобы (моложе BLOB_GC_GRACE_SECONDS) не трогаем: параллельный
+    запрос мог уже сохранить тот же блоб, но ещё не закоммитить строку,
+    которая на него ссылается. Такой блоб может остаться без ссылок —
+    это лишнее место на диске, а не битое изображение.
+    """
+    for digest in digests:
+        in_use = db.query(QRCode.id).filter(
+            (QRCode.image_digest == digest) | (QRCode.logo_digest == digest)
+        ).first() or db.query(Logo.id).filter(Logo.digest == digest).first()
+        if in_use:
+            continue
+        age = blob_store.age(digest)
+        if age is not None and age >= settings.BLOB_GC_GRACE_SECONDS:
+            blob_store.delete(digest)
+
+
+class QRRerenderer:
+    """Фоновая перерисовка PNG после смены дизайна."""
+
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal):
+        self.session_factory = session_factory
+
+    async def rerender(self, qr_id: int) -> Optional[str]:
+        """
+        Перерисовать изображение QR-кода по текущим параметрам.
+
+        Если пока шёл рендер дизайн успели поменять ещё раз, результат
+        не сохраняется — это сделает более поздняя перерисовка.
+
+        Returns:
+            новый image_digest или None
+        """
+        db = self.session_factory()
+        try:
+            qr_code = db.get(QRCode, qr_id)
+            if qr_code is None:
+                return None
+            params = render_params(qr_code)
+            db.rollback()
+
+            try:
+                png = await qr_service.render_qr_png_async(**params)
+            except Exception:
+                logger.exception("Re-render of QR %s failed", qr_id)
+                return None
+
+            qr_code = db.get(QRCode, qr_id)
+            if qr_code is None or qr_service.png_render_key(**render_params(qr_code)) != qr_service.png_render_key(**params):
+                return None
+
+            old_digest = qr_code.image_digest
+            qr_code.image_digest = blob_store.put(png)
+            db.commit()
+
+            if old_digest != qr_code.image_digest:
+                delete_unused_blobs(db, [old_digest])
+            qr_service.prerender_sizes(params)
+            return qr_code.image_digest
+        finally:
+            db.close()
+
+
+qr_rerenderer = QRRerenderer()
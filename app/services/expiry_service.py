@@ -0,0 +1,161 @@
+"""
+Фоновая деактивация просроченных ссылок.
+
+Планировщик не сканирует таблицу целиком: по индексу
+(is_active, expires_at) он берёт ближайший срок истечения, спит
+до него (но не дольше EXPIRY_CHECK_MAX_INTERVAL_SECONDS) и
+выключает все ссылки, срок которых наступил. Новые ссылки с более
+ранним сроком будят планировщик через notify().
+
+После деактивации счётчики active_links в аналитике и админке
+считаются корректно без учёта URL.is_expired.
+
+Проход выполняется в отдельном потоке (синхронный SQLAlchemy не
+должен блокировать event loop). В многопроцессном сервере
+(app.server) планировщик работает только в первом воркере; notify()
+из остальных воркеров его не будит, и новая ссылка выключается не
+позже чем через EXPIRY_CHECK_MAX_INTERVAL_SECONDS после срока.
+Редирект всё равно проверяет срок сам (410), так что задержка
+влияет только на счётчики.
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Callable, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models import URL
+
+logger = logging.getLogger(__name__)
+
+# Сколько ссылок выключать за один UPDATE
+BATCH_SIZE = 500
+
+
+def _as_utc_naive(value: datetime) -> datetime:
+    """Привести datetime к naive UTC (так expires_at хранится в БД)."""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def deactivate_expired(db: Session, now: Optional[datetime] = None) -> List[str]:
+    """
+    Выключить активные ссылки с expires_at <= now.
+
+    Returns:
+        short_code деактивированных ссылок
+    """
+    now = now or datetime.utcnow()
+    deactivated = []
+
+    while True:
+        batch = (
+            db.query(URL.id, URL.short_code)
+            .filter(URL.is_active == True, URL.expires_at <= now)
+            .limit(BATCH_SIZE)
+            .all()
+        )
+        if not batch:
+            break
+
+        db.query(URL).filter(URL.id.in_([row.id for row in batch])).update(
+            {URL.is_active: False}, synchronize_session=False
+        )
+        db.commit()
+        deactivated.extend(row.short_code for row in batch)
+
+    return deactivated
+
+
+def next_expiry(db: Session, now: Optional[datetime] = None) -> Optional[datetime]:
+    """Ближайший будущий срок истечения среди активных ссылок."""
+    now = now or datetime.utcnow()
+    return (
+        db.query(func.min(URL.expires_at))
+        .filter(URL.is_active == True, URL.expires_at > now)
+        .scalar()
+    )
+
+
+class ExpiryScheduler:
+    """Асинхронный цикл, деактивирующий ссылки по мере истечения."""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        max_interval: float = settings.EXPIRY_CHECK_MAX_INTERVAL_SECONDS,
+    ):
+        self.session_factory = session_factory
+        self.max_interval = max_interval
+        self.next_due: Optional[datetime] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def run_once(self, now: Optional[datetime] = None) -> List[str]:
+        """Один проход: выключить просроченные и запомнить следующий срок."""
+        db = self.session_factory()
+        try:
+            codes = deactivate_expired(db, now)
+            self.next_due = next_expiry(db, now)
+        finally:
+            db.close()
+
+        if codes:
+            logger.info("Deactivated %d expired links", len(codes))
+        return codes
+
+    def notify(self, expires_at: Optional[datetime]) -> None:
+        """Сообщить о новом сроке истечения (при создании/изменении ссылки)."""
+        if expires_at is None or self._wakeup is None:
+            return
+        expires_at = _as_utc_naive(expires_at)
+        if self.next_due is None or expires_at < self.next_due:
+            self.next_due = expires_at
+            self._wakeup.set()
+
+    def _sleep_seconds(self) -> float:
+        if self.next_due is None:
+            return self.max_interval
+        delay = (self.next_due - datetime.utcnow()).total_seconds()
+        return min(max(delay, 0), self.max_interval)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.to_thread(self.run_once)
+            except Exception:
+                logger.exception("Expiry scheduler pass failed")
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self._sleep_seconds())
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    def start(self) -> None:
+        """Запустить цикл в текущем event loop."""
+        if self._task is not None:
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Остановить цикл."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._wakeup = None
+
+
+expiry_scheduler = ExpiryScheduler()
@@ -0,0 +1,103 @@
+"""
+Библиотека логотипов пользователя.
+
+Логотип декодируется и проверяется один раз — при загрузке: он
+приводится к RGBA PNG (не больше LOGO_MAX_SIDE по стороне) и
+кладётся в blob store по sha256. Дальше QR-коды ссылаются на него
+по id/digest, а при рендеринге используются готовые уменьшенные
+плитки из кэша (см. qr_service._logo_tile), так что повторные
+рендеры только накладывают картинку.
+"""
+
+import base64
+import io
+from typing import Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.models import Logo
+from app.services.blob_store import blob_store
+
+# Ограничения на исходный файл
+LOGO_MAX_BYTES = 500 * 1024
+LOGO_FORMATS = ("PNG", "JPEG", "GIF", "WEBP")
+
+# Больше логотипу при встраивании (20% ширины QR) не понадобится
+LOGO_MAX_SIDE = 1024
+
+
+def decode_logo(logo_base64: str) -> bytes:
+    """base64 (с префиксом data:...;base64, или без) → байты."""
+    if "," in logo_base64:
+        logo_base64 = logo_base64.split(",")[1]
+    return base64.b64decode(logo_base64)
+
+
+def normalize_logo(data: bytes) -> Tuple[bytes, int, int]:
+    """
+    Проверить изображение и привести к RGBA PNG.
+
+    Returns:
+        (png_bytes, width, height)
+
+    Raises:
+        ValueError: не изображение, неподдерживаемый формат или > 500KB
+    """
+    from PIL import Image
+
+    if len(data) > LOGO_MAX_BYTES:
+        raise ValueError("Логотип больше 500KB")
+    try:
+        img = Image.open(io.BytesIO(data))
+        if img.format not in LOGO_FORMATS:
+            raise ValueError(f"Неподдерживаемый формат: {img.format}")
+        img = img.convert("RGBA")
+    except ValueError:
+        raise
+    except Exception:
+        raise ValueError("Невалидное изображение")
+
+    img.thumbnail((LOGO_MAX_SIDE, LOGO_MAX_SIDE), Image.Resampling.LANCZOS)
+
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue(), img.width, img.height
+
+
+def add_logo(db: Session, user_id: int, logo_base64: str) -> Logo:
+    """
+    Добавить логотип в библиотеку пользователя (идемпотентно).
+
+    Raises:
+        ValueError: невалидный логотип
+    """
+    try:
+        data = decode_logo(logo_base64)
+    except ValueError:
+        raise ValueError("Невалидный base64")
+
+    png, width, height = normalize_logo(data)
+    digest = blob_store.put(png)
+
+    logo = db.query(Logo).filter(
+        Logo.user_id == user_id, Logo.digest == digest
+    ).first()
+    if logo is None:
+        logo = Logo(user_id=user_id, digest=digest, width=width, height=height)
+        db.add(logo)
+        db.commit()
+        db.refresh(logo)
+    return logo
+
+
+def get_logo_base64(db: Session, user_id: int, logo_id: int) -> Optional[str]:
+    """base64 логотипа из библиотеки (None, если его нет у пользователя)."""
+    digest = db.query(Logo.digest).filter(
+        Logo.id == logo_id, Logo.user_id == user_id
+    ).scalar()
+    if digest is None:
+        return None
+    data = blob_store.get(digest)
+    if data is None:
+        return None
+    return base64.b64encode(data).decode("utf-8")
@@ -12,10 +12,12 @@
 - Встраивание логотипа в центр
 - 4 уровня коррекции ошибок (L/M/Q/H)
 - Настраиваемый размер и граница
+
+Стиль square рендерится напрямую из матрицы модулей через NumPy
+(палитровый PNG), остальные стили — через StyledPilImage.
 """
 
 import qrcode
-import qrcode.image.svg
 from qrcode.image.styledpil import StyledPilImage
 from qrcode.image.styles.moduledrawers.pil import (
     SquareModuleDrawer,
@@ -25,10 +27,20 @@ from qrcode.image.styles.moduledrawers.pil import (
 )
 from qrcode.image.styles.colormasks import SolidFillColorMask
 from PIL import Image
+import numpy as np
+import asyncio
 import io
 import base64
-from typing import Optional
+import logging
+from collections import OrderedDict
+from typing import List, Optional, Set
+
+from app.core.compression import compress
+from app.services.logo_service import LOGO_FORMATS, LOGO_MAX_BYTES, decode_logo
+from app.services.render_cache import logo_digest, qr_render_cache, render_key
+from app.services.render_pool import qr_render_pool
 
+logger = logging.getLogger(__name__)
 
 # Маппинг строк на уровни коррекции ошибок
 ERROR_CORRECTION_MAP = {
@@ -38,6 +50,11 @@ ERROR_CORRECTION_MAP = {
     "H": qrcode.constants.ERROR_CORRECT_H,  # ~30% (нужен для логотипа)
 }
 
+# Размеры (px), которые отдаёт /api/v1/qr/{id}.png?size= — запрошенный
+# размер округляется вверх до ближайшего, чтобы кэш не разрастался
+SIZE_BUCKETS = (128, 256, 512, 1024, 2048)
+THUMBNAIL_SIZE = 256
+
 # Маппинг строк на drawer'ы стилей
 STYLE_DRAWER_MAP = {
     "square": SquareModuleDrawer,
@@ -82,30 +99,306 @@ def generate_qr_image(
     Returns:
         base64-encoded PNG string (без префикса data:image/png;base64,)
     """
+    png = render_qr_png(
+        content=content,
+        foreground_color=foreground_color,
+        background_color=background_color,
+        style=style,
+        box_size=box_size,
+        border_size=border_size,
+        error_correction=error_correction,
+        logo_base64=logo_base64,
+    )
+    return base64.b64encode(png).decode("utf-8")
+
+
+def render_qr_png(
+    content: str,
+    foreground_color: str = "#000000",
+    background_color: str = "#FFFFFF",
+    style: str = "square",
+    box_size: int = 10,
+    border_size: int = 4,
+    error_correction: str = "M",
+    logo_base64: Optional[str] = None,
+) -> bytes:
+    """
+    Вернуть PNG-байты QR-кода, используя кэш рендеров.
+
+    Рендерит в текущем потоке; из async-эндпоинтов используйте
+    render_qr_png_async().
+
+    Параметры — как у generate_qr_image().
+    """
+    key, args = _png_job(
+        content, foreground_color, background_color, style,
+        box_size, border_size, error_correction, logo_base64,
+    )
+    png = qr_render_cache.get(key)
+    if png is None:
+        png = _render_png(*args)
+        qr_render_cache.put(key, png)
+    return png
+
+
+async def render_qr_png_async(
+    content: str,
+    foreground_color: str = "#000000",
+    background_color: str = "#FFFFFF",
+    style: str = "square",
+    box_size: int = 10,
+    border_size: int = 4,
+    error_correction: str = "M",
+    logo_base64: Optional[str] = None,
+    preview_for: Optional[int] = None,
+) -> bytes:
+    """
+    То же, что render_qr_png(), но рендеринг идёт в пуле процессов.
+
+    preview_for — id пользователя для живого превью: его предыдущее
+    незавершённое превью отменяется (RenderSuperseded).
+
+    Raises:
+        RenderPoolBusy: очередь рендеринга переполнена
+    """
+    key, args = _png_job(
+        content, foreground_color, background_color, style,
+        box_size, border_size, error_correction, logo_base64,
+    )
+    return await qr_render_pool.submit(key, _render_png, *args, preview_for=preview_for)
+
+
+def batch_concurrency() -> int:
+    """
+    Сколько задач одного пакета держать в пуле одновременно.
+
+    2 на воркер, но не больше половины очереди (QR_RENDER_MAX_PENDING):
+    на многоядерных машинах workers * 2 может превышать её размер.
+    """
+    return max(1, min(qr_render_pool.workers * 2, qr_render_pool.max_pending // 2))
+
+
+async def render_qr_png_many(jobs: List[dict]) -> List[bytes]:
+    """
+    Отрендерить несколько PNG параллельно в пуле процессов.
+
+    jobs — словари с параметрами render_qr_png_async(). Одновременно
+    в пул уходит не больше batch_concurrency() задач, так что один
+    пакет не заполняет очередь; одинаковые параметры рендерятся один
+    раз. При ошибке (в т.ч. RenderPoolBusy) оставшиеся задачи отменяются.
+    """
+    semaphore = asyncio.Semaphore(batch_concurrency())
+
+    async def render(params: dict) -> bytes:
+        async with semaphore:
+            return await render_qr_png_async(**params)
+
+    tasks = [asyncio.ensure_future(render(params)) for params in jobs]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+
+def png_render_key(**params) -> str:
+    """Ключ кэша PNG для параметров render_qr_png() (он же ETag)."""
+    key, _ = _png_job(**params)
+    return key
+
+
+def sized_png_params(params: dict, size: int) -> dict:
+    """
+    Параметры рендера под размер size (px) из SIZE_BUCKETS.
+
+    box_size подбирается по числу модулей, так что изображение
+    рисуется из матрицы заново, а не масштабируется по пикселям.
+    """
+    error_correction = "H" if params.get("logo_base64") else params["error_correction"]
+    modules = module_count(params["content"], error_correction, params["border_size"])
+    return dict(params, box_size=box_size_for(size_bucket(size), modules))
+
+
+def prerender_sizes(params: dict, sizes=(THUMBNAIL_SIZE,)) -> None:
+    """
+    Заранее отрендерить размеры (миниатюру) в фоне, чтобы первая
+    загрузка галереи брала их из кэша. Это только оптимизация:
+    запускается, пока очередь пула заполнена меньше чем наполовину,
+    а ошибки лишь логируются.
+    """
+    for size in sizes:
+        if qr_render_pool.pending >= qr_render_pool.max_pending // 2:
+            return
+        task = asyncio.ensure_future(render_qr_png_async(**sized_png_params(params, size)))
+        # Event loop держит на задачи только слабые ссылки
+        _prerender_tasks.add(task)
+        task.add_done_callback(_prerender_done)
+
+
+_prerender_tasks: Set[asyncio.Task] = set()
+
+
+def _prerender_done(task: asyncio.Task) -> None:
+    _prerender_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.info("QR prerender skipped: %r", task.exception())
+
+
+def _png_job(
+    content: str,
+    foreground_color: str,
+    background_color: str,
+    style: str,
+    box_size: int,
+    border_size: int,
+    error_correction: str,
+    logo_base64: Optional[str] = None,
+) -> tuple:
+    """Ключ кэша и аргументы _render_png() для набора параметров."""
     # Если есть логотип — нужен максимальный уровень коррекции
     if logo_base64:
         error_correction = "H"
 
-    ec_level = ERROR_CORRECTION_MAP.get(error_correction, qrcode.constants.ERROR_CORRECT_M)
-
-    # Создаём QR
-    qr = qrcode.QRCode(
-        version=None,  # auto-detect
-        error_correction=ec_level,
+    key = render_key(
+        "png",
+        content=content,
+        foreground_color=foreground_color.upper(),
+        background_color=background_color.upper(),
+        style=style,
         box_size=box_size,
-        border=border_size,
+        border_size=border_size,
+        error_correction=error_correction,
+        logo=logo_digest(logo_base64),
     )
-    qr.add_data(content)
-    qr.make(fit=True)
+    args = (
+        content, foreground_color, background_color, style,
+        box_size, border_size, error_correction, logo_base64,
+    )
+    return key, args
 
-    # Получаем drawer для стиля
-    drawer_class = STYLE_DRAWER_MAP.get(style, SquareModuleDrawer)
 
+def _render_png(
+    content: str,
+    foreground_color: str,
+    background_color: str,
+    style: str,
+    box_size: int,
+    border_size: int,
+    error_correction: str,
+    logo_base64: Optional[str],
+) -> bytes:
+    """Отрендерить PNG без кэша."""
     # Конвертируем цвета
     fg_rgb = hex_to_rgb(foreground_color)
     bg_rgb = hex_to_rgb(background_color)
 
-    # Создаём изображение с кастомным стилем и цветами
+    if style not in STYLE_DRAWER_MAP or style == "square":
+        matrix = np.pad(module_matrix(content, error_correction), border_size)
+        img = _render_matrix(matrix, box_size, fg_rgb, bg_rgb)
+    else:
+        ec_level = ERROR_CORRECTION_MAP.get(error_correction, qrcode.constants.ERROR_CORRECT_M)
+
+        # Создаём QR
+        qr = qrcode.QRCode(
+            version=None,  # auto-detect
+            error_correction=ec_level,
+            box_size=box_size,
+            border=border_size,
+        )
+        qr.add_data(content)
+        qr.make(fit=True)
+        img = _render_styled(qr, STYLE_DRAWER_MAP[style], fg_rgb, bg_rgb)
+
+    # Вставляем логотип в центр
+    if logo_base64:
+        img = _embed_logo(img, logo_base64)
+
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG", quality=95)
+    return buffer.getvalue()
+
+
+def module_matrix(content: str, error_correction: str = "M") -> np.ndarray:
+    """
+    Матрица модулей QR-кода (без границы), 1 — тёмный модуль.
+
+    Подбор версии и маски — самая дорогая часть генерации, поэтому
+    матрица кэшируется (упакованной по битам) и переиспользуется
+    для любых размеров, цветов, границ и для SVG.
+    """
+    key = render_key("matrix", content=content, error_correction=error_correction)
+    packed = qr_render_cache.get(key)
+    if packed is None:
+        ec_level = ERROR_CORRECTION_MAP.get(error_correction, qrcode.constants.ERROR_CORRECT_M)
+        qr = qrcode.QRCode(version=None, error_correction=ec_level, border=0)
+        qr.add_data(content)
+        qr.make(fit=True)
+
+        matrix = np.asarray(qr.get_matrix(), dtype=bool)
+        packed = len(matrix).to_bytes(2, "big") + np.packbits(matrix).tobytes()
+        qr_render_cache.put(key, packed)
+
+    size = int.from_bytes(packed[:2], "big")
+    bits = np.unpackbits(np.frombuffer(packed, dtype=np.uint8, offset=2), count=size * size)
+    return bits.reshape(size, size)
+
+
+def module_count(content: str, error_correction: str = "M", border_size: int = 0) -> int:
+    """
+    Число модулей по стороне (с границей) без построения матрицы.
+
+    Версия подбирается только по длине данных — это дёшево и можно
+    делать прямо в event loop.
+    """
+    ec_level = ERROR_CORRECTION_MAP.get(error_correction, qrcode.constants.ERROR_CORRECT_M)
+    qr = qrcode.QRCode(version=None, error_correction=ec_level)
+    qr.add_data(content)
+    version = qr.best_fit()
+    return version * 4 + 17 + border_size * 2
+
+
+def size_bucket(size: int) -> int:
+    """Ближайший сверху размер из SIZE_BUCKETS (или наибольший)."""
+    for bucket in SIZE_BUCKETS:
+        if size <= bucket:
+            return bucket
+    return SIZE_BUCKETS[-1]
+
+
+def box_size_for(size: int, modules: int) -> int:
+    """
+    Наибольший целый box_size, при котором QR не шире size пикселей.
+
+    Не меньше 1: если модулей больше, чем пикселей (большие версии в
+    маленькой корзине), изображение выйдет шире size — уменьшать его
+    дальше нельзя, модули перестали бы читаться.
+    """
+    return max(1, size // modules)
+
+
+def _render_matrix(
+    matrix, box_size: int, fg_rgb: tuple, bg_rgb: tuple
+) -> Image.Image:
+    """
+    Быстрый рендер квадратных модулей.
+
+    Матрица модулей (вместе с границей) растягивается до пикселей
+    через np.repeat и сохраняется как палитровое изображение из двух
+    цветов: индекс 0 — фон, 1 — модуль. PNG получается 1-битным.
+    """
+    matrix = np.asarray(matrix, dtype=np.uint8)
+    pixels = matrix.repeat(box_size, axis=0).repeat(box_size, axis=1)
+
+    img = Image.fromarray(pixels, mode="P")
+    img.putpalette(bg_rgb + fg_rgb)
+    return img
+
+
+def _render_styled(
+    qr: qrcode.QRCode, drawer_class, fg_rgb: tuple, bg_rgb: tuple
+) -> Image.Image:
+    """Рендер через StyledPilImage (rounded/dots/circle)."""
     color_mask = SolidFillColorMask(
         back_color=bg_rgb,
         front_color=fg_rgb,
@@ -120,17 +413,7 @@ def generate_qr_image(
     # Конвертируем в PIL Image если нужно
     if not isinstance(img, Image.Image):
         img = img.get_image()
-
-    # Вставляем логотип в центр
-    if logo_base64:
-        img = _embed_logo(img, logo_base64)
-
-    # Конвертируем в base64
-    buffer = io.BytesIO()
-    img.save(buffer, format="PNG", quality=95)
-    buffer.seek(0)
-
-    return base64.b64encode(buffer.getvalue()).decode("utf-8")
+    return img
 
 
 def generate_qr_svg(
@@ -150,30 +433,115 @@ def generate_qr_svg(
     Returns:
         SVG-строка
     """
-    ec_level = ERROR_CORRECTION_MAP.get(error_correction, qrcode.constants.ERROR_CORRECT_M)
+    return render_qr_svg(
+        content, foreground_color, background_color,
+        box_size, border_size, error_correction,
+    ).decode("utf-8")
+
+
+def render_qr_svg(
+    content: str,
+    foreground_color: str = "#000000",
+    background_color: str = "#FFFFFF",
+    box_size: int = 10,
+    border_size: int = 4,
+    error_correction: str = "M",
+    encoding: Optional[str] = None,
+) -> bytes:
+    """
+    SVG-байты из кэша рендеров.
 
-    qr = qrcode.QRCode(
-        version=None,
-        error_correction=ec_level,
+    encoding — "gzip"/"br" для предсжатого варианта (см.
+    app.core.compression); варианты кэшируются отдельно, так что
+    сжатие выполняется один раз.
+    """
+    key = svg_render_key(
+        content, foreground_color, background_color,
+        box_size, border_size, error_correction, encoding,
+    )
+    svg = qr_render_cache.get(key)
+    if svg is not None:
+        return svg
+
+    if encoding:
+        svg = compress(
+            render_qr_svg(
+                content, foreground_color, background_color,
+                box_size, border_size, error_correction,
+            ),
+            encoding,
+        )
+    else:
+        svg = _render_svg(
+            content, foreground_color, background_color,
+            box_size, border_size, error_correction,
+        )
+    qr_render_cache.put(key, svg)
+    return svg
+
+
+def svg_render_key(
+    content: str,
+    foreground_color: str = "#000000",
+    background_color: str = "#FFFFFF",
+    box_size: int = 10,
+    border_size: int = 4,
+    error_correction: str = "M",
+    encoding: Optional[str] = None,
+) -> str:
+    """Ключ SVG-рендера (он же ETag при скачивании)."""
+    return render_key(
+        "svg-rle",
+        content=content,
+        foreground_color=foreground_color.upper(),
+        background_color=background_color.upper(),
         box_size=box_size,
-        border=border_size,
+        border_size=border_size,
+        error_correction=error_correction,
+        encoding=encoding,
     )
-    qr.add_data(content)
-    qr.make(fit=True)
 
-    # Генерируем SVG
-    factory = qrcode.image.svg.SvgPathImage
-    img = qr.make_image(
-        image_factory=factory,
-        fill_color=foreground_color,
-        back_color=background_color,
-    )
 
-    buffer = io.BytesIO()
-    img.save(buffer)
-    buffer.seek(0)
+def _render_svg(
+    content: str,
+    foreground_color: str,
+    background_color: str,
+    box_size: int,
+    border_size: int,
+    error_correction: str,
+) -> bytes:
+    """
+    Отрендерить SVG без кэша.
 
-    return buffer.getvalue().decode("utf-8")
+    Строится прямо из матрицы модулей: подряд идущие тёмные модули
+    строки сливаются в один прямоугольник, поэтому команд в path
+    в разы меньше, чем модулей. Координаты — в модулях (viewBox),
+    физический размер — box_size / 10 мм на модуль, как раньше.
+    """
+    matrix = np.pad(module_matrix(content, error_correction), border_size).tolist()
+    size = len(matrix)
+    path = []
+    for y, row in enumerate(matrix):
+        x = 0
+        while x < size:
+            if not row[x]:
+                x += 1
+                continue
+            start = x
+            while x < size and row[x]:
+                x += 1
+            path.append(f"M{start} {y}h{x - start}v1H{start}z")
+
+    physical = f"{size * box_size / 10:g}mm"
+    svg = (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{physical}" height="{physical}"'
+        f' viewBox="0 0 {size} {size}" shape-rendering="crispEdges">'
+        f'<path fill="{background_color}" d="M0 0h{size}v{size}H0z"/>'
+        f'<path fill="{foreground_color}" d="{"".join(path)}"/>'
+        "</svg>"
+    )
+    return svg.encode("utf-8")
 
 
 def _embed_logo(qr_image: Image.Image, logo_base64: str) -> Image.Image:
@@ -184,43 +552,20 @@ def _embed_logo(qr_image: Image.Image, logo_base64: str) -> Image.Image:
     с белой подложкой (padding) для читаемости.
     """
     try:
-        # Декодируем логотип из base64
-        # Убираем data:image/...;base64, если есть
-        if "," in logo_base64:
-            logo_base64 = logo_base64.split(",")[1]
-
-        logo_data = base64.b64decode(logo_base64)
-        logo = Image.open(io.BytesIO(logo_data))
-
-        # Конвертируем в RGBA
-        if logo.mode != "RGBA":
-            logo = logo.convert("RGBA")
-
         qr_width, qr_height = qr_image.size
 
-        # Логотип = 20% от ширины QR
-        logo_max_size = int(qr_width * 0.2)
-        logo.thumbnail((logo_max_size, logo_max_size), Image.Resampling.LANCZOS)
-
-        logo_width, logo_height = logo.size
-
-        # Белая подложка (padding = 8px)
-        padding = 8
-        bg_size = (logo_width + padding * 2, logo_height + padding * 2)
-        bg = Image.new("RGBA", bg_size, (255, 255, 255, 255))
-
-        # Скругляем углы подложки
-        bg.paste(logo, (padding, padding), logo)
+        # Логотип = 20% от ширины QR (готовая плитка из кэша)
+        tile = _logo_tile(logo_base64, int(qr_width * 0.2))
 
         # Позиция по центру
-        pos_x = (qr_width - bg_size[0]) // 2
-        pos_y = (qr_height - bg_size[1]) // 2
+        pos_x = (qr_width - tile.width) // 2
+        pos_y = (qr_height - tile.height) // 2
 
         # Конвертируем QR в RGBA для paste с маской
         if qr_image.mode != "RGBA":
             qr_image = qr_image.convert("RGBA")
 
-        qr_image.paste(bg, (pos_x, pos_y), bg)
+        qr_image.paste(tile, (pos_x, pos_y), tile)
 
         return qr_image
 
@@ -229,23 +574,70 @@ def _embed_logo(qr_image: Image.Image, logo_base64: str) -> Image.Image:
         return qr_image
 
 
-def validate_logo_base64(logo_base64: str) -> bool:
-    """Проверить что base64 — валидное изображение и не слишком большое."""
-    try:
-        if "," in logo_base64:
-            logo_base64 = logo_base64.split(",")[1]
+def _logo_tile(logo_base64: str, logo_max_size: int) -> Image.Image:
+    """
+    Логотип, уменьшенный до logo_max_size, на белой подложке.
 
-        data = base64.b64decode(logo_base64)
+    Плитка зависит только от логотипа и размера, поэтому хранится
+    в кэше рендеров как сырые RGBA-байты: повторный рендер с тем же
+    логотипом не декодирует и не масштабирует его, а только
+    накладывает готовую картинку.
+    """
+    key = render_key("logo-tile", logo=logo_digest(logo_base64), size=logo_max_size)
+    raw = qr_render_cache.get(key)
+    if raw is None:
+        logo = Image.open(io.BytesIO(decode_logo(logo_base64)))
 
-        # Макс 500KB
-        if len(data) > 500 * 1024:
-            return False
+        # Конвертируем в RGBA
+        if logo.mode != "RGBA":
+            logo = logo.convert("RGBA")
+
+        logo.thumbnail((logo_max_size, logo_max_size), Image.Resampling.LANCZOS)
+
+        # Белая подложка (padding = 8px)
+        padding = 8
+        bg_size = (logo.width + padding * 2, logo.height + padding * 2)
+        tile = Image.new("RGBA", bg_size, (255, 255, 255, 255))
+        tile.paste(logo, (padding, padding), logo)
+
+        raw = tile.width.to_bytes(2, "big") + tile.height.to_bytes(2, "big") + tile.tobytes()
+        qr_render_cache.put(key, raw)
+
+    width = int.from_bytes(raw[:2], "big")
+    height = int.from_bytes(raw[2:4], "big")
+    return Image.frombytes("RGBA", (width, height), raw[4:])
 
-        # Проверяем что это изображение
-        img = Image.open(io.BytesIO(data))
-        if img.format not in ("PNG", "JPEG", "GIF", "WEBP"):
-            return False
 
-        return True
+# Результаты проверки логотипов по хэшу base64 (ограниченный размер)
+_VALIDATED_LOGOS: "OrderedDict[str, bool]" = OrderedDict()
+_VALIDATED_LOGOS_MAX = 1024
+
+
+def validate_logo_base64(logo_base64: str) -> bool:
+    """
+    Проверить что base64 — валидное изображение и не слишком большое.
+
+    Результат запоминается по хэшу, так что один и тот же логотип
+    декодируется для проверки только один раз.
+    """
+    key = logo_digest(logo_base64)
+    if key in _VALIDATED_LOGOS:
+        return _VALIDATED_LOGOS[key]
+
+    try:
+        data = decode_logo(logo_base64)
+
+        # Макс 500KB
+        if len(data) > LOGO_MAX_BYTES:
+            valid = False
+        else:
+            # Проверяем что это изображение
+            img = Image.open(io.BytesIO(data))
+            valid = img.format in LOGO_FORMATS
     except Exception:
-        return False
+        valid = False
+
+    _VALIDATED_LOGOS[key] = valid
+    if len(_VALIDATED_LOGOS) > _VALIDATED_LOGOS_MAX:
+        _VALIDATED_LOGOS.popitem(last=False)
+    return valid
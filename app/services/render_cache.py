@@ -0,0 +1,268 @@
+"""
+Content-addressed кэш отрендеренных QR-кодов.
+
+Ключ — sha256 от всех параметров генерации (контент, цвета, стиль,
+box_size, border, уровень коррекции, хэш логотипа и формат), поэтому
+одинаковые запросы превью, создания и скачивания получают одни и те
+же байты без повторного рендеринга.
+
+Два уровня:
+- память: LRU, ограниченный суммарным размером в байтах;
+- диск: вытесненные из памяти записи сбрасываются в каталог
+  (шардирование по первым двум символам ключа), тоже с лимитом.
+
+Файлы читаются и пишутся вне блокировки, так что медленный диск не
+задерживает попадания в память. Для event loop есть get_async() и
+put_memory() + spill_async(): в loop остаётся только работа с
+памятью, диск уходит в поток. Запись атомарна (временный файл с
+уникальным именем + os.replace), поэтому каталог можно делить между
+процессами.
+
+Лимит диска каждый процесс считает по своему индексу: каталог
+сканируется при первом обращении, дальше процесс видит только
+собственные записи. С N воркерами каталог может вырасти примерно до
+N × disk_max_bytes; после перезапуска индекс строится заново, и
+лишнее вытесняется.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from app.config import settings
+
+
+def render_key(fmt: str, **params) -> str:
+    """Ключ кэша для набора параметров генерации."""
+    payload = json.dumps({"fmt": fmt, **params}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def logo_digest(logo_base64: Optional[str]) -> Optional[str]:
+    """Хэш логотипа для ключа кэша (без префикса data:...;base64,)."""
+    if not logo_base64:
+        return None
+    if "," in logo_base64:
+        logo_base64 = logo_base64.split(",")[1]
+    return hashlib.sha256(logo_base64.encode("ascii", "ignore")).hexdigest()
+
+
+class RenderCache:
+    """Потокобезопасный LRU-кэш байтов с выгрузкой на диск."""
+
+    def __init__(
+        self,
+        max_bytes: int,
+        disk_dir: Optional[str] = None,
+        disk_max_bytes: int = 0,
+    ):
+        self.max_bytes = max_bytes
+        self.disk_dir = Path(disk_dir) if disk_dir and disk_max_bytes > 0 else None
+        self.disk_max_bytes = disk_max_bytes
+
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_bytes = 0
+        self._disk: Optional["OrderedDict[str, int]"] = None
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    # ─── Память ────────────────────────────────────────────────
+
+    def get(self, key: str) -> Optional[bytes]:
+        self._load_disk_index()
+        data, on_disk = self._lookup(key)
+        if on_disk:
+            data = self._get_disk(key)
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        self._spill(self.put_memory(key, data))
+
+    async def get_async(self, key: str) -> Optional[bytes]:
+        """get() для event loop: память — сразу, диск — в потоке."""
+        if self.disk_dir is not None and self._disk is None:
+            await asyncio.to_thread(self._load_disk_index)
+        data, on_disk = self._lookup(key)
+        if on_disk:
+            data = await asyncio.to_thread(self._get_disk, key)
+        return data
+
+    async def spill_async(self, entries: List[Tuple[str, bytes]]) -> None:
+        """Сбросить записи из put_memory() на диск в потоке."""
+        if entries and self.disk_dir is not None:
+            await asyncio.to_thread(self._spill, entries)
+
+    def put_memory(self, key: str, data: bytes) -> List[Tuple[str, bytes]]:
+        """Положить в память; возвращает вытесненные записи для диска."""
+        with self._lock:
+            return self._memory_put(key, data)
+
+    def _lookup(self, key: str) -> Tuple[Optional[bytes], bool]:
+        """Поиск в памяти: (данные, нужно ли читать с диска)."""
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return data, False
+            if self._disk is None or key not in self._disk:
+                self.misses += 1
+                return None, False
+        return None, True
+
+    def _memory_put(self, key: str, data: bytes) -> List[Tuple[str, bytes]]:
+        """Положить в память (под _lock); возвращает записи для диска."""
+        if key in self._memory:
+            self._memory_bytes -= len(self._memory.pop(key))
+        if len(data) > self.max_bytes:
+            return [(key, data)]
+
+        self._memory[key] = data
+        self._memory_bytes += len(data)
+
+        spilled = []
+        while self._memory_bytes > self.max_bytes:
+            old_key, old_data = self._memory.popitem(last=False)
+            self._memory_bytes -= len(old_data)
+            spilled.append((old_key, old_data))
+        return spilled
+
+    # ─── Диск ──────────────────────────────────────────────────
+
+    def _path(self, key: str) -> Path:
+        return self.disk_dir / key[:2] / key
+
+    def _load_disk_index(self) -> None:
+        """Индекс файлов на диске (сканируется один раз, вне блокировки)."""
+        if self.disk_dir is None or self._disk is not None:
+            return
+        index: "OrderedDict[str, int]" = OrderedDict()
+        total = 0
+        if self.disk_dir.exists():
+            files = []
+            for path in self.disk_dir.glob("*/*"):
+                # .tmp — незаконченные записи (в том числе других процессов)
+                if path.suffix == ".tmp":
+                    continue
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, path.name, stat.st_size))
+            for _, name, size in sorted(files):
+                index[name] = size
+                total += size
+        with self._lock:
+            if self._disk is None:
+                self._disk = index
+                self._disk_bytes = total
+
+    def _get_disk(self, key: str) -> Optional[bytes]:
+        """Прочитать запись с диска и поднять её в память."""
+        data = self._read(key)
+        with self._lock:
+            if data is None:
+                self._disk_bytes -= self._disk.pop(key, 0)
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            if key in self._disk:
+                self._disk.move_to_end(key)
+            spilled = self._memory_put(key, data)
+        self._spill(spilled)
+        return data
+
+    def _read(self, key: str) -> Optional[bytes]:
+        try:
+            return self._path(key).read_bytes()
+        except OSError:
+            return None
+
+    def _spill(self, entries: List[Tuple[str, bytes]]) -> None:
+        """Сбросить вытесненные из памяти записи на диск."""
+        if self.disk_dir is None or not entries:
+            return
+        self._load_disk_index()
+        for key, data in entries:
+            if len(data) > self.disk_max_bytes:
+                continue
+            with self._lock:
+                if key in self._disk:
+                    self._disk.move_to_end(key)
+                    continue
+            if not self._write(key, data):
+                continue
+
+            evicted = []
+            with self._lock:
+                if key not in self._disk:
+                    self._disk[key] = len(data)
+                    self._disk_bytes += len(data)
+                while self._disk_bytes > self.disk_max_bytes:
+                    old_key, size = self._disk.popitem(last=False)
+                    self._disk_bytes -= size
+                    evicted.append(old_key)
+            for old_key in evicted:
+                try:
+                    self._path(old_key).unlink()
+                except OSError:
+                    pass
+
+    def _write(self, key: str, data: bytes) -> bool:
+        path = self._path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Имя уникально для процесса и потока: каталог общий
+            fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=key, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tmp, path)
+            except OSError:
+                os.unlink(tmp)
+                raise
+        except OSError:
+            return False
+        return True
+
+    # ─── Метрики ───────────────────────────────────────────────
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            hits = self.memory_hits + self.disk_hits
+            return {
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "memory_max_bytes": self.max_bytes,
+                "disk_entries": len(self._disk) if self._disk is not None else None,
+                "disk_bytes": self._disk_bytes if self._disk is not None else None,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def clear(self) -> None:
+        """Очистить память и сбросить счётчики (диск не трогаем)."""
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            self.memory_hits = self.disk_hits = self.misses = 0
+
+
+qr_render_cache = RenderCache(
+    max_bytes=settings.QR_CACHE_MAX_BYTES,
+    disk_dir=settings.QR_CACHE_DIR,
+    disk_max_bytes=settings.QR_CACHE_DISK_MAX_BYTES,
+)
@@ -0,0 +1,185 @@
+"""
+Пул процессов для CPU-тяжёлого рендеринга QR-кодов.
+
+Рендеринг (PIL, LANCZOS, PNG-кодирование) не выполняется в event
+loop — задачи уходят в ProcessPoolExecutor размером с число ядер.
+
+Дополнительно пул:
+- объединяет одинаковые запросы: пока рендер с ключом K идёт,
+  все новые запросы с тем же K ждут один и тот же результат;
+- отменяет устаревшие превью: новое превью пользователя отменяет
+  его предыдущее (если то ещё не начало выполняться — вообще
+  без нагрузки на CPU);
+- ограничивает очередь: при MAX_PENDING уникальных задачах новые
+  отклоняются с RenderPoolBusy (в API — 429).
+
+Готовые результаты кладутся в кэш рендеров (render_cache).
+"""
+
+import asyncio
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Optional, Set, Tuple
+
+from app.config import settings
+from app.core import metrics
+from app.services.render_cache import RenderCache, qr_render_cache
+
+
+RENDER_SECONDS = metrics.Histogram(
+    "qr_render_duration_seconds", "QR render time in the worker pool (cache misses)"
+)
+
+
+class RenderPoolBusy(Exception):
+    """Очередь рендеринга переполнена."""
+
+
+class RenderSuperseded(Exception):
+    """Превью отменено более новым запросом того же пользователя."""
+
+
+class _Job:
+    def __init__(self, future: asyncio.Future):
+        self.future = future
+        self.waiters = 0
+        self.started = time.perf_counter()
+
+
+class RenderPool:
+    """Асинхронный фасад над пулом процессов с кэшем и дедупликацией."""
+
+    def __init__(
+        self,
+        cache: RenderCache,
+        workers: int = 0,
+        max_pending: int = 32,
+        executor: str = "process",
+    ):
+        self.cache = cache
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending
+        self.executor_kind = executor
+
+        self._executor: Optional[Executor] = None
+        self._jobs: Dict[str, _Job] = {}
+        # владелец превью -> (ключ, задача)
+        self._previews: Dict[Hashable, Tuple[str, asyncio.Task]] = {}
+        # фоновые записи кэша на диск (держим ссылки, чтобы их не собрал GC)
+        self._spills: Set[asyncio.Task] = set()
+
+    @property
+    def pending(self) -> int:
+        """Число уникальных задач в очереди/в работе."""
+        return len(self._jobs)
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.executor_kind == "thread":
+                self._executor = ThreadPoolExecutor(self.workers)
+            else:
+                self._executor = ProcessPoolExecutor(self.workers)
+        return self._executor
+
+    def shutdown(self) -> None:
+        """Остановить процессы (при завершении приложения)."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def submit(
+        self,
+        key: str,
+        fn: Callable[..., bytes],
+        *args: Any,
+        preview_for: Optional[Hashable] = None,
+    ) -> bytes:
+        """
+        Вернуть результат fn(*args) для ключа key.
+
+        Args:
+            key: ключ кэша рендеров (одинаковые ключи объединяются)
+            fn: функция рендеринга (должна быть picklable)
+            preview_for: идентификатор владельца превью; предыдущее
+                превью этого владельца будет отменено
+
+        Raises:
+            RenderPoolBusy: очередь переполнена
+            RenderSuperseded: превью вытеснено более новым
+        """
+        cached = await self.cache.get_async(key)
+        if cached is not None:
+            return cached
+
+        if preview_for is None:
+            return await self._wait(key, fn, args)
+
+        previous = self._previews.get(preview_for)
+        if previous is not None:
+            previous_key, previous_task = previous
+            # Тот же ключ — не отменяем, а присоединяемся к его рендеру
+            if previous_key != key and not previous_task.done():
+                previous_task.cancel()
+
+        task = asyncio.ensure_future(self._wait(key, fn, args))
+        self._previews[preview_for] = (key, task)
+        try:
+            return await task
+        except asyncio.CancelledError:
+            # Отменили сам запрос (клиент ушёл) — пробрасываем дальше
+            if asyncio.current_task().cancelling():
+                raise
+            raise RenderSuperseded()
+        finally:
+            if self._previews.get(preview_for, (None, None))[1] is task:
+                del self._previews[preview_for]
+
+    async def _wait(self, key: str, fn: Callable[..., bytes], args: tuple) -> bytes:
+        job = self._jobs.get(key)
+        if job is not None and job.future.cancelled():
+            # Отменённую задачу не переиспользуем (её _finish ещё не успел
+            # сработать) — запускаем рендер заново
+            del self._jobs[key]
+            job = None
+        if job is None:
+            if len(self._jobs) >= self.max_pending:
+                raise RenderPoolBusy()
+            loop = asyncio.get_running_loop()
+            job = _Job(loop.run_in_executor(self._get_executor(), fn, *args))
+            self._jobs[key] = job
+            job.future.add_done_callback(lambda f: self._finish(key, job, f))
+
+        job.waiters += 1
+        start = time.perf_counter()
+        try:
+            return await asyncio.shield(job.future)
+        except asyncio.CancelledError:
+            # Больше никто не ждёт — снимаем задачу из пула
+            if job.waiters == 1:
+                job.future.cancel()
+            raise
+        finally:
+            job.waiters -= 1
+            metrics.add_timing("render", time.perf_counter() - start)
+
+    def _finish(self, key: str, job: _Job, future: asyncio.Future) -> None:
+        if self._jobs.get(key) is job:
+            del self._jobs[key]
+        if not future.cancelled() and future.exception() is None:
+            RENDER_SECONDS.observe(time.perf_counter() - job.started)
+            # В память — сразу (следующий submit уже попадёт в кэш),
+            # вытесненное на диск пишется в потоке
+            spilled = self.cache.put_memory(key, future.result())
+            if spilled:
+                task = asyncio.ensure_future(self.cache.spill_async(spilled))
+                self._spills.add(task)
+                task.add_done_callback(self._spills.discard)
+
+
+qr_render_pool = RenderPool(
+    cache=qr_render_cache,
+    workers=settings.QR_RENDER_WORKERS,
+    max_pending=settings.QR_RENDER_MAX_PENDING,
+    executor=settings.QR_RENDER_EXECUTOR,
+)
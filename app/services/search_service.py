@@ -0,0 +1,155 @@
+"""
+Полнотекстовый поиск по ссылкам, пользователям и QR-кодам.
+
+Для SQLite используются внешние (external content) FTS5-таблицы
+с токенизатором trigram, которые синхронизируются с основными
+таблицами триггерами. Trigram сохраняет семантику прежнего
+поиска по подстроке (LIKE '%x%'), но работает через индекс и
+позволяет ранжировать результаты по bm25.
+
+Для запросов короче 3 символов (trigram их не индексирует)
+и для других СУБД используется старый поиск через LIKE.
+"""
+
+from typing import Optional
+
+from sqlalchemy import Float, Integer, event, inspect, or_, text
+
+from app.database import Base
+
+# Минимальная длина запроса для trigram-индекса
+MIN_TERM_LENGTH = 3
+
+# Таблица -> (FTS-таблица, индексируемые колонки)
+FTS_TABLES = {
+    "urls": ("urls_fts", ("short_code", "original_url", "title")),
+    "users": ("users_fts", ("username", "email")),
+    "qr_codes": ("qr_codes_fts", ("title", "content")),
+}
+
+
+def _is_sqlite(bind) -> bool:
+    return bind is not None and bind.dialect.name == "sqlite"
+
+
+def _create_fts_table(connection, table: str) -> None:
+    """Создать FTS5-таблицу и триггеры синхронизации для `table`."""
+    fts_table, columns = FTS_TABLES[table]
+    cols = ", ".join(columns)
+    new_cols = ", ".join(f"new.{c}" for c in columns)
+    old_cols = ", ".join(f"old.{c}" for c in columns)
+
+    # Нет триггера — индекс новый либо основная таблица была пересоздана
+    synced = connection.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type='trigger' AND name=:name"),
+        {"name": f"{fts_table}_ai"},
+    ).first()
+
+    connection.execute(text(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5("
+        f"{cols}, content='{table}', content_rowid='id', tokenize='trigram')"
+    ))
+    connection.execute(text(
+        f"CREATE TRIGGER IF NOT EXISTS {fts_table}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts_table}(rowid, {cols}) VALUES (new.id, {new_cols}); END"
+    ))
+    connection.execute(text(
+        f"CREATE TRIGGER IF NOT EXISTS {fts_table}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts_table}({fts_table}, rowid, {cols}) "
+        f"VALUES ('delete', old.id, {old_cols}); END"
+    ))
+    # Только по индексируемым колонкам — чтобы не трогать индекс
+    # при каждом инкременте clicks_count / downloads_count
+    connection.execute(text(
+        f"CREATE TRIGGER IF NOT EXISTS {fts_table}_au AFTER UPDATE OF {cols} ON {table} BEGIN "
+        f"INSERT INTO {fts_table}({fts_table}, rowid, {cols}) "
+        f"VALUES ('delete', old.id, {old_cols}); "
+        f"INSERT INTO {fts_table}(rowid, {cols}) VALUES (new.id, {new_cols}); END"
+    ))
+
+    # Индекс создан поверх существующих данных — перестраиваем его
+    if not synced:
+        connection.execute(
+            text(f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')")
+        )
+
+
+def create_fts_tables(connection) -> None:
+    """Создать все FTS-таблицы (идемпотентно)."""
+    if not _is_sqlite(connection):
+        return
+    existing = set(inspect(connection).get_table_names())
+    for table in FTS_TABLES:
+        if table in existing:
+            _create_fts_table(connection, table)
+
+
+def drop_fts_tables(connection) -> None:
+    """Удалить FTS-таблицы (триггеры удаляются вместе с основными таблицами)."""
+    if not _is_sqlite(connection):
+        return
+    for fts_table, _ in FTS_TABLES.values():
+        connection.execute(text(f"DROP TABLE IF EXISTS {fts_table}"))
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _after_create(target, connection, **kw):
+    create_fts_tables(connection)
+
+
+@event.listens_for(Base.metadata, "before_drop")
+def _before_drop(target, connection, **kw):
+    drop_fts_tables(connection)
+
+
+def _fts_query(term: str) -> str:
+    """Экранировать запрос как одну фразу FTS5."""
+    return '"' + term.replace('"', '""') + '"'
+
+
+def match_subquery(session, model, term: str):
+    """
+    Подзапрос (id, rank) с совпадениями из FTS-индекса модели.
+
+    Возвращает None, если FTS недоступен для этого запроса
+    (не SQLite или запрос слишком короткий) — тогда нужно
+    использовать like_filter().
+    """
+    term = term.strip()
+    if len(term) < MIN_TERM_LENGTH or not _is_sqlite(session.get_bind()):
+        return None
+
+    fts_table, _ = FTS_TABLES[model.__tablename__]
+    return (
+        text(
+            f"SELECT rowid AS id, rank FROM {fts_table} "
+            f"WHERE {fts_table} MATCH :{fts_table}_q"
+        )
+        .bindparams(**{f"{fts_table}_q": _fts_query(term)})
+        .columns(id=Integer, rank=Float)
+        .subquery(f"{fts_table}_hits")
+    )
+
+
+def like_filter(model, term: str):
+    """Запасной вариант: LIKE '%term%' по индексируемым колонкам."""
+    _, columns = FTS_TABLES[model.__tablename__]
+    return or_(*(getattr(model, c).contains(term) for c in columns))
+
+
+def apply_search(query, model, term: Optional[str]):
+    """
+    Отфильтровать query по поисковому запросу.
+
+    Возвращает (query, rank): rank — колонка релевантности bm25
+    (меньше — лучше) для сортировки, либо None, если поиск не
+    задан или выполнен через LIKE.
+    """
+    if not term:
+        return query, None
+
+    hits = match_subquery(query.session, model, term)
+    if hits is None:
+        return query.filter(like_filter(model, term)), None
+
+    return query.join(hits, hits.c.id == model.id), hits.c.rank
@@ -0,0 +1,64 @@
+"""
+Нормализованные теги ссылок.
+
+API по-прежнему принимает и отдаёт теги строкой через запятую
+("work, promo"), а хранятся они в таблице tags (уникальны в
+пределах пользователя) со связью url_tags.
+"""
+
+from typing import List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.models import Tag, URL, url_tags
+
+MAX_TAG_LENGTH = 50
+
+
+def parse_tags(raw: Optional[str]) -> List[str]:
+    """Разобрать строку тегов: trim, lower-case, без пустых и дублей."""
+    if not raw:
+        return []
+    names = []
+    for part in raw.split(","):
+        name = part.strip().lower()[:MAX_TAG_LENGTH]
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def get_or_create_tags(db: Session, user_id: int, names: List[str]) -> List[Tag]:
+    """Найти теги пользователя по именам, создав недостающие."""
+    if not names:
+        return []
+    existing = {
+        tag.name: tag
+        for tag in db.query(Tag).filter(Tag.user_id == user_id, Tag.name.in_(names))
+    }
+    for name in names:
+        if name not in existing:
+            existing[name] = Tag(user_id=user_id, name=name)
+            db.add(existing[name])
+    return [existing[name] for name in names]
+
+
+def set_link_tags(db: Session, url: URL, raw: Optional[str]) -> None:
+    """Заменить теги ссылки тегами из строки `raw`."""
+    url.tag_list = get_or_create_tags(db, url.user_id, parse_tags(raw))
+
+
+def tag_filter(user_id: int, names: List[str]):
+    """
+    Условие "ссылка помечена всеми тегами names" для query(URL).
+
+    Выполняется по индексам (user_id, name) и (tag_id, url_id).
+    """
+    matching = (
+        select(url_tags.c.url_id)
+        .join(Tag, Tag.id == url_tags.c.tag_id)
+        .where(Tag.user_id == user_id, Tag.name.in_(names))
+        .group_by(url_tags.c.url_id)
+        .having(func.count(url_tags.c.tag_id) == len(names))
+    )
+    return URL.id.in_(matching)
@@ -91,7 +91,7 @@ function renderQRCodes(items) {
     grid.innerHTML = items.map(qr => `
         <div class="qr-card" onclick="viewQRCode(${qr.id})">
             <div class="qr-card__image">
-                <img src="data:image/png;base64,${qr.qr_image_base64}" alt="QR Code">
+                <img src="${qr.thumbnail_url}" alt="QR Code" loading="lazy">
             </div>
             <div class="qr-card__title">${escapeHtml(qr.title || 'Untitled QR Code')}</div>
             <div class="qr-card__content">${escapeHtml(qr.content)}</div>
@@ -1,7 +1,6 @@
 import random
 import string
 
-import httpx
 from sqlalchemy.orm import Session
 
 from app.config import settings
@@ -35,6 +34,8 @@ def generate_short_code(
 
 async def check_url_accessible(url: str, timeout: float = 5.0) -> bool:
     """Check if URL is accessible via HEAD request."""
+    import httpx
+
     try:
         async with httpx.AsyncClient(
             follow_redirects=True, timeout=timeout
@@ -0,0 +1,14 @@
+"""
+Performance benchmarks (not run by pytest).
+
+    datagen        synthetic users / links / clicks database
+    load           in-process ASGI load driver (redirect, API, analytics)
+    micro          short codes, user-agent detection, QR image generation
+    serialization  100-item link listing: response_model + json vs orjson
+    qr_render      NumPy vs StyledPilImage PNG rendering
+    qr_svg         run-length SVG vs SvgPathImage
+    import_time    application import cost (worker cold start)
+    compare        diff two --json result files
+
+Run any of them with `python -m benchmarks.<name> --help`.
+"""
@@ -0,0 +1,110 @@
+"""
+Shared helpers for the benchmark suite: timing statistics and
+machine-readable results.
+
+Every benchmark accepts `--json PATH` and writes
+
+    {"benchmark": ..., "meta": {...}, "results": [{"name": ..., ...}, ...]}
+
+so runs can be compared with `python -m benchmarks.compare old.json new.json`.
+"""
+
+import json
+import math
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of `values` (0 < pct <= 100)."""
+    ordered = sorted(values)
+    rank = max(math.ceil(pct / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def summarize(timings: List[float]) -> Dict[str, float]:
+    """Latency statistics in milliseconds for per-call timings in seconds."""
+    ms = [t * 1000 for t in timings]
+    return {
+        "count": len(ms),
+        "mean_ms": round(statistics.fmean(ms), 4),
+        "p50_ms": round(percentile(ms, 50), 4),
+        "p95_ms": round(percentile(ms, 95), 4),
+        "p99_ms": round(percentile(ms, 99), 4),
+        "max_ms": round(max(ms), 4),
+    }
+
+
+def measure(fn: Callable[[], object], repeat: int, warmup: int = 3) -> Dict[str, float]:
+    """Call `fn` `repeat` times and summarize; adds ops_per_sec."""
+    for _ in range(warmup):
+        fn()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    stats = summarize(timings)
+    stats["ops_per_sec"] = round(len(timings) / sum(timings), 1)
+    return stats
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_results(path: Optional[str], benchmark: str, results: List[dict], **params) -> None:
+    """Write results as JSON to `path` ("-" for stdout); no-op for None."""
+    if path is None:
+        return
+    document = {
+        "benchmark": benchmark,
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "params": params,
+        },
+        "results": results,
+    }
+    text = json.dumps(document, indent=2)
+    if path == "-":
+        sys.stdout.write(text + "\n")
+    else:
+        Path(path).write_text(text + "\n")
+
+
+def print_table(results: List[dict], columns: List[str]) -> None:
+    """Human-readable table of the given result columns."""
+    widths = {
+        c: max(len(c), *(len(_fmt(r.get(c))) for r in results)) for c in columns
+    }
+    header = "  ".join(c.rjust(widths[c]) if c != "name" else c.ljust(widths[c]) for c in columns)
+    print(header)
+    print("-" * len(header))
+    for row in results:
+        print("  ".join(
+            _fmt(row.get(c)).ljust(widths[c]) if c == "name" else _fmt(row.get(c)).rjust(widths[c])
+            for c in columns
+        ))
+
+
+def _fmt(value) -> str:
+    if isinstance(value, float):
+        return f"{value:.3f}"
+    return "" if value is None else str(value)
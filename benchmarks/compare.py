@@ -0,0 +1,57 @@
+"""
+Compare two benchmark result files (written with --json).
+
+Prints, for every result present in both runs, the change of each
+metric. Lower is better for *_ms and *_bytes, higher for rates
+(*_per_sec, rps, speedup).
+
+Usage:
+    python -m benchmarks.compare before.json after.json [--metric p50_ms ...]
+"""
+
+import argparse
+import json
+from pathlib import Path
+
+DEFAULT_METRICS = ("p50_ms", "p95_ms", "rps", "ops_per_sec")
+HIGHER_IS_BETTER = ("_per_sec", "rps", "speedup")
+
+
+def load(path: Path) -> dict:
+    document = json.loads(Path(path).read_text())
+    return {row["name"]: row for row in document["results"]}
+
+
+def compare(before: dict, after: dict, metrics) -> list:
+    """(name, metric, before, after, change %, better?) for shared results."""
+    rows = []
+    for name in before:
+        if name not in after:
+            continue
+        for metric in metrics:
+            old, new = before[name].get(metric), after[name].get(metric)
+            if not isinstance(old, (int, float)) or not isinstance(new, (int, float)):
+                continue
+            change = (new - old) / old * 100 if old else 0.0
+            higher = metric.endswith(HIGHER_IS_BETTER)
+            rows.append((name, metric, old, new, change, (change > 0) == higher))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("before", type=Path)
+    parser.add_argument("after", type=Path)
+    parser.add_argument("--metric", action="append", help="repeatable")
+    args = parser.parse_args()
+
+    rows = compare(load(args.before), load(args.after), args.metric or DEFAULT_METRICS)
+    width = max([len(row[0]) for row in rows] + [4])
+    print(f"{'name':<{width}}  {'metric':<12} {'before':>12} {'after':>12} {'change':>9}")
+    for name, metric, old, new, change, better in rows:
+        mark = "" if abs(change) < 1 else (" ✓" if better else " ✗")
+        print(f"{name:<{width}}  {metric:<12} {old:>12.3f} {new:>12.3f} {change:>+8.1f}%{mark}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Synthetic data generator: users, links and clicks in a SQLite file.
+
+Rows are bulk-inserted with executemany in batches straight through
+sqlite3 (millions of links and clicks take seconds, not hours); the
+schema comes from the app, and the search index is built once at the
+end instead of row by row through triggers.
+
+Usage:
+    python -m benchmarks.datagen bench.db [--users 100] [--links 100000]
+                                          [--clicks 1000000] [--seed 1]
+"""
+
+import argparse
+import random
+import sqlite3
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Iterator, List, Tuple
+
+from sqlalchemy import create_engine
+
+BATCH_SIZE = 50_000
+
+# Realistic mix for the UA parser and the analytics breakdowns
+USER_AGENTS = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0 Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 14_5) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.5 Safari/605.1.15",
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 17_5 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Mobile/15E148",
+    "Mozilla/5.0 (Linux; Android 14; Pixel 8) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0 Mobile Safari/537.36",
+    "Mozilla/5.0 (X11; Linux x86_64; rv:127.0) Gecko/20100101 Firefox/127.0",
+    "Mozilla/5.0 (iPad; CPU OS 17_5 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Mobile/15E148",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0 Safari/537.36 Edg/126.0",
+)
+REFERERS = (None, None, "https://google.com/", "https://t.co/x", "https://news.ycombinator.com/")
+DEVICES = ("desktop", "desktop", "mobile", "mobile", "desktop", "tablet", "desktop")
+BROWSERS = ("Chrome", "Safari", "Safari", "Chrome", "Firefox", "Safari", "Edge")
+SYSTEMS = ("Windows", "macOS", "iOS", "Android", "Linux", "iOS", "Windows")
+
+# Benchmark users only log in through tokens, never with a password
+PASSWORD_HASH = "$2b$12$KIXxwRj6z9FZQZgZxZ8Z8eZxZ8Z8eZxZ8Z8eZxZ8Z8eZxZ8Z8e"
+ALPHABET = "23456789abcdefghijkmnpqrstuvwxyzABCDEFGHJKLMNPQRSTUVWXYZ"
+
+
+def short_code(index: int) -> str:
+    """Deterministic, unique 7-char code for the link with this index."""
+    chars = []
+    for _ in range(7):
+        index, rem = divmod(index, len(ALPHABET))
+        chars.append(ALPHABET[rem])
+    return "".join(reversed(chars))
+
+
+def _batches(rows: Iterator[tuple], size: int = BATCH_SIZE) -> Iterator[List[tuple]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _users(count: int, now: datetime) -> Iterator[tuple]:
+    for i in range(1, count + 1):
+        yield (i, f"bench{i}@example.com", f"bench{i}", PASSWORD_HASH, "user", 1,
+               now - timedelta(days=365), "en")
+
+
+def _links(count: int, users: int, now: datetime, rng: random.Random) -> Iterator[tuple]:
+    for i in range(1, count + 1):
+        created = now - timedelta(seconds=rng.randrange(365 * 86400))
+        yield (i, rng.randrange(users) + 1, f"https://example.com/page/{i}?ref=bench",
+               short_code(i), f"Bench link {i}", 1, None, 0, created, created)
+
+
+def _clicks(count: int, links: int, now: datetime, rng: random.Random) -> Iterator[tuple]:
+    for _ in range(count):
+        # Skewed popularity: a few links get most clicks
+        url_id = min(int(rng.paretovariate(1.2)), links)
+        ua = rng.randrange(len(USER_AGENTS))
+        yield (url_id, now - timedelta(seconds=rng.randrange(90 * 86400)),
+               f"10.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(256)}",
+               USER_AGENTS[ua], rng.choice(REFERERS), DEVICES[ua], BROWSERS[ua], SYSTEMS[ua])
+
+
+def generate(
+    db_path: Path, users: int = 100, links: int = 100_000, clicks: int = 1_000_000,
+    seed: int = 1,
+) -> Tuple[int, int, int]:
+    """Create the schema in a fresh `db_path` and fill it; returns row counts."""
+    from app.database import init_db
+    from app.migrations import run_all_migrations
+    from app.services.search_service import FTS_TABLES, create_fts_tables
+
+    db_path = Path(db_path)
+    if db_path.exists():
+        db_path.unlink()
+    engine = create_engine(f"sqlite:///{db_path}")
+    init_db(engine)
+    run_all_migrations(db_path)
+
+    rng = random.Random(seed)
+    now = datetime.utcnow().replace(microsecond=0)
+    users = max(users, 1)
+    links = max(links, 1)
+
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        # No per-row index maintenance; the search index is rebuilt at the end
+        for fts_table, _ in FTS_TABLES.values():
+            for suffix in ("ai", "ad", "au"):
+                conn.execute(f"DROP TRIGGER IF EXISTS {fts_table}_{suffix}")
+            conn.execute(f"DROP TABLE IF EXISTS {fts_table}")
+        for batch in _batches(_users(users, now)):
+            conn.executemany(
+                "INSERT INTO users (id, email, username, hashed_password, role, "
+                "is_active, created_at, language) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                batch,
+            )
+        for batch in _batches(_links(links, users, now, rng)):
+            conn.executemany(
+                "INSERT INTO urls (id, user_id, original_url, short_code, title, "
+                "is_active, expires_at, clicks_count, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                batch,
+            )
+        for batch in _batches(_clicks(clicks, links, now, rng)):
+            conn.executemany(
+                "INSERT INTO clicks (url_id, clicked_at, ip_address, user_agent, "
+                "referer, device_type, browser, os) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                batch,
+            )
+        # Denormalized counters, as the redirect keeps them
+        conn.execute(
+            "UPDATE urls SET clicks_count = c.n FROM "
+            "(SELECT url_id, COUNT(*) AS n FROM clicks GROUP BY url_id) AS c "
+            "WHERE urls.id = c.url_id"
+        )
+        conn.commit()
+        conn.execute("ANALYZE")
+    finally:
+        conn.close()
+
+    with engine.begin() as connection:
+        create_fts_tables(connection)
+    engine.dispose()
+    return users, links, clicks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("db", type=Path)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--links", type=int, default=100_000)
+    parser.add_argument("--clicks", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    users, links, clicks = generate(args.db, args.users, args.links, args.clicks, args.seed)
+    print(
+        f"{args.db}: {users} users, {links} links, {clicks} clicks "
+        f"in {time.perf_counter() - start:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
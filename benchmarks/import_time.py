@@ -0,0 +1,73 @@
+"""
+Benchmark: cost of importing the application (worker cold start).
+
+Runs `python -X importtime -c "import app.main"` in a fresh interpreter
+and prints the total time and the slowest modules by cumulative time.
+
+Usage:
+    python -m benchmarks.import_time [--repeat 5] [--top 15] [--json out.json]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, Optional
+
+from benchmarks.common import ROOT, write_results
+
+# Pulled in only by the requests that need them
+DEFERRED_MODULES = ("qrcode", "PIL", "numpy", "httpx", "passlib")
+
+
+def measure_imports(
+    module: str = "app.main", env: Optional[Dict[str, str]] = None
+) -> Dict[str, int]:
+    """Cumulative import time (µs) of every module imported by `module`."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        env={**os.environ, **(env or {})},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            timings[name.strip()] = int(cumulative)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--json", help="write results to this file ('-' for stdout)")
+    args = parser.parse_args()
+
+    runs = [measure_imports() for _ in range(args.repeat)]
+    total = statistics.median(run["app.main"] for run in runs) / 1000
+    print(f"import app.main: {total:.1f} ms (median of {args.repeat})")
+
+    deferred = [m for m in DEFERRED_MODULES if m in runs[-1]]
+    print(f"deferred modules imported eagerly: {', '.join(deferred) or 'none'}")
+
+    print()
+    slowest = sorted(runs[-1].items(), key=lambda item: item[1], reverse=True)
+    for name, micros in slowest[:args.top]:
+        print(f"{micros / 1000:>9.1f} ms  {name}")
+
+    write_results(
+        args.json, "import_time",
+        [{"name": "import app.main", "p50_ms": round(total, 1), "deferred_imported": deferred}],
+        repeat=args.repeat,
+    )
+
+
+if __name__ == "__main__":
+    main()
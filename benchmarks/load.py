@@ -0,0 +1,136 @@
+"""
+Benchmark: in-process ASGI load driver for redirect and API endpoints.
+
+Drives the app through httpx's ASGI transport (no sockets, no server
+process), so the numbers are the cost of the app itself: routing,
+dependencies, queries and serialization. Run against a database made
+by `python -m benchmarks.datagen`; redirects write real clicks, so the
+redirect scenario also measures click ingestion.
+
+Usage:
+    python -m benchmarks.datagen bench.db --links 100000 --clicks 1000000
+    python -m benchmarks.load bench.db [--requests 2000] [--concurrency 16]
+                                       [--scenario redirect ...] [--json out.json]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+from benchmarks.common import print_table, summarize, write_results
+from benchmarks.datagen import short_code
+
+# name -> request factory (rng, link count) -> (method, path)
+SCENARIOS: Dict[str, Callable[[random.Random, int], Tuple[str, str]]] = {
+    "redirect": lambda rng, links: ("GET", f"/{short_code(rng.randrange(links) + 1)}"),
+    "redirect_missing": lambda rng, links: ("GET", "/zzzzzzz"),
+    "links_list": lambda rng, links: ("GET", "/api/v1/links?limit=50"),
+    "links_list_100": lambda rng, links: ("GET", "/api/v1/links?limit=100"),
+    "links_search": lambda rng, links: ("GET", f"/api/v1/links?search=page/{rng.randrange(1000)}"),
+    "analytics_overview": lambda rng, links: ("GET", "/api/v1/analytics/overview?days=30"),
+    "analytics_devices": lambda rng, links: ("GET", "/api/v1/analytics/devices"),
+    "analytics_top_links": lambda rng, links: ("GET", "/api/v1/analytics/top-links"),
+    "health": lambda rng, links: ("GET", "/api/health"),
+}
+
+
+async def drive(
+    client, scenario: str, requests: int, concurrency: int, links: int, seed: int = 1
+) -> dict:
+    """Send `requests` requests with `concurrency` in flight; return stats."""
+    make_request = SCENARIOS[scenario]
+    rng = random.Random(seed)
+    plan = [make_request(rng, links) for _ in range(requests)]
+    timings: List[float] = []
+    statuses: Counter = Counter()
+
+    async def worker(queue: List[Tuple[str, str]]):
+        while queue:
+            method, path = queue.pop()
+            start = time.perf_counter()
+            response = await client.request(method, path)
+            timings.append(time.perf_counter() - start)
+            statuses[response.status_code] += 1
+
+    plan.reverse()
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(plan) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    result = {"name": scenario, "concurrency": concurrency}
+    result.update(summarize(timings))
+    result["rps"] = round(requests / elapsed, 1)
+    result["statuses"] = {str(code): n for code, n in sorted(statuses.items())}
+    return result
+
+
+async def run(
+    db_path: Path, scenarios: List[str], requests: int, concurrency: int
+) -> List[dict]:
+    # The app reads its settings at import time
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ.setdefault("EXPIRY_SCHEDULER_ENABLED", "false")
+
+    import httpx
+
+    from app.core.security import create_access_token
+    from app.main import app
+
+    conn = sqlite3.connect(db_path)
+    try:
+        links = conn.execute("SELECT COUNT(*) FROM urls").fetchone()[0]
+        user_id = conn.execute(
+            "SELECT user_id FROM urls GROUP BY user_id ORDER BY COUNT(*) DESC LIMIT 1"
+        ).fetchone()[0]
+    finally:
+        conn.close()
+
+    results = []
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport,
+            base_url="http://bench",
+            cookies={"access_token": create_access_token({"sub": str(user_id)})},
+        ) as client:
+            for scenario in scenarios:
+                # Warm caches and lazy imports outside the measurement
+                await drive(client, scenario, min(requests, 20), 1, links, seed=0)
+                results.append(await drive(client, scenario, requests, concurrency, links))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("db", type=Path)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument(
+        "--scenario", action="append", choices=sorted(SCENARIOS),
+        help="repeatable; default: all",
+    )
+    parser.add_argument("--json", help="write results to this file ('-' for stdout)")
+    args = parser.parse_args()
+
+    scenarios = args.scenario or list(SCENARIOS)
+    results = asyncio.run(run(args.db, scenarios, args.requests, args.concurrency))
+
+    print_table(results, ["name", "rps", "p50_ms", "p95_ms", "p99_ms", "max_ms"])
+    for row in results:
+        errors = {code: n for code, n in row["statuses"].items() if int(code) >= 500}
+        if errors:
+            print(f"⚠️  {row['name']}: server errors {errors}")
+    write_results(
+        args.json, "load", results,
+        db=str(args.db), requests=args.requests, concurrency=args.concurrency,
+    )
+
+
+if __name__ == "__main__":
+    main()
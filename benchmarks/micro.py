@@ -0,0 +1,96 @@
+"""
+Micro-benchmarks for per-request hot functions.
+
+- generate_short_code against a table of existing links
+- user-agent detection (device, browser, OS) used by every redirect
+- generate_qr_image for short and long content, cold and cached
+
+Usage:
+    python -m benchmarks.micro [--repeat 2000] [--links 100000] [--json out.json]
+"""
+
+import argparse
+import itertools
+import tempfile
+from pathlib import Path
+from typing import List
+
+from benchmarks.common import measure, print_table, write_results
+from benchmarks.datagen import USER_AGENTS, generate
+
+
+def bench_short_code(repeat: int, links: int) -> List[dict]:
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+
+    from app.utils import generate_short_code
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "micro.db"
+        generate(db_path, users=1, links=links, clicks=0)
+        engine = create_engine(f"sqlite:///{db_path}")
+        try:
+            with Session(engine) as db:
+                stats = measure(lambda: generate_short_code(db), repeat)
+        finally:
+            engine.dispose()
+    return [{"name": "generate_short_code", "links": links, **stats}]
+
+
+def bench_user_agent(repeat: int) -> List[dict]:
+    from app.api.redirect import _detect_browser, _detect_device, _detect_os
+
+    agents = itertools.cycle(USER_AGENTS)
+
+    def detect():
+        ua = next(agents)
+        return _detect_device(ua), _detect_browser(ua), _detect_os(ua)
+
+    return [{"name": "detect_user_agent", **measure(detect, repeat)}]
+
+
+def bench_qr_image(repeat: int) -> List[dict]:
+    from app.services.qr_service import generate_qr_image
+
+    contents = {
+        "short": "https://gosha.link/abc123",
+        "long": "https://example.com/" + "x" * 400,
+    }
+    results = []
+    for label, content in contents.items():
+        # Cold: unique content per call, so every call renders
+        counter = itertools.count()
+        cold = measure(
+            lambda: generate_qr_image(f"{content}?{next(counter)}"),
+            max(repeat // 20, 10),
+        )
+        results.append({"name": f"generate_qr_image_{label}_cold", **cold})
+
+        # Cached: the same content, served by the render cache after warmup
+        cached = measure(lambda: generate_qr_image(content), repeat)
+        results.append({"name": f"generate_qr_image_{label}_cached", **cached})
+    return results
+
+
+def run(repeat: int, links: int) -> List[dict]:
+    return (
+        bench_short_code(repeat, links)
+        + bench_user_agent(repeat * 10)
+        + bench_qr_image(repeat)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--links", type=int, default=100_000)
+    parser.add_argument("--json", help="write results to this file ('-' for stdout)")
+    args = parser.parse_args()
+
+    results = run(args.repeat, args.links)
+    print_table(results, ["name", "count", "ops_per_sec", "p50_ms", "p95_ms", "p99_ms"])
+    write_results(args.json, "micro", results, repeat=args.repeat, links=args.links)
+
+
+if __name__ == "__main__":
+    main()
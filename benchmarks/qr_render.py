@@ -0,0 +1,102 @@
+"""
+Benchmark: NumPy matrix renderer vs StyledPilImage for square QR codes.
+
+Renders the same QR code (fixed version, so the module count is known)
+with both paths across box sizes and versions and prints the median
+time per render and the PNG size.
+
+Usage:
+    python -m benchmarks.qr_render [--repeat 20] [--json out.json]
+"""
+
+import argparse
+import io
+import statistics
+import time
+
+import qrcode
+from qrcode.image.styles.moduledrawers.pil import SquareModuleDrawer
+
+from app.services.qr_service import _render_matrix, _render_styled
+from benchmarks.common import write_results
+
+VERSIONS = (1, 5, 10, 20, 40)
+BOX_SIZES = (5, 10, 20)
+FG = (0, 0, 0)
+BG = (255, 255, 255)
+
+
+def _make_qr(version: int, box_size: int) -> qrcode.QRCode:
+    qr = qrcode.QRCode(
+        version=version,
+        error_correction=qrcode.constants.ERROR_CORRECT_M,
+        box_size=box_size,
+        border=4,
+    )
+    # Short payload so that it fits even version 1
+    qr.add_data("gosha")
+    qr.make(fit=False)
+    return qr
+
+
+def _encode(img) -> bytes:
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _measure(render, repeat: int):
+    timings = []
+    png = b""
+    for _ in range(repeat):
+        start = time.perf_counter()
+        png = _encode(render())
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000, len(png)
+
+
+def run(repeat: int) -> list:
+    rows = []
+    for version in VERSIONS:
+        for box_size in BOX_SIZES:
+            qr = _make_qr(version, box_size)
+            fast_ms, fast_size = _measure(
+                lambda: _render_matrix(qr.get_matrix(), box_size, FG, BG), repeat
+            )
+            styled_ms, styled_size = _measure(
+                lambda: _render_styled(qr, SquareModuleDrawer, FG, BG), repeat
+            )
+            rows.append({
+                "name": f"v{version}-box{box_size}",
+                "version": version,
+                "box_size": box_size,
+                "numpy_ms": round(fast_ms, 3),
+                "styled_ms": round(styled_ms, 3),
+                "speedup": round(styled_ms / fast_ms, 1),
+                "numpy_png_bytes": fast_size,
+                "styled_png_bytes": styled_size,
+            })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--json", help="write results to this file ('-' for stdout)")
+    args = parser.parse_args()
+
+    header = f"{'ver':>4} {'box':>4} {'numpy ms':>10} {'styled ms':>10} {'x':>6} {'numpy B':>9} {'styled B':>9}"
+    print(header)
+    print("-" * len(header))
+    rows = run(args.repeat)
+    for row in rows:
+        print(
+            f"{row['version']:>4} {row['box_size']:>4} "
+            f"{row['numpy_ms']:>10.3f} {row['styled_ms']:>10.3f} {row['speedup']:>6} "
+            f"{row['numpy_png_bytes']:>9} {row['styled_png_bytes']:>9}"
+        )
+    write_results(args.json, "qr_render", rows, repeat=args.repeat)
+
+
+if __name__ == "__main__":
+    main()
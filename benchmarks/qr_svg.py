@@ -0,0 +1,108 @@
+"""
+Benchmark: run-length SVG renderer vs qrcode's SvgPathImage.
+
+For each QR version prints the median generation time, the SVG size
+and its gzip size for both implementations.
+
+Usage:
+    python -m benchmarks.qr_svg [--repeat 20] [--json out.json]
+"""
+
+import argparse
+import gzip
+import io
+import statistics
+import time
+from unittest import mock
+
+import qrcode
+import qrcode.image.svg
+
+from app.services import qr_service
+from benchmarks.common import write_results
+
+VERSIONS = (1, 5, 10, 20, 40)
+
+
+def _legacy_svg(content: str, version: int) -> bytes:
+    """The previous implementation: SvgPathImage serialised via ElementTree."""
+    qr = qrcode.QRCode(
+        version=version,
+        error_correction=qrcode.constants.ERROR_CORRECT_M,
+        box_size=10,
+        border=4,
+    )
+    qr.add_data(content)
+    qr.make(fit=False)
+    img = qr.make_image(image_factory=qrcode.image.svg.SvgPathImage)
+    buffer = io.BytesIO()
+    img.save(buffer)
+    return buffer.getvalue()
+
+
+def _new_svg(content: str, version: int) -> bytes:
+    # Pin the version the same way the legacy path does
+    real = qrcode.QRCode
+
+    def pinned(**kwargs):
+        kwargs["version"] = version
+        return real(**kwargs)
+
+    # Measure a cold render: drop the cached module matrix
+    qr_service.qr_render_cache.clear()
+    with mock.patch.object(qr_service.qrcode, "QRCode", pinned):
+        return qr_service._render_svg(content, "#000000", "#FFFFFF", 10, 4, "M")
+
+
+def _measure(render, repeat: int):
+    timings = []
+    svg = b""
+    for _ in range(repeat):
+        start = time.perf_counter()
+        svg = render()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000, len(svg), len(gzip.compress(svg))
+
+
+def run(repeat: int) -> list:
+    rows = []
+    for version in VERSIONS:
+        legacy = _measure(lambda: _legacy_svg("gosha", version), repeat)
+        new = _measure(lambda: _new_svg("gosha", version), repeat)
+        rows.append({
+            "name": f"v{version}",
+            "version": version,
+            "legacy_ms": round(legacy[0], 3),
+            "rle_ms": round(new[0], 3),
+            "legacy_bytes": legacy[1],
+            "rle_bytes": new[1],
+            "legacy_gzip_bytes": legacy[2],
+            "rle_gzip_bytes": new[2],
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--json", help="write results to this file ('-' for stdout)")
+    args = parser.parse_args()
+
+    header = (
+        f"{'ver':>4} {'legacy ms':>10} {'rle ms':>8} "
+        f"{'legacy B':>9} {'rle B':>7} {'legacy gz':>10} {'rle gz':>7}"
+    )
+    print(header)
+    print("-" * len(header))
+    rows = run(args.repeat)
+    for row in rows:
+        print(
+            f"{row['version']:>4} {row['legacy_ms']:>10.3f} {row['rle_ms']:>8.3f} "
+            f"{row['legacy_bytes']:>9} {row['rle_bytes']:>7} "
+            f"{row['legacy_gzip_bytes']:>10} {row['rle_gzip_bytes']:>7}"
+        )
+    write_results(args.json, "qr_svg", rows, repeat=args.repeat)
+
+
+if __name__ == "__main__":
+    main()
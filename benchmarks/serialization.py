@@ -0,0 +1,103 @@
+"""
+Benchmark: serializing a 100-item link listing.
+
+Compares the previous path of GET /api/v1/links (ORM entities ->
+URLResponse models -> response_model validation -> stdlib json) with
+the current one (LINK_COLUMNS tuples -> plain dicts -> orjson), both
+with and without the database fetch.
+
+Usage:
+    python -m benchmarks.serialization [--items 100] [--repeat 500] [--json out.json]
+"""
+
+import argparse
+import json
+import tempfile
+from pathlib import Path
+from typing import List
+
+from benchmarks.common import measure, print_table, write_results
+from benchmarks.datagen import generate
+
+
+def _response_model_json(urls, adapter) -> bytes:
+    """What FastAPI does for a response_model list: dump, validate, serialize, json.dumps."""
+    from app.api.links import _url_to_response
+
+    content = [_url_to_response(url).model_dump() for url in urls]
+    value = adapter.validate_python(content)
+    return json.dumps(
+        adapter.dump_python(value, mode="json"),
+        ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":"),
+    ).encode()
+
+
+def _orjson(rows) -> bytes:
+    from fastapi.responses import ORJSONResponse
+
+    from app.api.links import _link_dict
+
+    return ORJSONResponse([_link_dict(*row) for row in rows]).body
+
+
+def run(items: int, repeat: int) -> List[dict]:
+    from pydantic import TypeAdapter
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+
+    from app.api.links import LINK_COLUMNS
+    from app.models import URL
+    from app.schemas import URLResponse
+
+    adapter = TypeAdapter(List[URLResponse])
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "serialization.db"
+        generate(db_path, users=1, links=items, clicks=0)
+        engine = create_engine(f"sqlite:///{db_path}")
+        try:
+            with Session(engine) as db:
+                order = (URL.created_at.desc(), URL.id.desc())
+
+                def fetch_entities():
+                    db.expunge_all()
+                    return db.query(URL).order_by(*order).limit(items).all()
+
+                def fetch_tuples():
+                    return db.query(*LINK_COLUMNS).order_by(*order).limit(items).all()
+
+                urls, rows = fetch_entities(), fetch_tuples()
+                assert json.loads(_response_model_json(urls, adapter)) == json.loads(_orjson(rows))
+
+                cases = {
+                    "serialize_response_model": lambda: _response_model_json(urls, adapter),
+                    "serialize_orjson_dicts": lambda: _orjson(rows),
+                    "fetch_serialize_response_model": lambda: _response_model_json(fetch_entities(), adapter),
+                    "fetch_serialize_orjson_dicts": lambda: _orjson(fetch_tuples()),
+                }
+                for name, fn in cases.items():
+                    results.append({"name": name, "items": items, **measure(fn, repeat)})
+        finally:
+            engine.dispose()
+
+    baseline = {r["name"]: r["p50_ms"] for r in results}
+    for prefix in ("serialize", "fetch_serialize"):
+        new = next(r for r in results if r["name"] == f"{prefix}_orjson_dicts")
+        new["speedup"] = round(baseline[f"{prefix}_response_model"] / new["p50_ms"], 2)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--items", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=500)
+    parser.add_argument("--json", help="write results to this file ('-' for stdout)")
+    args = parser.parse_args()
+
+    results = run(args.items, args.repeat)
+    print_table(results, ["name", "items", "ops_per_sec", "p50_ms", "p95_ms", "speedup"])
+    write_results(args.json, "serialization", results, items=args.items, repeat=args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 """
-Development server runner
+Development server runner (auto-reload, single process).
+For production use: python -m app.server
 """
 import uvicorn
 
@@ -39,3 +39,78 @@ def client(db_session):
     with TestClient(app) as c:
         yield c
     app.dependency_overrides.clear()
+
+
+def _login(client, user):
+    from app.core.security import create_access_token
+
+    client.cookies.set(
+        "access_token", create_access_token({"sub": str(user.id)})
+    )
+    return client
+
+
+@pytest.fixture
+def user(db_session):
+    from app.models import User
+
+    user = User(
+        email="user@example.com",
+        username="testuser",
+        hashed_password="not-a-real-hash",
+        is_active=True,
+    )
+    db_session.add(user)
+    db_session.commit()
+    db_session.refresh(user)
+    return user
+
+
+@pytest.fixture
+def admin_user(db_session):
+    from app.models import User, UserRole
+
+    admin = User(
+        email="root@example.com",
+        username="rootadmin",
+        hashed_password="not-a-real-hash",
+        role=UserRole.ADMIN,
+        is_active=True,
+    )
+    db_session.add(admin)
+    db_session.commit()
+    db_session.refresh(admin)
+    return admin
+
+
+@pytest.fixture
+def auth_client(client, user):
+    return _login(client, user)
+
+
+@pytest.fixture
+def admin_client(client, admin_user):
+    return _login(client, admin_user)
+
+
+class QueryCounter:
+    """Collects SQL statements executed on the test engine."""
+
+    def __init__(self):
+        self.statements = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def __len__(self):
+        return len(self.statements)
+
+
+@pytest.fixture
+def count_queries():
+    from sqlalchemy import event
+
+    counter = QueryCounter()
+    event.listen(engine, "before_cursor_execute", counter)
+    yield counter
+    event.remove(engine, "before_cursor_execute", counter)
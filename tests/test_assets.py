@@ -0,0 +1,96 @@
+"""
+Fingerprinted, precompressed static assets.
+"""
+
+import gzip
+import re
+
+import pytest
+
+from app.core.assets import StaticAssets, fingerprint, static_assets
+from app.core.compression import AVAILABLE_ENCODINGS
+
+
+@pytest.fixture
+def assets(tmp_path):
+    (tmp_path / "css").mkdir()
+    (tmp_path / "css" / "site.css").write_text("body { color: red; }\n" * 50)
+    (tmp_path / "img.png").write_bytes(b"\x89PNG fake")
+    (tmp_path / "uploads").mkdir()
+    (tmp_path / "uploads" / "avatar.css").write_text("user content")
+    return StaticAssets(directory=str(tmp_path))
+
+
+class TestPipeline:
+    def test_fingerprint_keeps_directory_and_suffix(self):
+        assert fingerprint("css/base.css", "0123456789abcdef") == "css/base.0123456789.css"
+
+    def test_build_skips_uploads(self, assets):
+        assert assets.build() == 2
+        manifest = assets.manifest()
+        assert set(manifest) == {"css/site.css", "img.png"}
+        assert re.fullmatch(r"css/site\.[0-9a-f]{10}\.css", manifest["css/site.css"])
+
+    def test_url_helper(self, assets):
+        assert assets.url("css/site.css") == "/static/" + assets.manifest()["css/site.css"]
+        # Unknown files (uploads) keep their plain URL
+        assert assets.url("/uploads/avatar.css") == "/static/uploads/avatar.css"
+
+    def test_only_text_is_compressed(self, assets):
+        assets.build()
+        css = assets._by_path["css/site.css"]
+        png = assets._by_path["img.png"]
+        assert set(css.variants) == {None, *AVAILABLE_ENCODINGS}
+        assert gzip.decompress(css.variants["gzip"]) == css.variants[None]
+        assert set(png.variants) == {None}
+
+
+class TestServing:
+    def _asset_url(self, client):
+        html = client.get("/features").text
+        return re.search(r'/static/css/base\.[0-9a-f]{10}\.css', html).group(0)
+
+    def test_templates_reference_fingerprinted_urls(self, client):
+        html = client.get("/features").text
+        assert 'href="/static/css/base.css"' not in html
+        assert self._asset_url(client)
+
+    def test_fingerprinted_is_immutable_and_compressed(self, client):
+        url = self._asset_url(client)
+        response = client.get(url, headers={"Accept-Encoding": "gzip"})
+        assert response.status_code == 200
+        assert response.headers["cache-control"] == "public, max-age=31536000, immutable"
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["vary"] == "Accept-Encoding"
+        assert response.headers["content-type"].startswith("text/css")
+        assert "body" in response.text
+
+    def test_identity_when_not_accepted(self, client):
+        url = self._asset_url(client)
+        response = client.get(url, headers={"Accept-Encoding": "identity"})
+        assert "content-encoding" not in response.headers
+        assert response.headers["vary"] == "Accept-Encoding"
+        plain = static_assets._by_path["css/base.css"].variants[None]
+        assert response.content == plain
+
+    def test_etag_revalidation(self, client):
+        url = self._asset_url(client)
+        etag = client.get(url, headers={"Accept-Encoding": "gzip"}).headers["etag"]
+        response = client.get(url, headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+        assert response.status_code == 304
+        # A different encoding is a different representation
+        other = client.get(url, headers={"Accept-Encoding": "identity", "If-None-Match": etag})
+        assert other.status_code == 200
+
+    def test_plain_url_revalidates(self, client):
+        response = client.get("/static/css/base.css")
+        assert response.status_code == 200
+        assert response.headers["cache-control"] == "public, no-cache"
+
+    def test_uploads_served_from_disk(self, client):
+        response = client.get("/static/uploads/README.md")
+        assert response.status_code == 200
+        assert "immutable" not in response.headers.get("cache-control", "")
+
+    def test_unknown_fingerprint_is_404(self, client):
+        assert client.get("/static/css/base.0000000000.css").status_code == 404
@@ -0,0 +1,70 @@
+"""
+Smoke tests for the benchmark tooling (the benchmarks themselves are not run).
+"""
+
+import asyncio
+import json
+import sqlite3
+
+import httpx
+from fastapi import FastAPI
+
+from benchmarks.common import percentile, summarize, write_results
+from benchmarks.compare import compare, load
+from benchmarks.datagen import generate, short_code
+from benchmarks.load import drive
+
+
+def test_percentile_and_summary():
+    values = [0.001 * i for i in range(1, 101)]
+    assert percentile(values, 50) == values[49]
+    assert percentile(values, 100) == values[-1]
+    stats = summarize(values)
+    assert stats["count"] == 100
+    assert stats["p95_ms"] == 95.0
+
+
+def test_datagen(tmp_path):
+    db_path = tmp_path / "bench.db"
+    assert generate(db_path, users=3, links=50, clicks=500) == (3, 50, 500)
+
+    conn = sqlite3.connect(db_path)
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM users").fetchone()[0] == 3
+        assert conn.execute("SELECT SUM(clicks_count) FROM urls").fetchone()[0] == 500
+        code = conn.execute("SELECT short_code FROM urls WHERE id = 7").fetchone()[0]
+        # Search index is built after the bulk load
+        found = conn.execute(
+            "SELECT COUNT(*) FROM urls_fts WHERE urls_fts MATCH '\"page/7?\"'"
+        ).fetchone()[0]
+    finally:
+        conn.close()
+    assert code == short_code(7)
+    assert found == 1
+    assert len({short_code(i) for i in range(1, 5000)}) == 4999
+
+
+def test_load_driver_and_compare(tmp_path):
+    app = FastAPI()
+
+    @app.get("/{code}")
+    async def echo(code: str):
+        return {"code": code}
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            return await drive(client, "redirect", 40, 4, links=10)
+
+    result = asyncio.run(run())
+    assert result["count"] == 40
+    assert result["statuses"] == {"200": 40}
+    assert result["rps"] > 0
+
+    before, after = tmp_path / "before.json", tmp_path / "after.json"
+    write_results(str(before), "load", [dict(result, p50_ms=2.0)])
+    write_results(str(after), "load", [dict(result, p50_ms=1.0)])
+    assert json.loads(after.read_text())["meta"]["python"]
+
+    rows = compare(load(before), load(after), ["p50_ms"])
+    assert rows == [("redirect", "p50_ms", 2.0, 1.0, -50.0, True)]
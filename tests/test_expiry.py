@@ -0,0 +1,97 @@
+"""
+Tests for background deactivation of expired links.
+"""
+
+from datetime import datetime, timedelta
+
+from app.models import URL
+from app.services.expiry_service import (
+    ExpiryScheduler,
+    deactivate_expired,
+    next_expiry,
+)
+from tests.conftest import TestingSessionLocal
+
+NOW = datetime(2030, 1, 1, 12, 0)
+
+
+def _add(db_session, user, code, expires_at, is_active=True):
+    url = URL(
+        user_id=user.id,
+        short_code=code,
+        original_url="https://example.com",
+        expires_at=expires_at,
+        is_active=is_active,
+    )
+    db_session.add(url)
+    db_session.commit()
+    return url
+
+
+def test_deactivate_expired(db_session, user):
+    _add(db_session, user, "past", NOW - timedelta(minutes=1))
+    _add(db_session, user, "future", NOW + timedelta(hours=1))
+    _add(db_session, user, "never", None)
+
+    assert deactivate_expired(db_session, NOW) == ["past"]
+    assert deactivate_expired(db_session, NOW) == []
+
+    db_session.expire_all()
+    active = {u.short_code: u.is_active for u in db_session.query(URL)}
+    assert active == {"past": False, "future": True, "never": True}
+
+
+def test_next_expiry_ignores_inactive_links(db_session, user):
+    _add(db_session, user, "off", NOW + timedelta(minutes=5), is_active=False)
+    _add(db_session, user, "soon", NOW + timedelta(minutes=10))
+    _add(db_session, user, "later", NOW + timedelta(hours=1))
+
+    assert next_expiry(db_session, NOW) == NOW + timedelta(minutes=10)
+
+
+def test_scheduler_pass_tracks_next_due(db_session, user):
+    _add(db_session, user, "past", NOW - timedelta(seconds=1))
+    _add(db_session, user, "soon", NOW + timedelta(minutes=3))
+
+    scheduler = ExpiryScheduler(TestingSessionLocal, max_interval=60)
+    assert scheduler.run_once(NOW) == ["past"]
+    assert scheduler.next_due == NOW + timedelta(minutes=3)
+
+
+def test_expired_link_is_reported_as_expired(client, db_session, user):
+    _add(db_session, user, "gone", datetime.utcnow() - timedelta(days=1), is_active=False)
+    response = client.get("/gone", follow_redirects=False)
+    assert response.status_code == 410
+    assert response.json()["detail"] == "Link has expired"
+
+
+def test_scheduler_pass_runs_off_the_event_loop(db_session, user):
+    import asyncio
+    import threading
+
+    threads = []
+
+    def session_factory():
+        threads.append(threading.current_thread())
+        return TestingSessionLocal()
+
+    async def main():
+        scheduler = ExpiryScheduler(session_factory, max_interval=60)
+        scheduler.start()
+        while not threads:
+            await asyncio.sleep(0.01)
+        await scheduler.stop()
+
+    asyncio.run(main())
+    assert threads[0] is not threading.main_thread()
+
+
+def test_scheduler_runs_in_first_worker_only(monkeypatch):
+    from app.config import settings
+    from app.server import configure_worker
+
+    monkeypatch.setattr(settings, "EXPIRY_SCHEDULER_ENABLED", True)
+    configure_worker(0)
+    assert settings.EXPIRY_SCHEDULER_ENABLED
+    configure_worker(1)
+    assert not settings.EXPIRY_SCHEDULER_ENABLED
@@ -0,0 +1,204 @@
+"""
+Request/DB metrics and the Prometheus /metrics endpoint.
+"""
+
+import asyncio
+import threading
+
+import pytest
+
+from app.core import metrics
+from app.database import instrument_engine
+from app.models import URL
+from tests.conftest import engine
+
+
+@pytest.fixture(autouse=True)
+def instrumented():
+    instrument_engine(engine)
+    metrics.REGISTRY.reset()
+
+
+def _sample(text: str, prefix: str) -> float:
+    for line in text.splitlines():
+        if line.startswith(prefix):
+            return float(line.rsplit(" ", 1)[1])
+    raise AssertionError(f"{prefix} not found in:\n{text}")
+
+
+class TestPrimitives:
+    def test_counter_sums_thread_shards(self):
+        registry = metrics.Registry()
+        counter = metrics.Counter("things_total", "Things", ("kind",), registry=registry)
+
+        def work():
+            for _ in range(1000):
+                counter.inc(("a",))
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert counter.value(("a",)) == 4000
+        assert 'things_total{kind="a"} 4000' in registry.expose()
+
+    def test_histogram_exposition_is_cumulative(self):
+        registry = metrics.Registry()
+        histogram = metrics.Histogram("latency_seconds", "Latency", buckets=(0.1, 1), registry=registry)
+        for value in (0.05, 0.1, 0.5, 3):
+            histogram.observe(value)
+
+        text = registry.expose()
+        assert "# TYPE latency_seconds histogram" in text
+        assert 'latency_seconds_bucket{le="0.1"} 2' in text
+        assert 'latency_seconds_bucket{le="1"} 3' in text
+        assert 'latency_seconds_bucket{le="+Inf"} 4' in text
+        assert "latency_seconds_count 4" in text
+        assert _sample(text, "latency_seconds_sum") == pytest.approx(3.65)
+
+    def test_labels_are_escaped(self):
+        registry = metrics.Registry()
+        counter = metrics.Counter("odd_total", "Odd", ("path",), registry=registry)
+        counter.inc(('a"b\\c',))
+        assert 'odd_total{path="a\\"b\\\\c"} 1' in registry.expose()
+
+    def test_duplicate_name_rejected(self):
+        registry = metrics.Registry()
+        metrics.Counter("dup_total", "Dup", registry=registry)
+        with pytest.raises(ValueError):
+            metrics.Counter("dup_total", "Dup", registry=registry)
+
+    def test_failing_callback_is_skipped(self):
+        registry = metrics.Registry()
+        metrics.CallbackMetric("broken", "Broken", lambda: 1 / 0, registry=registry)
+        metrics.CallbackMetric("fine", "Fine", lambda: 7, registry=registry)
+        text = registry.expose()
+        assert "fine 7" in text
+        assert "\nbroken " not in text
+
+
+class TestMiddleware:
+    def test_requests_labelled_by_route_template(self, client, db_session, user):
+        for code in ("abc", "def"):
+            db_session.add(URL(short_code=code, original_url="https://example.com", user_id=user.id))
+        db_session.commit()
+
+        client.get("/abc", follow_redirects=False)
+        client.get("/def", follow_redirects=False)
+        client.get("/api/health")
+
+        text = client.get("/metrics").text
+        assert 'http_requests_total{method="GET",route="/{short_code}",status="302"} 2' in text
+        assert 'http_requests_total{method="GET",route="/api/health",status="200"} 1' in text
+        assert 'route="/abc"' not in text
+        assert 'http_request_duration_seconds_count{method="GET",route="/{short_code}"} 2' in text
+
+    def test_db_statements_counted_per_request(self, client, db_session, user):
+        db_session.add(URL(short_code="abc", original_url="https://example.com", user_id=user.id))
+        db_session.commit()
+        client.get("/abc", follow_redirects=False)
+
+        assert metrics.HTTP_DB_QUERIES.count(("/{short_code}",)) == 1
+        text = client.get("/metrics").text
+        assert _sample(text, 'http_request_db_queries_sum{route="/{short_code}"}') >= 1
+        assert _sample(text, "db_query_duration_seconds_count") >= 1
+
+    def test_service_gauges_exposed(self, client):
+        text = client.get("/metrics").text
+        for name in (
+            "qr_render_cache_lookups_total",
+            "qr_render_cache_hit_ratio",
+            "qr_render_pool_pending",
+            "qr_download_counter_pending",
+        ):
+            assert f"# TYPE {name}" in text
+        assert "qr_download_counter_pending 0" in text
+
+    def test_server_timing_header(self, db_session):
+        async def endpoint(scope, receive, send):
+            db_session.execute(URL.__table__.select())
+            metrics.add_timing("render", 0.002)
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b"ok"})
+
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        app = metrics.MetricsMiddleware(endpoint, server_timing=True)
+        asyncio.run(app({"type": "http", "method": "GET", "path": "/"}, None, send))
+
+        headers = dict(sent[0]["headers"])
+        timing = headers[b"server-timing"].decode()
+        assert timing.startswith("app;dur=")
+        assert 'desc="1 queries"' in timing
+        assert "render;dur=2.0" in timing
+        assert metrics.HTTP_REQUESTS.value(("GET", "<unmatched>", "200")) == 1
+
+    def test_no_server_timing_by_default(self, client):
+        assert "server-timing" not in client.get("/api/health").headers
+
+
+class TestRegistry:
+    def test_metric_requires_samples(self):
+        with pytest.raises(TypeError):
+            metrics._Metric("abstract", "Abstract")
+
+    def test_dead_thread_shards_are_folded(self):
+        registry = metrics.Registry()
+        counter = metrics.Counter("folded_total", "Folded", registry=registry)
+
+        for _ in range(5):
+            thread = threading.Thread(target=counter.inc)
+            thread.start()
+            thread.join()
+
+        assert counter.value() == 5
+        # Only the base shard is left, and totals survive further threads
+        assert registry._shards == []
+        thread = threading.Thread(target=counter.inc)
+        thread.start()
+        thread.join()
+        assert counter.value() == 6
+
+    def test_totals_include_other_workers(self, tmp_path):
+        registry = metrics.Registry()
+        counter = metrics.Counter("shared_total", "Shared", ("kind",), registry=registry)
+        histogram = metrics.Histogram("shared_seconds", "Shared", buckets=(1,), registry=registry)
+        registry.share(tmp_path, interval=3600)
+        try:
+            counter.inc(("a",), 2)
+            histogram.observe(0.5)
+            # Another worker's snapshot, plus a dead worker's
+            (tmp_path / "1.json").write_text('[["shared_total", ["a"], [3]]]')
+            (tmp_path / "2.json").write_text(
+                '[["shared_total", ["b"], [1]], ["shared_seconds", [], [1, 0, 0.25]]]'
+            )
+
+            text = registry.expose()
+            assert 'shared_total{kind="a"} 5' in text
+            assert 'shared_total{kind="b"} 1' in text
+            assert "shared_seconds_count 2" in text
+
+            registry.stop_sharing()
+            assert {p.name for p in tmp_path.iterdir()} >= {"1.json", "2.json"}
+            assert len(list(tmp_path.glob("*.json"))) == 3
+        finally:
+            registry.stop_sharing()
+
+    def test_clear_shared(self, tmp_path):
+        (tmp_path / "1.json").write_text("[]")
+        metrics.clear_shared(tmp_path)
+        assert list(tmp_path.iterdir()) == []
+
+    def test_failed_statement_does_not_leak_start_time(self, db_session):
+        from sqlalchemy import text
+        from sqlalchemy.exc import OperationalError
+
+        info = db_session.connection().info
+        with pytest.raises(OperationalError):
+            db_session.execute(text("SELECT * FROM no_such_table"))
+        assert not info.get("query_start")
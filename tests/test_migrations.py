@@ -0,0 +1,124 @@
+"""
+Tests for the versioned migration runner.
+"""
+
+import base64
+import sqlite3
+
+import pytest
+
+from app import migrations
+from app.config import settings
+from app.migrations import (
+    LATEST_VERSION,
+    MIGRATIONS,
+    current_version,
+    main,
+    run_all_migrations,
+)
+from app.services.blob_store import blob_store
+from app.services.qr_service import render_qr_png
+
+
+def _legacy_db(path, rows=3):
+    """Pre-versioning database: inline images, tags column, no indexes."""
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE users (id INTEGER PRIMARY KEY, created_at DATETIME);
+        CREATE TABLE urls (
+            id INTEGER PRIMARY KEY, user_id INTEGER, created_at DATETIME,
+            is_active BOOLEAN, expires_at DATETIME, tags VARCHAR(500)
+        );
+        CREATE TABLE tags (
+            id INTEGER PRIMARY KEY, user_id INTEGER, name VARCHAR(50),
+            created_at DATETIME, UNIQUE (user_id, name)
+        );
+        CREATE TABLE url_tags (url_id INTEGER, tag_id INTEGER, PRIMARY KEY (url_id, tag_id));
+        CREATE TABLE qr_codes (
+            id INTEGER PRIMARY KEY, user_id INTEGER, url_id INTEGER,
+            qr_data VARCHAR(2000), qr_image_base64 TEXT, style VARCHAR(20),
+            created_at DATETIME
+        );
+    """)
+    pngs = []
+    for i in range(1, rows + 1):
+        png = render_qr_png(content=f"https://legacy.example.com/{i}")
+        pngs.append(png)
+        conn.execute(
+            "INSERT INTO qr_codes (id, user_id, qr_data, qr_image_base64) VALUES (?, 1, ?, ?)",
+            (i, f"https://legacy.example.com/{i}", base64.b64encode(png).decode()),
+        )
+    conn.commit()
+    conn.close()
+    return pngs
+
+
+def test_registry_is_ordered():
+    versions = [m.version for m in MIGRATIONS]
+    assert versions == sorted(set(versions))
+    assert LATEST_VERSION == versions[-1]
+
+
+def test_legacy_database_is_migrated_once(tmp_path, monkeypatch):
+    db_path = tmp_path / "legacy.db"
+    pngs = _legacy_db(db_path)
+    monkeypatch.setattr(migrations, "QR_BLOB_BATCH_SIZE", 2)
+
+    assert run_all_migrations(db_path) == len(MIGRATIONS)
+
+    conn = sqlite3.connect(db_path)
+    try:
+        assert current_version(conn) == LATEST_VERSION
+        columns = [c[1] for c in conn.execute("PRAGMA table_info(qr_codes)")]
+        assert "qr_image_base64" not in columns
+        rows = conn.execute(
+            "SELECT id, content, image_digest, style, box_size FROM qr_codes ORDER BY id"
+        ).fetchall()
+        indexes = {r[1] for r in conn.execute("PRAGMA index_list(qr_codes)")}
+    finally:
+        conn.close()
+
+    assert [row[1] for row in rows] == [f"https://legacy.example.com/{i}" for i in (1, 2, 3)]
+    assert [blob_store.get(row[2]) for row in rows] == pngs
+    # Missing columns are filled with their defaults
+    assert {(row[3], row[4]) for row in rows} == {("square", 10)}
+    assert "ix_qr_codes_user_id_created_at_id" in indexes
+
+    # Up to date: nothing runs on the next boot
+    assert run_all_migrations(db_path) == 0
+
+
+def test_failed_step_is_not_recorded(tmp_path, monkeypatch):
+    db_path = tmp_path / "broken.db"
+    _legacy_db(db_path, rows=0)
+
+    def boom(conn):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(
+        migrations, "MIGRATIONS", MIGRATIONS[:1] + [MIGRATIONS[1]._replace(apply=boom)]
+    )
+    with pytest.raises(RuntimeError):
+        run_all_migrations(db_path)
+
+    conn = sqlite3.connect(db_path)
+    try:
+        assert current_version(conn) == 1
+    finally:
+        conn.close()
+
+
+def test_cli_prepares_new_database(tmp_path, capsys):
+    db_path = tmp_path / "cli.db"
+
+    assert main(["--database", str(db_path), "--status"]) == 1
+    assert f"version 0 of {LATEST_VERSION}" in capsys.readouterr().out
+
+    assert main(["--database", str(db_path)]) == 0
+    conn = sqlite3.connect(db_path)
+    try:
+        assert conn.execute("SELECT email FROM users").fetchall() == [(settings.ADMIN_EMAIL,)]
+    finally:
+        conn.close()
+    assert main(["--database", str(db_path), "--status"]) == 0
+    assert f"version {LATEST_VERSION} of {LATEST_VERSION}" in capsys.readouterr().out
@@ -0,0 +1,122 @@
+"""
+Public pages: rendered once, served with validators, cheap auth probe.
+"""
+
+from datetime import timedelta
+
+import pytest
+
+from app.core.pages import page_cache
+from app.core.security import create_access_token
+from tests.conftest import _login
+
+
+@pytest.fixture(autouse=True)
+def fresh_pages():
+    page_cache.clear()
+    yield
+    page_cache.clear()
+
+
+@pytest.mark.parametrize("path", ["/", "/features", "/pricing", "/login", "/register", "/forgot-password"])
+def test_public_pages_render(client, path):
+    response = client.get(path)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/html")
+    assert response.headers["etag"]
+    assert response.headers["last-modified"].endswith("GMT")
+    assert "<html" in response.text
+
+
+def test_rendered_once(client, monkeypatch):
+    calls = []
+    get_template = page_cache.env.get_template
+
+    def counting(name, *args, **kwargs):
+        calls.append(name)
+        return get_template(name, *args, **kwargs)
+
+    monkeypatch.setattr(page_cache.env, "get_template", counting)
+    first = client.get("/features")
+    assert calls[0] == "public/features.html"
+    rendered = len(calls)
+    second = client.get("/features")
+    assert len(calls) == rendered
+    assert first.content == second.content
+
+
+def test_active_page_distinguishes_cache_entries(client):
+    features = client.get("/features")
+    pricing = client.get("/pricing")
+    assert features.headers["etag"] != pricing.headers["etag"]
+
+
+def test_if_none_match_returns_304(client):
+    etag = client.get("/pricing").headers["etag"]
+    response = client.get("/pricing", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+
+
+def test_if_modified_since_returns_304(client):
+    last_modified = client.get("/features").headers["last-modified"]
+    response = client.get("/features", headers={"If-Modified-Since": last_modified})
+    assert response.status_code == 304
+
+    stale = client.get(
+        "/features", headers={"If-Modified-Since": "Mon, 01 Jan 2001 00:00:00 GMT"}
+    )
+    assert stale.status_code == 200
+
+
+def test_pages_with_redirect_vary_on_cookie(client):
+    assert client.get("/").headers["vary"] == "Cookie"
+    assert "vary" not in client.get("/features").headers
+
+
+def test_valid_token_redirects_without_db_lookup(client):
+    # The user does not exist: only the signature is checked here
+    client.cookies.set("access_token", create_access_token({"sub": "999"}))
+    for path in ("/", "/login", "/register"):
+        response = client.get(path, follow_redirects=False)
+        assert response.status_code == 302
+        assert response.headers["location"] == "/dashboard"
+
+
+def test_invalid_or_expired_token_shows_page(client):
+    client.cookies.set("access_token", "not-a-token")
+    assert client.get("/", follow_redirects=False).status_code == 200
+
+    expired = create_access_token({"sub": "1"}, expires_delta=timedelta(minutes=-1))
+    client.cookies.set("access_token", expired)
+    assert client.get("/login", follow_redirects=False).status_code == 200
+
+
+def test_deactivated_user_is_signed_out(client, db_session, user):
+    _login(client, user)
+    user.is_active = False
+    db_session.commit()
+
+    # The probe still trusts the signature...
+    assert client.get("/login", follow_redirects=False).headers["location"] == "/dashboard"
+    # ...but the full check sends the visitor back and drops the token
+    response = client.get("/dashboard", follow_redirects=False)
+    assert response.status_code == 302
+    assert response.headers["location"] == "/login"
+    cookie = response.headers["set-cookie"]
+    assert cookie.startswith('access_token=""') and "Max-Age=0" in cookie
+
+
+def test_signed_out_pages_redirect_to_login(client):
+    for path in ("/dashboard", "/links", "/admin"):
+        response = client.get(path, follow_redirects=False)
+        assert response.status_code == 302
+        assert response.headers["location"] == "/login"
+
+
+def test_api_still_answers_401(client, db_session, user):
+    _login(client, user)
+    db_session.delete(user)
+    db_session.commit()
+    assert client.get("/api/v1/links").status_code == 401
@@ -0,0 +1,124 @@
+"""
+Tests for keyset (cursor) pagination of listings.
+"""
+
+from datetime import datetime, timedelta
+
+from app.core.pagination import decode_cursor, encode_cursor, keyset_order
+from app.models import QRCode, URL
+from app.services.blob_store import blob_digest
+
+
+def _add_links(db_session, user, count, same_time=False):
+    base = datetime(2024, 1, 1)
+    for i in range(count):
+        db_session.add(
+            URL(
+                user_id=user.id,
+                short_code=f"code{i:03d}",
+                original_url=f"https://example.com/{i}",
+                created_at=base if same_time else base + timedelta(minutes=i),
+            )
+        )
+    db_session.commit()
+
+
+def _walk(client, url):
+    codes, cursor = [], None
+    while True:
+        page_url = url + (f"&cursor={cursor}" if cursor else "")
+        response = client.get(page_url)
+        assert response.status_code == 200
+        codes += [l["short_code"] for l in response.json()]
+        cursor = response.headers.get("x-next-cursor")
+        if not cursor:
+            return codes
+
+
+class TestCursor:
+
+    def test_roundtrip(self):
+        keys = keyset_order(URL)
+        values = [datetime(2024, 5, 6, 7, 8, 9, 123), 42]
+        assert decode_cursor(encode_cursor(values), keys) == values
+
+    def test_invalid_cursor(self, auth_client):
+        response = auth_client.get("/api/v1/links?cursor=garbage")
+        assert response.status_code == 400
+
+
+class TestLinksPagination:
+
+    def test_cursor_walks_all_links_newest_first(self, auth_client, db_session, user):
+        _add_links(db_session, user, 7)
+        codes = _walk(auth_client, "/api/v1/links?limit=3")
+        assert codes == [f"code{i:03d}" for i in reversed(range(7))]
+
+    def test_ties_on_created_at_are_broken_by_id(self, auth_client, db_session, user):
+        _add_links(db_session, user, 5, same_time=True)
+        codes = _walk(auth_client, "/api/v1/links?limit=2")
+        assert sorted(codes) == [f"code{i:03d}" for i in range(5)]
+        assert len(set(codes)) == 5
+
+    def test_skip_still_supported(self, auth_client, db_session, user):
+        _add_links(db_session, user, 5)
+        response = auth_client.get("/api/v1/links?skip=3&limit=10")
+        assert [l["short_code"] for l in response.json()] == ["code001", "code000"]
+        assert "x-next-cursor" not in response.headers
+
+    def test_total_header(self, auth_client, db_session, user):
+        _add_links(db_session, user, 4)
+        response = auth_client.get("/api/v1/links?limit=2&with_total=true")
+        assert response.headers["x-total-count"] == "4"
+
+    def test_search_results_paginate(self, auth_client, db_session, user):
+        _add_links(db_session, user, 6)
+        codes = _walk(auth_client, "/api/v1/links?limit=4&search=example")
+        assert sorted(codes) == [f"code{i:03d}" for i in range(6)]
+
+
+class TestAdminPagination:
+
+    def test_users_cursor(self, admin_client, user):
+        first = admin_client.get("/api/v1/admin/users?limit=1")
+        assert len(first.json()) == 1
+        cursor = first.headers["x-next-cursor"]
+        second = admin_client.get(f"/api/v1/admin/users?limit=1&cursor={cursor}")
+        assert len(second.json()) == 1
+        assert second.json()[0]["id"] != first.json()[0]["id"]
+        assert "x-next-cursor" not in second.headers
+
+    def test_links_cursor(self, admin_client, db_session, user):
+        _add_links(db_session, user, 5)
+        codes = _walk(admin_client, "/api/v1/admin/links?limit=2")
+        assert codes == [f"code{i:03d}" for i in reversed(range(5))]
+
+
+class TestQRPagination:
+
+    def test_cursor_and_optional_total(self, auth_client, db_session, user):
+        for i in range(5):
+            db_session.add(
+                QRCode(
+                    user_id=user.id,
+                    content=f"https://example.com/{i}",
+                    image_digest=blob_digest(b""),
+                    created_at=datetime(2024, 1, 1) + timedelta(minutes=i),
+                )
+            )
+        db_session.commit()
+
+        data = auth_client.get("/api/v1/qr?per_page=3").json()
+        assert data["total"] == 5
+        assert data["pages"] == 2
+        assert len(data["items"]) == 3
+
+        data = auth_client.get(
+            f"/api/v1/qr?per_page=3&with_total=false&cursor={data['next_cursor']}"
+        ).json()
+        assert data["total"] is None
+        assert [q["content"] for q in data["items"]] == [
+            "https://example.com/1",
+            "https://example.com/0",
+        ]
+        assert data["next_cursor"] is None
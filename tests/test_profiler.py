@@ -0,0 +1,81 @@
+"""
+Sampling profiler and the admin profile endpoint.
+"""
+
+import threading
+import time
+
+import pytest
+
+from app.core.profiler import ProfilerBusy, SamplingProfiler, profiler
+
+
+def _spin_until(stop: threading.Event):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+@pytest.fixture
+def busy_thread():
+    stop = threading.Event()
+    thread = threading.Thread(target=_spin_until, args=(stop,), name="spinner")
+    thread.start()
+    yield thread
+    stop.set()
+    thread.join()
+
+
+class TestSamplingProfiler:
+    def test_collapsed_stacks_include_hot_function(self, busy_thread):
+        result = SamplingProfiler().profile(0.2, interval=0.005)
+
+        assert result.samples >= 10
+        lines = result.collapsed().splitlines()
+        spinner = [line for line in lines if line.startswith("spinner;")]
+        assert spinner
+        stack, count = spinner[0].rsplit(" ", 1)
+        assert stack.endswith("tests.test_profiler:_spin_until")
+        assert int(count) >= 1
+        # The sampler does not profile itself
+        assert not any("app.core.profiler:_sample" in line for line in lines)
+
+    def test_one_profile_at_a_time(self):
+        sampler = SamplingProfiler()
+        started = threading.Thread(target=sampler.profile, args=(0.3,))
+        started.start()
+        time.sleep(0.05)
+        try:
+            assert sampler.running
+            with pytest.raises(ProfilerBusy):
+                sampler.profile(0.01)
+        finally:
+            started.join()
+        assert not sampler.running
+
+
+class TestProfileEndpoint:
+    def test_admin_gets_collapsed_stacks(self, admin_client):
+        response = admin_client.get("/api/v1/admin/profile?seconds=0.1&interval_ms=5")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert int(response.headers["x-profile-samples"]) >= 5
+        assert "x-profile-pid" in response.headers
+        assert "MainThread;" in response.text
+
+    def test_duration_is_bounded(self, admin_client):
+        response = admin_client.get("/api/v1/admin/profile?seconds=100000")
+        assert response.status_code == 422
+
+    def test_busy_returns_409(self, admin_client):
+        profiler._lock.acquire()
+        try:
+            response = admin_client.get("/api/v1/admin/profile?seconds=0.1")
+        finally:
+            profiler._lock.release()
+        assert response.status_code == 409
+
+    def test_requires_admin(self, client, user):
+        from tests.conftest import _login
+
+        response = _login(client, user).get("/api/v1/admin/profile?seconds=0.1")
+        assert response.status_code == 403
@@ -4,16 +4,43 @@ Gosha Connections Platform
 """
 
 import pytest
+import asyncio
 import base64
+import time
 from io import BytesIO
 from PIL import Image
 
+from app.core.compression import AVAILABLE_ENCODINGS, negotiate_encoding
 from app.models import User, QRCode, URL
+from tests.conftest import TestingSessionLocal, _login
 from app.services.qr_service import (
     generate_qr_image,
     generate_qr_svg,
+    module_count,
+    module_matrix,
+    render_qr_svg,
+    size_bucket,
     validate_logo_base64,
     hex_to_rgb,
+    SquareModuleDrawer,
+    _render_matrix,
+    _render_styled,
+)
+from app.services.counter_buffer import qr_downloads
+from app.services.dynamic_qr_service import is_redirectable, qr_rerenderer
+from app.services.render_cache import RenderCache, qr_render_cache
+from app.services.render_pool import (
+    RenderPool,
+    RenderPoolBusy,
+    RenderSuperseded,
+    qr_render_pool,
+)
+from app.services.blob_store import (
+    LocalBlobStore,
+    LocalS3Client,
+    S3BlobStore,
+    blob_digest,
+    blob_store,
 )
 
 
@@ -63,7 +90,7 @@ def test_qr(db_session, test_user):
         user_id=test_user.id,
         content="https://example.com",
         title="Test QR Code",
-        qr_image_base64=qr_image,
+        image_digest=blob_store.put(base64.b64decode(qr_image)),
         foreground_color="#000000",
         background_color="#FFFFFF",
         style="square",
@@ -99,6 +126,30 @@ class TestQRService:
         assert img.size[0] > 0
         assert img.size[1] > 0
 
+    @pytest.mark.parametrize("box_size,border", [(5, 0), (10, 4), (13, 2)])
+    def test_square_fast_path_matches_styled(self, box_size, border):
+        """NumPy renderer draws the same pixels as SquareModuleDrawer."""
+        import qrcode
+
+        qr = qrcode.QRCode(box_size=box_size, border=border)
+        qr.add_data("https://fast.example.com/path")
+        qr.make(fit=True)
+        fg, bg = (12, 34, 56), (250, 240, 230)
+
+        fast = _render_matrix(qr.get_matrix(), box_size, fg, bg)
+        styled = _render_styled(qr, SquareModuleDrawer, fg, bg)
+
+        assert fast.mode == "P"
+        assert fast.size == styled.size
+        assert fast.convert("RGB").tobytes() == styled.convert("RGB").tobytes()
+
+    def test_square_png_is_palette(self):
+        """Square QR codes are encoded as compact palette PNGs."""
+        qr_data = base64.b64decode(generate_qr_image("https://palette.example.com"))
+        img = Image.open(BytesIO(qr_data))
+        assert img.mode == "P"
+        assert img.convert("RGB").getpixel((0, 0)) == (255, 255, 255)
+
     def test_generate_qr_image_custom_colors(self):
         """Test QR generation with custom colors."""
         qr_base64 = generate_qr_image(
@@ -154,6 +205,47 @@ class TestQRService:
         
         assert "#FF0000" in svg_content or "fill" in svg_content
 
+    def test_svg_path_matches_module_matrix(self):
+        """Merged row runs cover exactly the dark modules."""
+        import re
+        import qrcode
+
+        svg_content = generate_qr_svg("https://svg.example.com/path", border_size=2)
+
+        qr = qrcode.QRCode(border=2)
+        qr.add_data("https://svg.example.com/path")
+        qr.make(fit=True)
+        expected = qr.get_matrix()
+
+        size = len(expected)
+        drawn = [[False] * size for _ in range(size)]
+        runs = re.findall(r"M(\d+) (\d+)h(\d+)v1H\d+z", svg_content)
+        for x, y, width in runs:
+            for dx in range(int(width)):
+                drawn[int(y)][int(x) + dx] = True
+
+        assert drawn == expected
+        # Fewer path commands than dark modules
+        assert len(runs) < sum(map(sum, expected))
+
+    def test_svg_precompressed_variants(self):
+        """gzip variant decompresses to the identity SVG."""
+        import gzip
+
+        plain = render_qr_svg("https://svg.example.com")
+        packed = render_qr_svg("https://svg.example.com", encoding="gzip")
+        assert gzip.decompress(packed) == plain
+        assert len(packed) < len(plain)
+
+    @pytest.mark.parametrize("header,expected", [
+        (None, None),
+        ("gzip, deflate", "gzip"),
+        ("gzip;q=0, identity", None),
+        ("*", AVAILABLE_ENCODINGS[0]),
+    ])
+    def test_negotiate_encoding(self, header, expected):
+        assert negotiate_encoding(header) == expected
+
     def test_hex_to_rgb(self):
         """Test hex to RGB conversion."""
         assert hex_to_rgb("#000000") == (0, 0, 0)
@@ -207,6 +299,414 @@ class TestQRService:
         assert img.format == "PNG"
 
 
+# ============================================
+# Render Cache Tests
+# ============================================
+
+class TestRenderCache:
+    """Tests for the content-addressed QR render cache."""
+
+    def test_identical_parameters_hit_cache(self):
+        """Same parameters are rendered once and shared."""
+        qr_render_cache.clear()
+        first = generate_qr_image("https://cache.example.com", style="dots")
+        second = generate_qr_image("https://cache.example.com", style="dots")
+        other = generate_qr_image("https://cache.example.com", style="rounded")
+
+        assert first == second
+        assert first != other
+        stats = qr_render_cache.stats()
+        assert stats["memory_hits"] == 1
+        assert stats["misses"] == 2
+
+    def test_svg_is_cached_separately(self):
+        """SVG and PNG renders use different keys."""
+        qr_render_cache.clear()
+        generate_qr_image("https://cache.example.com")
+        svg = generate_qr_svg("https://cache.example.com")
+        assert svg == generate_qr_svg("https://cache.example.com")
+        # PNG, SVG and the module matrix they share
+        assert qr_render_cache.stats()["misses"] == 3
+
+    def test_evicts_by_byte_size(self):
+        """Memory tier is bounded by total bytes, least recently used first."""
+        cache = RenderCache(max_bytes=10)
+        cache.put("a", b"12345")
+        cache.put("b", b"12345")
+        cache.get("a")
+        cache.put("c", b"12345")
+
+        assert cache.get("a") == b"12345"
+        assert cache.get("b") is None
+        assert cache.stats()["memory_bytes"] == 10
+
+    def test_spills_to_disk(self, tmp_path):
+        """Evicted entries are served from disk and promoted back."""
+        cache = RenderCache(max_bytes=5, disk_dir=tmp_path, disk_max_bytes=100)
+        cache.put("aa11", b"first")
+        cache.put("bb22", b"other")
+
+        assert (tmp_path / "aa" / "aa11").read_bytes() == b"first"
+        assert cache.get("aa11") == b"first"
+        stats = cache.stats()
+        assert stats["disk_hits"] == 1
+        assert stats["hit_rate"] == 1.0
+
+        # A fresh cache finds earlier spills on disk
+        assert RenderCache(5, tmp_path, 100).get("aa11") == b"first"
+
+    def test_disk_io_outside_lock(self, tmp_path, monkeypatch):
+        cache = RenderCache(max_bytes=5, disk_dir=tmp_path, disk_max_bytes=100)
+        locked = []
+        read, write = cache._read, cache._write
+
+        def checked_read(key):
+            locked.append(cache._lock.locked())
+            return read(key)
+
+        def checked_write(key, data):
+            locked.append(cache._lock.locked())
+            return write(key, data)
+
+        monkeypatch.setattr(cache, "_read", checked_read)
+        monkeypatch.setattr(cache, "_write", checked_write)
+        cache.put("aa11", b"first")
+        cache.put("bb22", b"other")
+        assert cache.get("aa11") == b"first"
+        assert locked == [False, False, False]
+
+    def test_disk_shared_between_processes(self, tmp_path):
+        # Another process's unfinished write under the same key
+        (tmp_path / "aa").mkdir()
+        (tmp_path / "aa" / "aa11.tmp").write_bytes(b"partial")
+
+        cache = RenderCache(max_bytes=5, disk_dir=tmp_path, disk_max_bytes=100)
+        cache.put("aa11", b"first")
+        cache.put("bb22", b"other")
+        assert (tmp_path / "aa" / "aa11").read_bytes() == b"first"
+        assert (tmp_path / "aa" / "aa11.tmp").read_bytes() == b"partial"
+        fresh = RenderCache(5, tmp_path, 100)
+        fresh.get("zz")
+        assert fresh.stats()["disk_entries"] == 1
+
+
+# ============================================
+# Render Pool Tests
+# ============================================
+
+def _slow_render(value, delay=0.2):
+    time.sleep(delay)
+    return value.encode()
+
+
+class TestRenderPool:
+    """Tests for the off-loop QR render executor."""
+
+    def _pool(self, **kwargs):
+        return RenderPool(cache=RenderCache(max_bytes=1024), executor="thread", **kwargs)
+
+    def test_identical_renders_are_coalesced(self):
+        """Concurrent requests for one key share a single render."""
+        pool = self._pool(workers=2)
+        calls = []
+
+        def render(value):
+            calls.append(value)
+            return _slow_render(value)
+
+        async def run():
+            return await asyncio.gather(
+                pool.submit("k", render, "a"),
+                pool.submit("k", render, "a"),
+            )
+
+        assert asyncio.run(run()) == [b"a", b"a"]
+        assert calls == ["a"]
+        assert pool.pending == 0
+        # Result is cached for later requests
+        assert asyncio.run(pool.submit("k", render, "a")) == b"a"
+        assert calls == ["a"]
+        pool.shutdown()
+
+    def test_queue_limit(self):
+        """Distinct renders beyond max_pending are rejected."""
+        pool = self._pool(workers=1, max_pending=1)
+
+        async def run():
+            first = asyncio.ensure_future(pool.submit("a", _slow_render, "a"))
+            await asyncio.sleep(0)
+            with pytest.raises(RenderPoolBusy):
+                await pool.submit("b", _slow_render, "b")
+            return await first
+
+        assert asyncio.run(run()) == b"a"
+        pool.shutdown()
+
+    def test_new_preview_supersedes_previous(self):
+        """A user's newer preview cancels the older one."""
+        pool = self._pool(workers=1)
+
+        async def run():
+            old = asyncio.ensure_future(
+                pool.submit("old", _slow_render, "old", preview_for=1)
+            )
+            await asyncio.sleep(0)
+            other_user = asyncio.ensure_future(
+                pool.submit("other", _slow_render, "other", preview_for=2)
+            )
+            new = await pool.submit("new", _slow_render, "new", preview_for=1)
+            with pytest.raises(RenderSuperseded):
+                await old
+            return new, await other_user
+
+        assert asyncio.run(run()) == (b"new", b"other")
+        pool.shutdown()
+
+    def test_identical_consecutive_previews_share_render(self):
+        """Repeating the same preview joins the running render instead of failing."""
+        pool = self._pool(workers=1)
+        calls = []
+
+        def render(value):
+            calls.append(value)
+            return _slow_render(value)
+
+        async def run():
+            first = asyncio.ensure_future(pool.submit("same", render, "same", preview_for=1))
+            await asyncio.sleep(0.05)
+            second = await pool.submit("same", render, "same", preview_for=1)
+            return await first, second
+
+        assert asyncio.run(run()) == (b"same", b"same")
+        assert calls == ["same"]
+        pool.shutdown()
+
+    def test_cancelled_job_is_not_reused(self):
+        """A job cancelled before its cleanup ran is replaced by a fresh render."""
+        pool = self._pool(workers=1)
+
+        async def run():
+            first = asyncio.ensure_future(pool.submit("k", _slow_render, "k", 0.05))
+            await asyncio.sleep(0)
+            pool._jobs["k"].future.cancel()
+            # No yield in between: the cancelled job is still registered
+            result = await pool.submit("k", _slow_render, "k", 0.05)
+            with pytest.raises(asyncio.CancelledError):
+                await first
+            return result
+
+        assert asyncio.run(run()) == b"k"
+        pool.shutdown()
+
+    def test_cache_disk_tier_runs_off_the_event_loop(self, tmp_path, monkeypatch):
+        """Disk reads and spills go through a thread; memory hits stay inline."""
+        import threading
+
+        cache = RenderCache(max_bytes=0, disk_dir=tmp_path, disk_max_bytes=100)
+        pool = RenderPool(cache=cache, executor="thread", workers=1)
+        threads = []
+        read, write = cache._read, cache._write
+
+        def tracked_read(key):
+            threads.append(threading.current_thread())
+            return read(key)
+
+        def tracked_write(key, data):
+            threads.append(threading.current_thread())
+            return write(key, data)
+
+        monkeypatch.setattr(cache, "_read", tracked_read)
+        monkeypatch.setattr(cache, "_write", tracked_write)
+
+        async def run():
+            first = await pool.submit("aa11", _slow_render, "a", 0)
+            while pool._spills:
+                await asyncio.sleep(0.01)
+            cached = await pool.submit("aa11", _slow_render, "x", 0)
+            return first, cached
+
+        assert asyncio.run(run()) == (b"a", b"a")
+        assert cache.stats()["disk_hits"] == 1
+        assert len(threads) >= 2
+        assert threading.main_thread() not in threads
+        pool.shutdown()
+
+    def test_batch_fits_queue_on_many_cores(self, monkeypatch):
+        """A batch never fills the queue, even when workers * 2 exceeds it."""
+        from app.services import qr_service
+
+        pool = self._pool(workers=64, max_pending=32)
+        monkeypatch.setattr(qr_service, "qr_render_pool", pool)
+        assert qr_service.batch_concurrency() == 16
+
+        jobs = [{"content": f"https://many.example.com/{i}"} for i in range(40)]
+        pngs = asyncio.run(qr_service.render_qr_png_many(jobs))
+        assert len(pngs) == 40
+        assert all(png.startswith(b"\x89PNG") for png in pngs)
+        pool.shutdown()
+
+    def test_preview_endpoint_renders_in_pool(self, auth_client):
+        """Preview API returns a PNG rendered by the process pool."""
+        response = auth_client.post(
+            "/api/v1/qr/preview",
+            json={"content": "https://pool.example.com", "style": "dots"},
+        )
+        assert response.status_code == 200
+        img = Image.open(BytesIO(base64.b64decode(response.json()["qr_image_base64"])))
+        assert img.format == "PNG"
+
+    def test_busy_pool_returns_429(self, auth_client, monkeypatch):
+        """Overload is reported with 429 and Retry-After."""
+        monkeypatch.setattr(qr_render_pool, "max_pending", 0)
+        response = auth_client.post(
+            "/api/v1/qr/preview", json={"content": "https://busy.example.com"}
+        )
+        assert response.status_code == 429
+        assert response.headers["retry-after"] == "1"
+
+
+# ============================================
+# Blob Store Tests
+# ============================================
+
+class TestBlobStore:
+    """Tests for content-addressed image storage."""
+
+    def test_local_store_shards_by_digest(self, tmp_path):
+        store = LocalBlobStore(tmp_path)
+        digest = store.put(b"png-bytes")
+
+        assert digest == blob_digest(b"png-bytes")
+        assert (tmp_path / digest[:2] / digest[2:4] / digest).exists()
+        assert store.get(digest) == b"png-bytes"
+        assert store.put(b"png-bytes") == digest
+
+        store.delete(digest)
+        assert store.get(digest) is None
+
+    def test_local_store_temp_names_are_unique(self, tmp_path, monkeypatch):
+        """Concurrent puts of one blob in a process never share a temp file."""
+        import os
+
+        store = LocalBlobStore(tmp_path)
+        temps = []
+        replace = os.replace
+
+        def tracked_replace(src, dst):
+            temps.append(str(src))
+            replace(src, dst)
+
+        monkeypatch.setattr(os, "replace", tracked_replace)
+        digest = store.put(b"png-bytes")
+        store.delete(digest)
+        store.put(b"png-bytes")
+
+        assert len(set(temps)) == 2
+        assert not list(tmp_path.glob("*/*/*.tmp"))
+
+    def test_s3_store_with_local_client(self, tmp_path):
+        store = S3BlobStore(LocalS3Client(tmp_path), "bucket", "blobs")
+        digest = store.put(b"data")
+
+        assert (tmp_path / "bucket" / "blobs" / digest[:2] / digest[2:4] / digest).exists()
+        assert store.get(digest) == b"data"
+        store.delete(digest)
+        assert store.get(digest) is None
+
+    @pytest.mark.parametrize("backend", ["local", "s3-local"])
+    def test_age_is_refreshed_by_put(self, tmp_path, backend):
+        import os
+
+        if backend == "local":
+            store = LocalBlobStore(tmp_path)
+        else:
+            store = S3BlobStore(LocalS3Client(tmp_path), "bucket", "blobs")
+        assert store.age("0" * 64) is None
+
+        digest = store.put(b"data")
+        path = next(p for p in tmp_path.rglob(digest))
+        os.utime(path, (time.time() - 3600, time.time() - 3600))
+        assert store.age(digest) >= 3600
+
+        # Storing the same blob again makes it young, so GC leaves it alone
+        store.put(b"data")
+        assert store.age(digest) < 60
+
+    def test_unused_blobs_have_grace_period(self, db_session, test_qr, tmp_path, monkeypatch):
+        """A blob a concurrent request just stored is not collected."""
+        import os
+        from app.services import dynamic_qr_service
+
+        store = LocalBlobStore(tmp_path)
+        monkeypatch.setattr(dynamic_qr_service, "blob_store", store)
+        fresh = store.put(b"fresh")
+        old = store.put(b"old")
+        used = store.put(blob_store.get(test_qr.image_digest))
+        for digest in (old, used):
+            path = store._path(digest)
+            os.utime(path, (time.time() - 3600, time.time() - 3600))
+
+        dynamic_qr_service.delete_unused_blobs(db_session, [fresh, old, used])
+
+        assert store.get(fresh) == b"fresh"
+        assert store.get(old) is None
+        assert store.get(used) is not None
+
+    def test_model_keeps_only_digest(self, db_session, test_qr):
+        png = blob_store.get(test_qr.image_digest)
+        assert Image.open(BytesIO(png)).format == "PNG"
+        assert test_qr.image_digest == blob_digest(png)
+        # Blob I/O is done by the services; the model has plain columns
+        assert not hasattr(QRCode, "qr_image_base64")
+
+    def test_base64_helpers(self, tmp_path):
+        store = LocalBlobStore(str(tmp_path))
+        digest = store.put_base64("data:image/png;base64," + base64.b64encode(b"png").decode())
+        assert store.get(digest) == b"png"
+        assert store.get_base64(digest) == base64.b64encode(b"png").decode()
+        assert store.put_base64("") is None
+        assert store.get_base64(None) is None
+        assert store.get_base64("0" * 64) is None
+
+    def test_blob_store_is_abstract(self):
+        from app.services.blob_store import BlobStore
+
+        with pytest.raises(TypeError):
+            BlobStore()
+
+    def test_legacy_inline_images_are_moved(self, tmp_path):
+        """Migration moves base64 columns into the blob store."""
+        import sqlite3
+        from app.migrations import run_qr_migration
+
+        png = base64.b64decode(generate_qr_image("https://legacy.example.com"))
+        conn = sqlite3.connect(tmp_path / "legacy.db")
+        conn.execute("""
+            CREATE TABLE qr_codes (
+                id INTEGER PRIMARY KEY, user_id INTEGER, url_id INTEGER,
+                content VARCHAR(2000), title VARCHAR(200),
+                qr_image_base64 TEXT NOT NULL, foreground_color VARCHAR(7),
+                background_color VARCHAR(7), style VARCHAR(20),
+                box_size INTEGER, border_size INTEGER, logo_base64 TEXT,
+                error_correction VARCHAR(1), downloads_count INTEGER,
+                created_at DATETIME, updated_at DATETIME, qr_data VARCHAR(2000)
+            )
+        """)
+        conn.execute(
+            "INSERT INTO qr_codes (id, user_id, content, qr_image_base64) VALUES (1, 1, ?, ?)",
+            ("https://legacy.example.com", base64.b64encode(png).decode()),
+        )
+        conn.commit()
+
+        run_qr_migration(conn)
+
+        columns = [c[1] for c in conn.execute("PRAGMA table_info(qr_codes)")]
+        assert "qr_image_base64" not in columns
+        digest = conn.execute("SELECT image_digest FROM qr_codes").fetchone()[0]
+        conn.close()
+        assert blob_store.get(digest) == png
+
+
 # ============================================
 # API Tests
 # ============================================
@@ -261,7 +761,7 @@ class TestQRCodeModel:
             user_id=test_user.id,
             content="https://example.com",
             title="Test QR",
-            qr_image_base64=qr_image,
+            image_digest=blob_store.put(base64.b64decode(qr_image)),
         )
         
         db_session.add(qr)
@@ -288,7 +788,7 @@ class TestQRCodeModel:
             url_id=test_url.id,
             content=f"http://testserver/{test_url.short_code}",
             title="Linked QR",
-            qr_image_base64=qr_image,
+            image_digest=blob_store.put(base64.b64decode(qr_image)),
         )
         
         db_session.add(qr)
@@ -308,7 +808,7 @@ class TestQRCodeModel:
         qr = QRCode(
             user_id=test_user.id,
             content="https://example.com",
-            qr_image_base64=qr_image,
+            image_digest=blob_store.put(base64.b64decode(qr_image)),
         )
         
         db_session.add(qr)
@@ -412,3 +912,493 @@ class TestQRCodeSchemas:
         assert request.content == "https://example.com"
         assert request.style == "rounded"
         assert request.box_size == 10  # Default
+
+
+class TestQRListImages:
+    """List responses link to images instead of embedding them."""
+
+    def test_list_returns_image_urls(self, client, db_session, test_user, test_qr):
+        from app.core.security import create_access_token
+
+        client.cookies.set(
+            "access_token", create_access_token({"sub": str(test_user.id)})
+        )
+        item = client.get("/api/v1/qr").json()["items"][0]
+        assert item["qr_image_base64"] is None
+        assert item["image_url"].endswith(f"/images/{test_qr.image_digest}.png")
+
+        image = client.get(item["image_url"])
+        assert image.status_code == 200
+        assert image.headers["content-type"] == "image/png"
+        assert image.content == blob_store.get(test_qr.image_digest)
+
+        detail = client.get(f"/api/v1/qr/{test_qr.id}").json()
+        assert detail["qr_image_base64"] == blob_store.get_base64(test_qr.image_digest)
+
+
+class TestQRDownloadCaching:
+    """Conditional GET and buffered download counting."""
+
+    @pytest.fixture
+    def downloads(self, monkeypatch):
+        from tests.conftest import TestingSessionLocal
+
+        monkeypatch.setattr(qr_downloads, "session_factory", TestingSessionLocal)
+        qr_downloads.flush()
+        yield qr_downloads
+        # Don't leave increments for the app's shutdown flush
+        qr_downloads.flush()
+
+    @pytest.mark.parametrize("fmt", ["png", "svg"])
+    def test_download_revalidates_with_etag(
+        self, client, db_session, test_user, test_qr, downloads, fmt
+    ):
+        _login(client, test_user)
+        url = f"/api/v1/qr/{test_qr.id}/download/{fmt}"
+
+        first = client.get(url)
+        assert first.status_code == 200
+        etag = first.headers["etag"]
+        assert etag.startswith('"')
+        assert first.headers["cache-control"] == "private, no-cache"
+        assert client.get(url).headers["etag"] == etag
+
+        cached = client.get(url, headers={"If-None-Match": f"W/{etag}"})
+        assert cached.status_code == 304
+        assert cached.content == b""
+
+        # Two full downloads counted, the 304 is not; nothing written yet
+        assert downloads.pending(test_qr.id) == 2
+        assert client.get(f"/api/v1/qr/{test_qr.id}").json()["downloads_count"] == 2
+        db_session.refresh(test_qr)
+        assert test_qr.downloads_count == 0
+
+        assert downloads.flush() == 1
+        db_session.refresh(test_qr)
+        assert test_qr.downloads_count == 2
+        assert downloads.pending(test_qr.id) == 0
+
+    def test_periodic_flush_runs_off_the_event_loop(self, monkeypatch, downloads):
+        import threading
+
+        threads = []
+        monkeypatch.setattr(downloads, "flush_interval", 0)
+        monkeypatch.setattr(
+            downloads, "flush", lambda: threads.append(threading.current_thread())
+        )
+
+        async def tick():
+            downloads.start()
+            while not threads:
+                await asyncio.sleep(0.01)
+            await downloads.stop()
+
+        asyncio.run(tick())
+        assert threads[0] is not threading.main_thread()
+
+    def test_svg_download_is_precompressed(self, client, test_user, test_qr, downloads):
+        _login(client, test_user)
+        url = f"/api/v1/qr/{test_qr.id}/download/svg"
+
+        plain = client.get(url, headers={"Accept-Encoding": "identity"})
+        packed = client.get(url, headers={"Accept-Encoding": "gzip"})
+
+        assert "content-encoding" not in plain.headers
+        assert packed.headers["content-encoding"] == "gzip"
+        assert packed.headers["vary"] == "Accept-Encoding"
+        assert packed.headers["etag"] != plain.headers["etag"]
+        assert packed.content == plain.content
+
+    def test_png_etag_is_image_digest(self, client, test_user, test_qr, downloads):
+        _login(client, test_user)
+        response = client.get(f"/api/v1/qr/{test_qr.id}/download/png")
+        assert response.headers["etag"] == f'"{test_qr.image_digest}"'
+
+    def test_content_addressed_image_is_immutable(self, client, test_user, test_qr):
+        _login(client, test_user)
+        url = f"/api/v1/qr/images/{test_qr.image_digest}.png"
+
+        response = client.get(url)
+        assert "immutable" in response.headers["cache-control"]
+
+        cached = client.get(url, headers={"If-None-Match": response.headers["etag"]})
+        assert cached.status_code == 304
+
+
+class TestQRBatchAndExport:
+    """Batch creation and streamed ZIP export."""
+
+    def test_batch_creates_codes_for_links_and_contents(
+        self, client, db_session, test_user, test_url
+    ):
+        _login(client, test_user)
+        response = client.post("/api/v1/qr/batch", json={
+            "url_ids": [test_url.id],
+            "contents": ["https://one.example.com", "https://two.example.com"],
+            "style": "dots",
+            "foreground_color": "#112233",
+        })
+        assert response.status_code == 201
+        items = response.json()["items"]
+
+        assert items[0]["content"] == f"http://localhost:8000/{test_url.short_code}"
+        assert items[0]["linked_short_code"] == test_url.short_code
+        # http(s) contents get their own short links
+        assert [item["destination"] for item in items] == [
+            test_url.original_url,
+            "https://one.example.com",
+            "https://two.example.com",
+        ]
+        assert [item["content"] for item in items[1:]] == [
+            f"http://localhost:8000/{item['linked_short_code']}" for item in items[1:]
+        ]
+        assert {item["style"] for item in items} == {"dots"}
+        assert {item["foreground_color"] for item in items} == {"#112233"}
+        assert db_session.query(QRCode).filter_by(user_id=test_user.id).count() == 3
+
+    def test_batch_rejects_foreign_links_atomically(self, client, db_session, test_user):
+        _login(client, test_user)
+        response = client.post("/api/v1/qr/batch", json={
+            "url_ids": [999],
+            "contents": ["https://one.example.com"],
+        })
+        assert response.status_code == 404
+        assert db_session.query(QRCode).count() == 0
+
+    def test_batch_respects_quota(self, client, test_user):
+        _login(client, test_user)
+        response = client.post("/api/v1/qr/batch", json={
+            "contents": [f"https://example.com/{i}" for i in range(50)],
+        })
+        assert response.status_code == 201
+        response = client.post("/api/v1/qr/batch", json={"contents": ["https://x.com"]})
+        assert response.status_code == 403
+
+    def test_export_zip(self, client, test_user, test_qr):
+        import zipfile
+
+        _login(client, test_user)
+        client.post("/api/v1/qr/batch", json={"contents": ["https://zip.example.com"]})
+
+        response = client.get("/api/v1/qr/export.zip", params={"format": "all"})
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/zip"
+
+        archive = zipfile.ZipFile(BytesIO(response.content))
+        names = archive.namelist()
+        assert len(names) == 4
+        assert f"qr_{test_qr.id}.png" in names
+        assert archive.read(f"qr_{test_qr.id}.png") == blob_store.get(test_qr.image_digest)
+        assert archive.read(f"qr_{test_qr.id}.svg").startswith(b"<?xml")
+
+        only = client.get(
+            "/api/v1/qr/export.zip", params={"ids": [test_qr.id], "format": "svg"}
+        )
+        assert zipfile.ZipFile(BytesIO(only.content)).namelist() == [f"qr_{test_qr.id}.svg"]
+
+    def test_stream_zip_yields_per_member(self):
+        import zipfile
+        from app.core.zipstream import stream_zip
+
+        chunks = list(stream_zip(
+            (f"f{i}.txt", lambda i=i: str(i).encode() * 100, True) for i in range(3)
+        ))
+        assert len(chunks) == 4  # one per member + central directory
+        archive = zipfile.ZipFile(BytesIO(b"".join(chunks)))
+        assert archive.read("f2.txt") == b"2" * 100
+
+
+class TestQRSizes:
+    """Size buckets rendered from the module matrix."""
+
+    def test_size_buckets(self):
+        assert size_bucket(10) == 128
+        assert size_bucket(256) == 256
+        assert size_bucket(300) == 512
+        assert size_bucket(10_000) == 2048
+
+    def test_module_matrix_is_cached(self):
+        import qrcode
+
+        qr_render_cache.clear()
+        matrix = module_matrix("https://matrix.example.com", "Q")
+        assert module_matrix("https://matrix.example.com", "Q").tolist() == matrix.tolist()
+        assert qr_render_cache.stats()["memory_hits"] == 1
+
+        qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_Q, border=0)
+        qr.add_data("https://matrix.example.com")
+        qr.make(fit=True)
+        assert matrix.astype(bool).tolist() == qr.get_matrix()
+        assert module_count("https://matrix.example.com", "Q", 4) == len(matrix) + 8
+
+    def test_sized_png(self, client, test_user, test_qr):
+        _login(client, test_user)
+        item = client.get("/api/v1/qr").json()["items"][0]
+        assert item["thumbnail_url"] == f"/api/v1/qr/{test_qr.id}.png?size=256"
+
+        thumb = client.get(item["thumbnail_url"])
+        assert thumb.status_code == 200
+        img = Image.open(BytesIO(thumb.content))
+        modules = module_count(test_qr.content, "M", test_qr.border_size)
+        # Whole pixels per module, as large as fits into the bucket
+        assert img.size[0] == modules * (256 // modules)
+
+        large = Image.open(BytesIO(client.get(f"/api/v1/qr/{test_qr.id}.png?size=1000").content))
+        assert 512 < large.size[0] <= 1024
+
+        cached = client.get(
+            item["thumbnail_url"], headers={"If-None-Match": thumb.headers["etag"]}
+        )
+        assert cached.status_code == 304
+
+        original = client.get(f"/api/v1/qr/{test_qr.id}.png")
+        assert original.content == blob_store.get(test_qr.image_digest)
+        assert client.get(f"/api/v1/qr/{test_qr.id}.png?size=8").status_code == 422
+
+    def test_sized_png_revalidates_without_loading_logo(self, client, test_user, monkeypatch):
+        from app.services import qr_service
+
+        _login(client, test_user)
+        body = client.post(
+            "/api/v1/qr", json={"content": "Logo text", "logo_base64": _logo_b64()}
+        ).json()
+        url = f"/api/v1/qr/{body['id']}.png?size=256"
+        etag = client.get(url).headers["etag"]
+
+        def unexpected(*args, **kwargs):
+            raise AssertionError("not needed for a 304")
+
+        monkeypatch.setattr(blob_store, "get", unexpected)
+        monkeypatch.setattr(qr_service, "module_count", unexpected)
+        assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+
+        # A redesign changes the tag
+        monkeypatch.undo()
+        client.patch(f"/api/v1/qr/{body['id']}", json={"design": {"style": "dots"}})
+        assert client.get(url, headers={"If-None-Match": etag}).status_code == 200
+
+    def test_prerender_tasks_are_referenced(self, monkeypatch):
+        from app.services import qr_service
+
+        async def main():
+            qr_service.prerender_sizes(
+                dict(content="https://keep.example.com", foreground_color="#000000",
+                     background_color="#FFFFFF", style="square", box_size=10,
+                     border_size=4, error_correction="M"),
+                sizes=(128,),
+            )
+            tasks = set(qr_service._prerender_tasks)
+            assert len(tasks) == 1
+            await asyncio.gather(*tasks)
+            assert not qr_service._prerender_tasks
+
+        asyncio.run(main())
+
+    def test_box_size_is_at_least_one(self):
+        from app.services.qr_service import box_size_for
+
+        assert box_size_for(256, 29) == 8
+        # More modules than pixels: wider than the bucket, never 0
+        assert box_size_for(128, 185) == 1
+
+
+def _logo_b64(color="red", size=(120, 80), fmt="PNG"):
+    buffer = BytesIO()
+    Image.new("RGB", size, color=color).save(buffer, format=fmt)
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+class TestLogoLibrary:
+    """Logos are decoded once and reused as cached tiles."""
+
+    def test_upload_is_normalized_and_deduplicated(self, client, test_user):
+        _login(client, test_user)
+        logo = _logo_b64(fmt="JPEG")
+
+        first = client.post("/api/v1/qr/logos", json={"logo_base64": logo})
+        assert first.status_code == 201
+        body = first.json()
+        assert (body["width"], body["height"]) == (120, 80)
+
+        again = client.post("/api/v1/qr/logos", json={"logo_base64": f"data:image/jpeg;base64,{logo}"})
+        assert again.json()["id"] == body["id"]
+        assert [item["id"] for item in client.get("/api/v1/qr/logos").json()] == [body["id"]]
+
+        image = client.get(body["url"])
+        assert Image.open(BytesIO(image.content)).mode == "RGBA"
+        assert "immutable" in image.headers["cache-control"]
+
+        bad = client.post("/api/v1/qr/logos", json={"logo_base64": base64.b64encode(b"nope").decode()})
+        assert bad.status_code == 400
+
+    def test_qr_codes_use_library_logo(self, client, db_session, test_user):
+        _login(client, test_user)
+        logo = client.post("/api/v1/qr/logos", json={"logo_base64": _logo_b64()}).json()
+
+        created = client.post("/api/v1/qr", json={
+            "content": "https://logo.example.com", "logo_id": logo["id"],
+        })
+        assert created.status_code == 201
+        assert created.json()["error_correction"] == "M"
+        qr = db_session.get(QRCode, created.json()["id"])
+        assert qr.logo_digest == logo["digest"]
+
+        preview = client.post("/api/v1/qr/preview", json={"logo_id": logo["id"]})
+        assert preview.status_code == 200
+        assert client.post("/api/v1/qr/preview", json={"logo_id": 999}).status_code == 404
+
+        # Library entry goes away, the blob stays while a QR code uses it
+        assert client.delete(f"/api/v1/qr/logos/{logo['id']}").status_code == 204
+        assert client.get("/api/v1/qr/logos").json() == []
+        assert blob_store.get(logo["digest"]) is not None
+
+    def test_logo_tile_is_cached(self):
+        qr_render_cache.clear()
+        logo = _logo_b64(color="blue")
+        generate_qr_image("https://tile.example.com/a", logo_base64=logo)
+        misses = qr_render_cache.stats()["misses"]
+
+        # Different content, same QR size: only the PNG and matrix miss
+        generate_qr_image("https://tile.example.com/b", logo_base64=logo)
+        stats = qr_render_cache.stats()
+        assert stats["misses"] == misses + 2
+        assert stats["memory_hits"] == 1
+
+    def test_logo_validation_is_memoized(self, monkeypatch):
+        from app.services import qr_service
+
+        logo = _logo_b64(color="green")
+        assert validate_logo_base64(logo)
+
+        def fail(*args):
+            raise AssertionError("decoded twice")
+
+        monkeypatch.setattr(qr_service, "decode_logo", fail)
+        assert validate_logo_base64(logo)
+
+
+class TestDynamicQR:
+    """QR codes for http(s) content encode their own short link."""
+
+    @pytest.fixture
+    def rerenderer(self, monkeypatch):
+        monkeypatch.setattr(qr_rerenderer, "session_factory", TestingSessionLocal)
+        return qr_rerenderer
+
+    def test_is_redirectable(self):
+        assert is_redirectable("https://example.com/page")
+        assert not is_redirectable("Just some text")
+        assert not is_redirectable("mailto:test@example.com")
+
+    def test_create_links_url_content(self, client, db_session, test_user):
+        _login(client, test_user)
+        body = client.post("/api/v1/qr", json={"content": "https://dest.example.com"}).json()
+
+        url = db_session.query(URL).filter_by(id=body["url_id"]).one()
+        assert url.original_url == "https://dest.example.com"
+        assert body["content"] == f"http://localhost:8000/{url.short_code}"
+        assert body["destination"] == "https://dest.example.com"
+
+        text = client.post("/api/v1/qr", json={"content": "Just some text"}).json()
+        assert text["url_id"] is None
+        assert text["content"] == "Just some text"
+
+    def test_destination_change_keeps_image(self, client, test_user):
+        _login(client, test_user)
+        body = client.post("/api/v1/qr", json={"content": "https://old.example.com"}).json()
+
+        response = client.patch(
+            f"/api/v1/qr/{body['id']}", json={"destination": "https://new.example.com"}
+        )
+        assert response.status_code == 200
+        assert response.json()["destination"] == "https://new.example.com"
+        assert response.json()["image_url"] == body["image_url"]
+
+        # Scans go through the redirect and count as clicks
+        scan = client.get(f"/{body['linked_short_code']}", follow_redirects=False)
+        assert scan.status_code == 302
+        assert scan.headers["location"] == "https://new.example.com"
+        assert client.get(f"/api/v1/qr/{body['id']}").json()["linked_clicks"] == 1
+
+    def test_static_qr_destination_is_rejected(self, client, test_user):
+        _login(client, test_user)
+        body = client.post("/api/v1/qr", json={"content": "Just some text"}).json()
+        response = client.patch(
+            f"/api/v1/qr/{body['id']}", json={"destination": "https://new.example.com"}
+        )
+        assert response.status_code == 400
+
+    def test_user_link_destination_is_rejected(self, client, db_session, test_user, test_url):
+        _login(client, test_user)
+        original = test_url.original_url
+        body = client.post(
+            "/api/v1/qr", json={"content": "ignored", "url_id": test_url.id}
+        ).json()
+
+        response = client.patch(
+            f"/api/v1/qr/{body['id']}", json={"destination": "https://new.example.com"}
+        )
+        assert response.status_code == 400
+        assert f"/api/v1/links/{test_url.id}" in response.json()["detail"]
+        db_session.refresh(test_url)
+        assert test_url.original_url == original
+
+    def test_delete_removes_own_short_link(self, client, db_session, test_user):
+        _login(client, test_user)
+        body = client.post("/api/v1/qr", json={"content": "https://gone.example.com"}).json()
+        client.get(f"/{body['linked_short_code']}", follow_redirects=False)
+
+        assert client.delete(f"/api/v1/qr/{body['id']}").status_code == 204
+        assert db_session.query(URL).filter_by(id=body["url_id"]).count() == 0
+        assert client.get(f"/{body['linked_short_code']}", follow_redirects=False).status_code == 404
+
+    def test_delete_keeps_user_links(self, client, db_session, test_user, test_url):
+        _login(client, test_user)
+        single = client.post(
+            "/api/v1/qr", json={"content": "ignored", "url_id": test_url.id}
+        ).json()
+        batch = client.post("/api/v1/qr/batch", json={
+            "url_ids": [test_url.id], "contents": ["https://batch.example.com"],
+        }).json()["items"]
+
+        for qr_id in (single["id"], batch[0]["id"]):
+            assert client.delete(f"/api/v1/qr/{qr_id}").status_code == 204
+        assert db_session.query(URL).filter_by(id=test_url.id).count() == 1
+
+        # The batch's own link goes with its QR code
+        assert client.delete(f"/api/v1/qr/{batch[1]['id']}").status_code == 204
+        assert db_session.query(URL).filter_by(id=batch[1]["url_id"]).count() == 0
+
+    def test_redesign_rerenders_in_background(self, client, test_user, rerenderer):
+        _login(client, test_user)
+        body = client.post("/api/v1/qr", json={"content": "https://design.example.com"}).json()
+
+        response = client.patch(
+            f"/api/v1/qr/{body['id']}", json={"design": {"foreground_color": "#ff0000"}}
+        )
+        assert response.status_code == 200
+        assert response.json()["foreground_color"] == "#FF0000"
+        # Untouched fields keep their values
+        assert response.json()["style"] == body["style"]
+
+        updated = client.get(f"/api/v1/qr/{body['id']}").json()
+        assert updated["image_url"] != body["image_url"]
+        img = Image.open(BytesIO(client.get(updated["image_url"]).content)).convert("RGB")
+        assert (255, 0, 0) in {color for _, color in img.getcolors()}
+        # The encoded short link did not change
+        assert updated["content"] == body["content"]
+        assert client.get(body["image_url"]).status_code == 404
+
+    def test_redesign_with_library_logo(self, client, test_user, rerenderer):
+        _login(client, test_user)
+        logo = client.post("/api/v1/qr/logos", json={"logo_base64": _logo_b64()}).json()
+        body = client.post("/api/v1/qr", json={"content": "https://logo.example.com"}).json()
+
+        response = client.patch(
+            f"/api/v1/qr/{body['id']}", json={"design": {"logo_id": logo["id"]}}
+        )
+        assert response.status_code == 200
+        assert response.json()["logo_base64"] is not None
+
+        missing = client.patch(f"/api/v1/qr/{body['id']}", json={"design": {"logo_id": 999}})
+        assert missing.status_code == 404
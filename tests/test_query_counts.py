@@ -0,0 +1,104 @@
+"""
+SQL statement budgets per endpoint.
+
+Each listing is seeded with several rows, so any per-row (N+1) lazy
+load pushes the count over budget. Relationships are declared with
+lazy="raise_on_sql", which turns an unplanned lazy load into an error.
+"""
+
+import pytest
+from sqlalchemy.orm import selectinload
+
+from app.models import Click, QRCode, URL, User
+from app.services.blob_store import blob_digest
+
+ROWS = 5
+
+
+@pytest.fixture
+def seeded(db_session, user):
+    for i in range(ROWS):
+        url = URL(
+            user_id=user.id,
+            short_code=f"code{i}",
+            original_url=f"https://example.com/{i}",
+            title=f"Link {i}",
+            clicks_count=i,
+        )
+        db_session.add(url)
+        db_session.flush()
+        db_session.add(Click(url_id=url.id))
+        db_session.add(
+            QRCode(
+                user_id=user.id,
+                url_id=url.id,
+                content=f"https://example.com/{i}",
+                image_digest=blob_digest(b""),
+            )
+        )
+    db_session.commit()
+    user_id = user.id
+    db_session.expunge_all()
+    return user_id
+
+
+def _assert_budget(client, counter, path, budget):
+    counter.statements.clear()
+    response = client.get(path)
+    assert response.status_code == 200, response.text
+    assert len(counter) <= budget, "\n\n".join(counter.statements)
+    return response
+
+
+@pytest.mark.parametrize(
+    "path, budget",
+    [
+        ("/api/v1/links", 2),  # auth + page
+        ("/api/v1/links?search=example", 2),
+        ("/api/v1/links/1", 3),  # auth + link + tags
+        ("/api/v1/qr", 4),  # auth + count + page + linked urls
+        ("/api/v1/qr/1", 2),  # auth + qr joined with url
+        ("/api/v1/users/me/stats", 5),
+        ("/api/v1/analytics/tags", 2),
+    ],
+)
+def test_user_endpoints(auth_client, seeded, count_queries, path, budget):
+    _assert_budget(auth_client, count_queries, path, budget)
+
+
+@pytest.mark.parametrize(
+    "path, budget",
+    [
+        ("/api/v1/admin/users", 2),  # auth + page with aggregates
+        ("/api/v1/admin/links", 2),  # auth + page joined with owner
+        ("/api/v1/admin/links?search=testuser", 2),
+    ],
+)
+def test_admin_endpoints(admin_client, seeded, count_queries, path, budget):
+    _assert_budget(admin_client, count_queries, path, budget)
+
+
+def test_admin_users_totals(admin_client, seeded):
+    users = {u["username"]: u for u in admin_client.get("/api/v1/admin/users").json()}
+    assert users["testuser"]["total_links"] == ROWS
+    assert users["testuser"]["total_clicks"] == sum(range(ROWS))
+    assert users["rootadmin"]["total_links"] == 0
+
+
+def test_qr_list_includes_linked_url(auth_client, seeded):
+    items = auth_client.get("/api/v1/qr").json()["items"]
+    assert {i["linked_short_code"] for i in items} == {f"code{i}" for i in range(ROWS)}
+
+
+def test_implicit_lazy_load_raises(db_session, seeded):
+    user = db_session.query(User).filter(User.id == seeded).one()
+    with pytest.raises(Exception, match="raise_on_sql"):
+        user.urls
+
+    user = (
+        db_session.query(User)
+        .options(selectinload(User.urls))
+        .filter(User.id == seeded)
+        .one()
+    )
+    assert len(user.urls) == ROWS
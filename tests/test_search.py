@@ -0,0 +1,91 @@
+"""
+Tests for full-text search over links, users and QR codes.
+"""
+
+from app.models import QRCode, URL, User
+from app.services.blob_store import blob_digest
+
+
+def _add_links(db_session, user, *rows):
+    for code, original, title in rows:
+        db_session.add(
+            URL(
+                user_id=user.id,
+                short_code=code,
+                original_url=original,
+                title=title,
+            )
+        )
+    db_session.commit()
+
+
+class TestLinkSearch:
+
+    def test_substring_match(self, auth_client, db_session, user):
+        _add_links(
+            db_session,
+            user,
+            ("gh1", "https://github.com/org/repo", "Repo"),
+            ("yt1", "https://youtube.com/watch", "Video"),
+        )
+        response = auth_client.get("/api/v1/links?search=ithub")
+        assert response.status_code == 200
+        assert [l["short_code"] for l in response.json()] == ["gh1"]
+
+    def test_search_by_title_and_prefix(self, auth_client, db_session, user):
+        _add_links(
+            db_session,
+            user,
+            ("a1", "https://a.example.com", "Quarterly report"),
+            ("b1", "https://b.example.com", "Holiday photos"),
+        )
+        response = auth_client.get("/api/v1/links?search=quar")
+        assert [l["short_code"] for l in response.json()] == ["a1"]
+
+    def test_short_term_falls_back_to_like(self, auth_client, db_session, user):
+        _add_links(db_session, user, ("zq", "https://zq.example.com", None))
+        response = auth_client.get("/api/v1/links?search=zq")
+        assert [l["short_code"] for l in response.json()] == ["zq"]
+
+    def test_index_follows_updates_and_deletes(self, auth_client, db_session, user):
+        _add_links(db_session, user, ("upd", "https://upd.example.com", "Vintage"))
+        url = db_session.query(URL).filter(URL.short_code == "upd").one()
+        url.title = "Renamed"
+        db_session.commit()
+
+        assert auth_client.get("/api/v1/links?search=Vintage").json() == []
+        assert len(auth_client.get("/api/v1/links?search=Renamed").json()) == 1
+
+        db_session.delete(url)
+        db_session.commit()
+        assert auth_client.get("/api/v1/links?search=Renamed").json() == []
+
+    def test_only_own_links(self, auth_client, db_session, user, admin_user):
+        _add_links(db_session, admin_user, ("adm", "https://secret.example.com", None))
+        assert auth_client.get("/api/v1/links?search=secret").json() == []
+
+
+class TestAdminSearch:
+
+    def test_users_search(self, admin_client, user):
+        response = admin_client.get("/api/v1/admin/users?search=testus")
+        assert [u["username"] for u in response.json()] == ["testuser"]
+
+    def test_links_search_by_owner(self, admin_client, db_session, user):
+        _add_links(db_session, user, ("own", "https://x.example.com", None))
+        response = admin_client.get("/api/v1/admin/links?search=testuser")
+        assert [l["short_code"] for l in response.json()] == ["own"]
+
+
+class TestQRSearch:
+
+    def test_qr_search(self, auth_client, db_session, user):
+        for content in ("https://shop.example.com", "https://blog.example.com"):
+            db_session.add(
+                QRCode(user_id=user.id, content=content, image_digest=blob_digest(b""))
+            )
+        db_session.commit()
+
+        data = auth_client.get("/api/v1/qr?search=shop").json()
+        assert data["total"] == 1
+        assert data["items"][0]["content"] == "https://shop.example.com"
@@ -0,0 +1,87 @@
+"""
+Listings bypass response_model validation; their JSON must still match
+the declared schemas exactly.
+"""
+
+from datetime import datetime
+
+from app.models import QRCode, URL
+from app.schemas import QRCodeListResponse, QRCodeResponse, URLResponse
+
+
+def test_links_listing_matches_schema(auth_client, db_session, user):
+    created = datetime(2024, 5, 6, 7, 8, 9, 123456)
+    db_session.add(URL(
+        user_id=user.id, short_code="abc", original_url="https://example.com",
+        title="Example", created_at=created,
+    ))
+    db_session.commit()
+
+    response = auth_client.get("/api/v1/links")
+    assert response.headers["content-type"] == "application/json"
+    [item] = response.json()
+
+    assert set(item) == set(URLResponse.model_fields)
+    expected = URLResponse.model_validate(item).model_dump(mode="json")
+    assert item == expected
+    assert item["created_at"] == "2024-05-06T07:08:09.123456"
+    assert item["short_url"].endswith("/abc")
+
+
+def test_links_listing_keeps_page_headers(auth_client, db_session, user):
+    for i in range(3):
+        db_session.add(URL(user_id=user.id, short_code=f"c{i}", original_url="https://example.com"))
+    db_session.commit()
+
+    response = auth_client.get("/api/v1/links?limit=2&with_total=true")
+    assert len(response.json()) == 2
+    assert response.headers["x-next-cursor"]
+    assert response.headers["x-total-count"] == "3"
+
+
+def test_qr_listing_matches_schema(auth_client, db_session, user):
+    linked = URL(user_id=user.id, short_code="qrlink", original_url="https://example.com/a")
+    db_session.add(linked)
+    db_session.flush()
+    for url_id in (linked.id, None):
+        db_session.add(QRCode(
+            user_id=user.id, url_id=url_id, content="https://example.com",
+            image_digest="0" * 64,
+        ))
+    db_session.commit()
+
+    data = auth_client.get("/api/v1/qr").json()
+    assert data == QRCodeListResponse.model_validate(data).model_dump(mode="json")
+    for item in data["items"]:
+        assert set(item) == set(QRCodeResponse.model_fields)
+    by_link = {item["url_id"]: item for item in data["items"]}
+    assert by_link[linked.id]["linked_short_code"] == "qrlink"
+    assert by_link[None]["destination"] is None
+
+
+def test_analytics_lists_skip_the_encoder(auth_client, db_session, user, monkeypatch):
+    import fastapi.routing
+
+    created = datetime(2024, 5, 6, 7, 8, 9, 123456)
+    db_session.add(URL(
+        user_id=user.id, short_code="top", original_url="https://example.com",
+        title="Top", clicks_count=3, created_at=created,
+    ))
+    db_session.commit()
+
+    def unexpected(*args, **kwargs):
+        raise AssertionError("list endpoints return ORJSONResponse directly")
+
+    monkeypatch.setattr(fastapi.routing, "jsonable_encoder", unexpected)
+    for path in (
+        "clicks-over-time", "referrers", "devices", "browsers", "countries", "top-links", "tags",
+    ):
+        response = auth_client.get(f"/api/v1/analytics/{path}")
+        assert response.status_code == 200, path
+        assert isinstance(response.json(), list)
+
+    [top] = auth_client.get("/api/v1/analytics/top-links").json()
+    assert top == {
+        "id": top["id"], "short_code": "top", "original_url": "https://example.com",
+        "title": "Top", "clicks": 3, "created_at": "2024-05-06T07:08:09.123456",
+    }
@@ -0,0 +1,152 @@
+"""
+Tests for the production launcher (python -m app.server).
+"""
+
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+import pytest
+
+from app.server import parse_args, worker_count
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_worker_count():
+    assert worker_count(3) == 3
+    assert worker_count(0) == (os.cpu_count() or 1)
+
+
+def test_args_default_to_settings(monkeypatch):
+    from app.config import settings
+
+    monkeypatch.setattr(settings, "SERVER_BACKLOG", 4096)
+    args = parse_args(["--workers", "2"])
+    assert args.workers == 2
+    assert args.backlog == 4096
+    assert not args.no_init
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="prefork needs fork()")
+def test_prefork_serves_and_drains(tmp_path):
+    port = _free_port()
+    db_path = tmp_path / "server.db"
+    process = subprocess.Popen(
+        [sys.executable, "-m", "app.server", "--host", "127.0.0.1",
+         "--port", str(port), "--workers", "2", "--log-level", "warning"],
+        cwd=ROOT,
+        env={
+            **os.environ,
+            "DATABASE_URL": f"sqlite:///{db_path}",
+            "EXPIRY_SCHEDULER_ENABLED": "false",
+            "METRICS_DIR": str(tmp_path / "metrics"),
+            "METRICS_SNAPSHOT_SECONDS": "0.1",
+        },
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+    )
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                response = httpx.get(f"http://127.0.0.1:{port}/api/health")
+                break
+            except httpx.TransportError:
+                assert process.poll() is None, process.stdout.read()
+                assert time.monotonic() < deadline
+                time.sleep(0.2)
+        assert response.json()["status"] == "ok"
+        # Initialized once, in the parent
+        assert db_path.exists()
+
+        # Requests land on both workers; any of them reports the total
+        for _ in range(20):
+            httpx.get(f"http://127.0.0.1:{port}/api/health")
+        time.sleep(0.5)
+        text = httpx.get(f"http://127.0.0.1:{port}/metrics").text
+        assert 'http_requests_total{method="GET",route="/api/health",status="200"} 21' in text
+
+        process.send_signal(signal.SIGTERM)
+        assert process.wait(timeout=30) == 0
+        assert process.stdout.read().count("Admin user created") == 1
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+
+
+def _supervisor(workers=2):
+    import uvicorn
+
+    from app.server import Supervisor
+
+    return Supervisor(uvicorn.Config(app=None), workers)
+
+
+def test_worker_crash_is_logged(monkeypatch, capsys):
+    import uvicorn
+
+    def crash(self, sockets=None):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(uvicorn.Server, "run", crash)
+    assert _supervisor()._serve(None) == 1
+    assert "RuntimeError: boom" in capsys.readouterr().err
+
+
+def test_failed_startup_is_an_error(monkeypatch):
+    import uvicorn
+
+    monkeypatch.setattr(uvicorn.Server, "run", lambda self, sockets=None: None)
+    assert _supervisor()._serve(None) == 1
+
+
+def test_restart_backoff_grows():
+    supervisor = _supervisor()
+    delays = []
+    for failures in range(7):
+        supervisor.fast_failures = failures
+        delays.append(supervisor._backoff())
+    assert delays == [0, 0.5, 1, 2, 4, 8, 10]
+
+
+CRASHING_APP = """
+import sys
+import uvicorn
+from app.server import Supervisor
+
+async def app(scope, receive, send):
+    message = await receive()
+    await send({"type": "lifespan.startup.failed", "message": "no database"})
+
+config = uvicorn.Config(app, host="127.0.0.1", port=int(sys.argv[1]), lifespan="on")
+sys.exit(Supervisor(config, 2).run())
+"""
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="prefork needs fork()")
+def test_gives_up_when_workers_keep_dying():
+    process = subprocess.run(
+        [sys.executable, "-c", CRASHING_APP, str(_free_port())],
+        cwd=ROOT,
+        env={**os.environ, "SERVER_MAX_FAST_RESTARTS": "3", "METRICS_ENABLED": "false"},
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+    assert process.returncode == 1
+    assert process.stdout.count("restarting in") == 2
+    assert "giving up" in process.stdout
@@ -0,0 +1,86 @@
+"""
+Slow-query log: threshold, ring buffer, query plans and the admin endpoint.
+"""
+
+import pytest
+from sqlalchemy import text
+
+from app.core.slow_queries import SlowQueryLog, slow_query_log
+from app.database import instrument_engine
+from app.models import URL
+from tests.conftest import engine
+
+
+@pytest.fixture
+def log_everything(monkeypatch):
+    instrument_engine(engine)
+    monkeypatch.setattr(slow_query_log, "threshold", 1e-9)
+    slow_query_log.clear()
+    yield slow_query_log
+    slow_query_log.clear()
+
+
+class TestSlowQueryLog:
+    def test_ring_buffer_keeps_newest(self):
+        log = SlowQueryLog(threshold_ms=100, size=3)
+        for i in range(5):
+            log.record(f"SELECT {i}", (), 0.5)
+
+        assert [e["statement"] for e in log.entries()] == ["SELECT 4", "SELECT 3", "SELECT 2"]
+        assert log.entries(limit=1)[0]["duration_ms"] == 500.0
+        assert log.total == 5
+
+    def test_long_parameters_truncated(self):
+        log = SlowQueryLog(threshold_ms=100, size=3, log_parameters=True)
+        entry = log.record("SELECT ?", ("x" * 5000,), 0.2)
+        assert len(entry["parameters"]) < 600
+
+    def test_parameter_values_redacted(self):
+        log = SlowQueryLog(threshold_ms=100, size=3)
+        entry = log.record(
+            "UPDATE users SET hashed_password = ? WHERE email = ?",
+            ("$2b$12$secret", "user@example.com"), 0.2,
+        )
+        assert entry["parameters"] == "(str[13], str[16])"
+        assert log.record("INSERT", [(1, None), (2, None)], 0.2)["parameters"] == "[2 × (int, None)]"
+        assert log.record("SELECT", {"email": "a@b.c"}, 0.2)["parameters"] == "{email: str[5]}"
+
+    def test_zero_threshold_disables(self):
+        assert not SlowQueryLog(threshold_ms=0, size=3).enabled
+
+    def test_fast_queries_ignored(self, db_session):
+        instrument_engine(engine)
+        slow_query_log.clear()
+        db_session.execute(text("SELECT 1"))
+        assert slow_query_log.entries() == []
+
+    def test_plan_captured(self, db_session, log_everything, user):
+        db_session.query(URL).filter(URL.short_code == "abc").first()
+
+        entry = next(e for e in log_everything.entries() if "FROM urls" in e["statement"])
+        assert entry["route"] is None
+        assert "'abc'" not in entry["parameters"]
+        assert any("ix_urls_short_code" in line for line in entry["plan"])
+
+
+class TestSlowQueryEndpoint:
+    def test_entries_carry_route(self, admin_client, db_session, user, log_everything):
+        db_session.add(URL(short_code="abc", original_url="https://example.com", user_id=user.id))
+        db_session.commit()
+        admin_client.get("/abc", follow_redirects=False)
+
+        data = admin_client.get("/api/v1/admin/slow-queries").json()
+        assert data["total"] >= 1
+        routes = {entry["route"] for entry in data["queries"]}
+        assert "/{short_code}" in routes
+
+        assert admin_client.delete("/api/v1/admin/slow-queries").status_code == 204
+        data = admin_client.get("/api/v1/admin/slow-queries").json()
+        # Only the admin lookup of the GET itself may remain
+        assert all(entry["route"] == "/api/v1/admin/slow-queries" for entry in data["queries"])
+
+    def test_requires_admin(self, client, user):
+        from tests.conftest import _login
+
+        response = _login(client, user).get("/api/v1/admin/slow-queries")
+        assert response.status_code == 403
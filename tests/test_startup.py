@@ -0,0 +1,33 @@
+"""
+Worker startup: importing the app stays cheap and side-effect free.
+"""
+
+import sys
+
+from benchmarks.import_time import DEFERRED_MODULES, measure_imports
+from app.core.lazy import lazy_import
+
+
+def test_heavy_modules_are_not_imported_eagerly():
+    imported = measure_imports("app.main")
+    assert "app.main" in imported
+    assert [m for m in DEFERRED_MODULES if m in imported] == []
+    assert "app.services.qr_service" not in imported
+
+
+def test_import_does_not_touch_database(tmp_path):
+    db_path = tmp_path / "cold.db"
+    measure_imports("app.main", env={"DATABASE_URL": f"sqlite:///{db_path}"})
+    assert not db_path.exists()
+
+
+def test_lazy_import_loads_on_attribute_access():
+    name = "benchmarks.qr_render"
+    sys.modules.pop(name, None)
+    try:
+        module = lazy_import(name)
+        assert lazy_import(name) is module
+        assert module.VERSIONS
+        assert sys.modules[name] is module
+    finally:
+        sys.modules.pop(name, None)
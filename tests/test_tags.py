@@ -0,0 +1,97 @@
+"""
+Tests for normalized link tags.
+"""
+
+import sqlite3
+from unittest.mock import AsyncMock, patch
+
+from sqlalchemy.orm import selectinload
+
+from app.migrations import run_tags_migration
+from app.models import Tag, URL
+from app.services.tag_service import parse_tags
+
+
+def _create(client, url, tags, code):
+    return client.post(
+        "/api/v1/links",
+        json={"url": url, "tags": tags, "custom_code": code},
+    )
+
+
+def test_parse_tags():
+    assert parse_tags(" Work, promo,,work , ") == ["work", "promo"]
+    assert parse_tags(None) == []
+
+
+@patch("app.api.links.check_url_accessible", new_callable=AsyncMock, return_value=True)
+class TestTagsAPI:
+
+    def test_tags_are_normalized_and_shared(self, mock_check, auth_client, db_session):
+        _create(auth_client, "https://a.example.com", "Work, promo", "aaa")
+        _create(auth_client, "https://b.example.com", "work", "bbb")
+
+        names = [t.name for t in db_session.query(Tag).order_by(Tag.name)]
+        assert names == ["promo", "work"]
+
+        link_id = db_session.query(URL).filter(URL.short_code == "aaa").one().id
+        info = auth_client.get(f"/api/v1/links/{link_id}").json()
+        assert info["tags"] == "promo, work"
+
+    def test_filter_by_tags(self, mock_check, auth_client):
+        _create(auth_client, "https://a.example.com", "work, promo", "aaa")
+        _create(auth_client, "https://b.example.com", "work", "bbb")
+
+        codes = lambda q: sorted(
+            l["short_code"] for l in auth_client.get(f"/api/v1/links?{q}").json()
+        )
+        assert codes("tag=work") == ["aaa", "bbb"]
+        assert codes("tag=work&tag=promo") == ["aaa"]
+        assert codes("tag=missing") == []
+
+    def test_update_replaces_tags(self, mock_check, auth_client, db_session):
+        link_id = _create(auth_client, "https://a.example.com", "work", "aaa").json()["id"]
+        auth_client.patch(f"/api/v1/links/{link_id}", json={"tags": "home"})
+
+        info = auth_client.get(f"/api/v1/links/{link_id}").json()
+        assert info["tags"] == "home"
+
+    def test_tag_analytics(self, mock_check, auth_client, db_session):
+        _create(auth_client, "https://a.example.com", "work, promo", "aaa")
+        _create(auth_client, "https://b.example.com", "work", "bbb")
+        db_session.query(URL).filter(URL.short_code == "aaa").update({"clicks_count": 5})
+        db_session.query(URL).filter(URL.short_code == "bbb").update({"clicks_count": 2})
+        db_session.commit()
+
+        stats = auth_client.get("/api/v1/analytics/tags").json()
+        assert stats == [
+            {"tag": "work", "links": 2, "clicks": 7},
+            {"tag": "promo", "links": 1, "clicks": 5},
+        ]
+
+
+def test_legacy_tags_migration(db_session, user):
+    db_session.add(URL(user_id=user.id, short_code="old", original_url="https://x.io"))
+    db_session.commit()
+
+    conn = sqlite3.connect("test.db")
+    try:
+        conn.execute("ALTER TABLE urls ADD COLUMN tags VARCHAR(500)")
+        conn.execute("UPDATE urls SET tags = 'News, news, Tech'")
+        conn.commit()
+
+        run_tags_migration(conn)
+
+        columns = [c[1] for c in conn.execute("PRAGMA table_info(urls)")]
+        assert "tags" not in columns
+    finally:
+        conn.close()
+
+    db_session.expire_all()
+    url = (
+        db_session.query(URL)
+        .options(selectinload(URL.tag_list))
+        .filter(URL.short_code == "old")
+        .one()
+    )
+    assert url.tags == "news, tech"